@@ -0,0 +1,142 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+import faiss
+import numpy as np
+
+from metrics import register_cache
+
+# ===============================
+# Semantic answer cache
+# ===============================
+# Stores synthesized answers keyed by (service, query embedding). A new
+# query whose embedding is close enough to a cached one for the same
+# service reuses the stored answer instead of calling the LLM.
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "1") == "1"
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+
+
+class CacheKey(NamedTuple):
+    """
+    service: service the answer was generated for
+    vector:  normalized query embedding, shape (dim,)
+    version: fingerprint of the service's chunk metadata
+    """
+    service: str
+    vector: np.ndarray
+    version: str
+
+
+class _ServiceCache:
+    """Inner-product index plus LRU bookkeeping for one service."""
+
+    def __init__(self, dim: int, version: str):
+        self.version = version
+        self.index = faiss.IndexIDMap2(faiss.IndexFlatIP(dim))
+        self.entries = OrderedDict()  # id -> (answer, expires_at)
+        self.next_id = 0
+
+    def remove(self, entry_id: int):
+        self.entries.pop(entry_id, None)
+        self.index.remove_ids(np.array([entry_id], dtype="int64"))
+
+
+class SemanticAnswerCache:
+    """
+    Per-service semantic cache with LRU + TTL eviction.
+
+    A service's entries are dropped as soon as a lookup or store arrives
+    with a different metadata version, so answers never outlive the
+    chunks they were generated from.
+    """
+
+    def __init__(
+        self,
+        threshold: float = ANSWER_CACHE_THRESHOLD,
+        max_entries: int = ANSWER_CACHE_MAX_ENTRIES,
+        ttl: float = ANSWER_CACHE_TTL
+    ):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._services = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _service_cache(self, key: CacheKey, create: bool) -> Optional[_ServiceCache]:
+        cache = self._services.get(key.service)
+        if cache is not None and cache.version != key.version:
+            print(f"Answer cache invalidated for {key.service} (metadata changed)")
+            cache = None
+            del self._services[key.service]
+        if cache is None and create:
+            cache = _ServiceCache(key.vector.shape[-1], key.version)
+            self._services[key.service] = cache
+        return cache
+
+    @staticmethod
+    def _query(vector: np.ndarray) -> np.ndarray:
+        return np.ascontiguousarray(vector.reshape(1, -1), dtype="float32")
+
+    def lookup(self, key: CacheKey) -> Optional[str]:
+        """Return a cached answer for a semantically equivalent query, if any."""
+        with self._lock:
+            cache = self._service_cache(key, create=False)
+            if cache is None or not cache.entries:
+                self.misses += 1
+                return None
+
+            scores, ids = cache.index.search(self._query(key.vector), 1)
+            score, entry_id = float(scores[0][0]), int(ids[0][0])
+            if entry_id < 0 or score < self.threshold:
+                self.misses += 1
+                return None
+
+            answer, expires_at = cache.entries[entry_id]
+            if time.monotonic() >= expires_at:
+                cache.remove(entry_id)
+                self.misses += 1
+                return None
+
+            cache.entries.move_to_end(entry_id)
+            self.hits += 1
+            return answer
+
+    def store(self, key: CacheKey, answer: str):
+        """Cache an answer, evicting the least recently used entries."""
+        with self._lock:
+            cache = self._service_cache(key, create=True)
+            now = time.monotonic()
+
+            # Drop expired entries from the cold end first, then enforce size
+            while cache.entries:
+                oldest_id, (_, expires_at) = next(iter(cache.entries.items()))
+                if expires_at > now and len(cache.entries) < self.max_entries:
+                    break
+                cache.remove(oldest_id)
+
+            entry_id = cache.next_id
+            cache.next_id += 1
+            cache.index.add_with_ids(
+                self._query(key.vector),
+                np.array([entry_id], dtype="int64")
+            )
+            cache.entries[entry_id] = (answer, now + self.ttl)
+
+    def invalidate(self, service: str = None):
+        """Drop cached answers for one service, or for all services."""
+        with self._lock:
+            if service is None:
+                self._services.clear()
+            else:
+                self._services.pop(service, None)
+
+
+answer_cache = SemanticAnswerCache()
+register_cache("answer", answer_cache)
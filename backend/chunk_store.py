@@ -0,0 +1,116 @@
+import os
+import json
+import mmap
+import hashlib
+from typing import Dict, Iterator, List
+
+import numpy as np
+
+# ===============================
+# Memory-mappable chunk metadata
+# ===============================
+# A service's chunk metadata is stored as three files next to its index:
+#   <base>.blob        UTF-8 JSON records, concatenated
+#   <base>.offsets.npy uint64 byte offsets, len = count + 1
+#   <base>.store.json  header: count, content hash, format version
+#
+# Both data files are memory-mapped read-only, so every uvicorn worker on
+# the host shares one copy through the page cache, and a record is only
+# decoded when it is actually returned.
+FORMAT_VERSION = 1
+
+BLOB_SUFFIX = ".blob"
+OFFSETS_SUFFIX = ".offsets.npy"
+HEADER_SUFFIX = ".store.json"
+
+
+def store_base(meta_path: str) -> str:
+    """Base path of the compact store for a *_metadata.json file."""
+    return meta_path[:-len(".json")] if meta_path.endswith(".json") else meta_path
+
+
+def store_exists(base: str) -> bool:
+    return all(
+        os.path.exists(base + suffix)
+        for suffix in (BLOB_SUFFIX, OFFSETS_SUFFIX, HEADER_SUFFIX)
+    )
+
+
+def write_chunk_store(chunks: List[Dict], base: str) -> Dict:
+    """
+    Write chunks in the compact format. Each file is written to a
+    temporary path and renamed into place.
+
+    Returns:
+        The header written to <base>.store.json
+    """
+    records = [
+        json.dumps(chunk, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        for chunk in chunks
+    ]
+    offsets = np.zeros(len(records) + 1, dtype="uint64")
+    offsets[1:] = np.cumsum([len(r) for r in records], dtype="uint64")
+    blob = b"".join(records)
+
+    header = {
+        "format_version": FORMAT_VERSION,
+        "count": len(records),
+        "sha1": hashlib.sha1(blob).hexdigest()
+    }
+
+    with open(base + BLOB_SUFFIX + ".tmp", "wb") as f:
+        f.write(blob)
+    with open(base + OFFSETS_SUFFIX + ".tmp", "wb") as f:
+        np.save(f, offsets)
+    with open(base + HEADER_SUFFIX + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(header, f, indent=2)
+
+    # Header last, so a header never describes data that is not in place yet
+    os.replace(base + BLOB_SUFFIX + ".tmp", base + BLOB_SUFFIX)
+    os.replace(base + OFFSETS_SUFFIX + ".tmp", base + OFFSETS_SUFFIX)
+    os.replace(base + HEADER_SUFFIX + ".tmp", base + HEADER_SUFFIX)
+    return header
+
+
+class ChunkStore:
+    """Read-only, memory-mapped sequence of chunk dicts."""
+
+    def __init__(self, base: str):
+        with open(base + HEADER_SUFFIX, "r", encoding="utf-8") as f:
+            self.header = json.load(f)
+        if self.header.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported chunk store format in {base}")
+
+        self.offsets = np.load(base + OFFSETS_SUFFIX, mmap_mode="r")
+        if len(self.offsets) != self.header["count"] + 1:
+            raise ValueError(f"Chunk store {base} is inconsistent with its header")
+
+        self._file = open(base + BLOB_SUFFIX, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        # mmap cannot map an empty file
+        self._blob = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    @property
+    def version(self) -> str:
+        """Content fingerprint of the store."""
+        return self.header["sha1"][:16]
+
+    def __len__(self) -> int:
+        return self.header["count"]
+
+    def __getitem__(self, i: int) -> Dict:
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        start, end = int(self.offsets[i]), int(self.offsets[i + 1])
+        return json.loads(self._blob[start:end].decode("utf-8"))
+
+    def __iter__(self) -> Iterator[Dict]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def close(self):
+        if isinstance(self._blob, mmap.mmap):
+            self._blob.close()
+        self._file.close()
@@ -0,0 +1,179 @@
+import os
+import time
+import queue
+import threading
+from concurrent.futures import Future
+from typing import List
+
+import numpy as np
+
+from encoders import load_encoder, EMBEDDING_BACKEND
+from resources import registry
+from tracing import span
+
+# ===============================
+# Shared embedding model
+# ===============================
+# One encoder per process. Service detection and retrieval both go
+# through this module instead of loading their own copy. The backend
+# (torch or onnx) is chosen with EMBEDDING_BACKEND, see encoders.py.
+# It is loaded lazily (first use or app warm-up), not at import.
+MODEL_NAME = "sentence-transformers/paraphrase-multilingual-mpnet-base-v2"
+
+
+def _load_encoder():
+    encoder = load_encoder(MODEL_NAME, EMBEDDING_BACKEND)
+    # The first forward pass allocates buffers: pay for it during warm-up
+    encoder.encode(["warm up"])
+    return encoder
+
+
+_encoder = registry.register("encoder", _load_encoder)
+
+
+def get_encoder():
+    """Return the process-wide encoder, loading it on first use."""
+    return _encoder.get()
+
+# Micro-batching of single-query encodes from concurrent requests
+EMBED_BATCH_ENABLED = os.getenv("EMBED_BATCH_ENABLED", "1") == "1"
+EMBED_BATCH_MAX_SIZE = int(os.getenv("EMBED_BATCH_MAX_SIZE", "32"))
+EMBED_BATCH_MAX_WAIT_MS = float(os.getenv("EMBED_BATCH_MAX_WAIT_MS", "2"))
+
+
+def encode(texts) -> np.ndarray:
+    """
+    Encode texts into L2-normalized float32 vectors.
+
+    Args:
+        texts: A string or list of strings
+
+    Returns:
+        Array of shape (n, dim), ready for FAISS inner-product search
+    """
+    if isinstance(texts, str):
+        texts = [texts]
+    with span("encode"):
+        return get_encoder().encode(texts)
+
+
+class EmbeddingBatcher:
+    """
+    Collects single-text encode calls from concurrent requests and runs
+    them as one batched model.encode on a background thread.
+
+    A batch closes when it has `max_size` texts or `max_wait_ms` has passed
+    since its first text arrived. While a batch is being encoded, new
+    requests queue up and form the next batch, so batches grow with load
+    without adding latency when the worker is idle.
+    """
+
+    def __init__(self, max_size: int = EMBED_BATCH_MAX_SIZE, max_wait_ms: float = EMBED_BATCH_MAX_WAIT_MS):
+        self.max_size = max_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(
+                        target=self._run, name="embedding-batcher", daemon=True
+                    )
+                    self._thread.start()
+
+    def submit(self, text: str) -> Future:
+        """Queue a text; the future resolves to its (dim,) vector."""
+        self._ensure_started()
+        future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def encode_one(self, text: str) -> np.ndarray:
+        return self.submit(text).result()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_size:
+            try:
+                # Take whatever is already queued without waiting
+                batch.append(self._queue.get_nowait())
+                continue
+            except queue.Empty:
+                pass
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            # Identical queries in a batch are encoded once
+            unique = list(dict.fromkeys(text for text, _ in batch))
+            try:
+                vectors = encode(unique)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            by_text = dict(zip(unique, vectors))
+            for text, future in batch:
+                future.set_result(by_text[text])
+
+
+batcher = EmbeddingBatcher()
+
+
+class QueryEmbedding:
+    """
+    Per-request handle for a query vector.
+
+    The query is encoded on first access only, so every pipeline stage
+    that receives the same handle shares a single forward pass.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self._matrix = None
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """Query vector as a (1, dim) matrix for FAISS."""
+        if self._matrix is None:
+            if EMBED_BATCH_ENABLED:
+                self._matrix = batcher.encode_one(self.text).reshape(1, -1)
+            else:
+                self._matrix = encode([self.text])
+        return self._matrix
+
+    @property
+    def vector(self) -> np.ndarray:
+        """Query vector as a flat (dim,) array."""
+        return self.matrix[0]
+
+
+def embed_query(text: str) -> QueryEmbedding:
+    """Create an embedding handle for a query."""
+    return QueryEmbedding(text)
+
+
+def embed_queries(texts: List[str]) -> List[QueryEmbedding]:
+    """
+    Embedding handles for many queries, encoded together in one encode
+    call (identical texts once). Used by the batch endpoints.
+    """
+    handles = [QueryEmbedding(text) for text in texts]
+    unique = list(dict.fromkeys(texts))
+    if unique:
+        vectors = dict(zip(unique, encode(unique)))
+        for handle in handles:
+            handle._matrix = vectors[handle.text].reshape(1, -1)
+    return handles
@@ -0,0 +1,116 @@
+import os
+import json
+
+import numpy as np
+
+# ===============================
+# Query encoder backends
+# ===============================
+# Both backends produce the same L2-normalized mean-pooled mpnet vectors:
+#   torch - sentence-transformers / PyTorch (default, no extra setup)
+#   onnx  - onnxruntime over an int8-quantized export of the same model,
+#           created by embedding/export_onnx.py. Smaller, faster to start,
+#           and does not import torch at all.
+
+# Project root is one level ABOVE backend/
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+ONNX_MODEL_DIR = os.getenv(
+    "ONNX_MODEL_DIR",
+    os.path.join(BASE_DIR, "models", "mpnet-onnx")
+)
+ONNX_THREADS = int(os.getenv("ONNX_THREADS", "0"))  # 0 = onnxruntime default
+
+ONNX_MODEL_FILE = "model.onnx"
+ONNX_QUANTIZED_FILE = "model_quantized.onnx"
+ONNX_CONFIG_FILE = "encoder_config.json"
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return np.ascontiguousarray(vectors / norms, dtype="float32")
+
+
+class TorchEncoder:
+    """sentence-transformers model running on PyTorch."""
+
+    name = "torch"
+
+    def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_name)
+
+    def encode(self, texts) -> np.ndarray:
+        vectors = self.model.encode(
+            texts,
+            convert_to_numpy=True,
+            normalize_embeddings=True
+        )
+        return np.ascontiguousarray(vectors, dtype="float32")
+
+
+class OnnxEncoder:
+    """
+    Exported transformer served by onnxruntime, with mean pooling and
+    normalization done in numpy (what sentence-transformers does for mpnet).
+    Uses the int8-quantized graph when present.
+    """
+
+    name = "onnx"
+
+    def __init__(self, model_dir: str = ONNX_MODEL_DIR, quantized: bool = True):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        with open(os.path.join(model_dir, ONNX_CONFIG_FILE), "r", encoding="utf-8") as f:
+            config = json.load(f)
+
+        model_path = os.path.join(model_dir, ONNX_QUANTIZED_FILE)
+        if not quantized or not os.path.exists(model_path):
+            model_path = os.path.join(model_dir, ONNX_MODEL_FILE)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if ONNX_THREADS:
+            options.intra_op_num_threads = ONNX_THREADS
+        self.session = ort.InferenceSession(
+            model_path, options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=config["max_seq_length"])
+        pad_token = config.get("pad_token", "<pad>")
+        self.tokenizer.enable_padding(
+            pad_id=self.tokenizer.token_to_id(pad_token),
+            pad_token=pad_token
+        )
+        print(f"Loaded ONNX encoder: {model_path}")
+
+    def encode(self, texts) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(list(texts))
+        input_ids = np.array([e.ids for e in encodings], dtype="int64")
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype="int64")
+
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.zeros_like(input_ids)
+
+        token_embeddings = self.session.run(None, feeds)[0]
+
+        # Mean pooling over real (non-padding) tokens
+        mask = attention_mask[..., None].astype("float32")
+        summed = (token_embeddings * mask).sum(axis=1)
+        counts = np.clip(mask.sum(axis=1), 1e-9, None)
+        return _normalize(summed / counts)
+
+
+def load_encoder(model_name: str, backend: str = EMBEDDING_BACKEND):
+    """Create the encoder for the configured backend."""
+    if backend == "onnx":
+        return OnnxEncoder(ONNX_MODEL_DIR)
+    if backend == "torch":
+        return TorchEncoder(model_name)
+    raise ValueError(f"Unknown EMBEDDING_BACKEND '{backend}' (expected 'torch' or 'onnx')")
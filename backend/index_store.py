@@ -0,0 +1,475 @@
+import os
+import json
+import math
+import bisect
+import shutil
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import faiss
+import numpy as np
+
+from chunk_store import ChunkStore, write_chunk_store
+from lexical_index import BM25Index, chunk_document
+from intents import IntentClassifier, chunk_intent, intent_postings
+from service_router import ServiceRouter
+
+# ===============================
+# Unified multi-service index
+# ===============================
+# One FAISS index holds the chunks of every service. Each service owns a
+# contiguous range of IDs [start, end), so a search can be restricted to
+# one or several services with an IDSelector instead of keeping a
+# separate brute-force index per service.
+#
+# On disk (data/unified/):
+#   unified.index            FAISS index
+#   unified_metadata.*       ChunkStore, global ID -> chunk
+#   unified_bm25.json        BM25 lexical index over the same global IDs
+#   unified_intents.json     per-service intent -> ID posting lists and
+#                            the query intent classifier centroids
+#   unified_router.npz       service router prototypes (service_router.py)
+#   unified_manifest.json    index type, dimension, service ID ranges
+#                            and the per-service metadata versions
+
+# Project root is one level ABOVE backend/
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+UNIFIED_DIR = os.getenv("UNIFIED_INDEX_DIR", os.path.join(BASE_DIR, "data", "unified"))
+UNIFIED_INDEX_TYPE = os.getenv("UNIFIED_INDEX_TYPE", "auto")  # auto | flat | hnsw | ivfpq
+
+# "auto" picks the index type from the corpus size
+HNSW_MIN_VECTORS = int(os.getenv("HNSW_MIN_VECTORS", "20000"))
+IVFPQ_MIN_VECTORS = int(os.getenv("IVFPQ_MIN_VECTORS", "500000"))
+
+HNSW_M = int(os.getenv("HNSW_M", "32"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", "80"))
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "64"))
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", "16"))
+
+INDEX_FILE = "unified.index"
+MANIFEST_FILE = "unified_manifest.json"
+METADATA_BASE = "unified_metadata"
+LEXICAL_FILE = "unified_bm25.json"
+INTENTS_FILE = "unified_intents.json"
+ROUTER_FILE = "unified_router.npz"
+
+INDEX_TYPES = ("flat", "hnsw", "ivfpq")
+
+
+def choose_index_type(n_vectors: int) -> str:
+    """Exact search for small corpora, graph search, then compressed IVF."""
+    if n_vectors >= IVFPQ_MIN_VECTORS:
+        return "ivfpq"
+    if n_vectors >= HNSW_MIN_VECTORS:
+        return "hnsw"
+    return "flat"
+
+
+def _pq_subquantizers(dimension: int) -> int:
+    """Largest divisor of the dimension not above 64."""
+    return max(m for m in range(1, 65) if dimension % m == 0)
+
+
+def build_faiss_index(vectors: np.ndarray, index_type: str) -> faiss.Index:
+    """Build an inner-product index of the given type over normalized vectors."""
+    n, dimension = vectors.shape
+
+    if index_type == "flat":
+        index = faiss.IndexFlatIP(dimension)
+    elif index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dimension, HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+    elif index_type == "ivfpq":
+        nlist = max(1, int(4 * math.sqrt(n)))
+        # PQ codebooks need 2**nbits training points
+        nbits = max(1, min(8, int(math.log2(n))))
+        quantizer = faiss.IndexFlatIP(dimension)
+        index = faiss.IndexIVFPQ(
+            quantizer, dimension, nlist, _pq_subquantizers(dimension), nbits,
+            faiss.METRIC_INNER_PRODUCT
+        )
+        index.train(vectors)
+    else:
+        raise ValueError(f"Unknown index type '{index_type}' (expected one of {INDEX_TYPES})")
+
+    index.add(vectors)
+    return index
+
+
+class UnifiedIndex:
+    """
+    All services in one FAISS index, with per-service ID ranges.
+
+    Attributes:
+        index: the FAISS index (global IDs = row numbers)
+        metadata: sequence mapping global ID -> chunk dict
+        services: service -> {"start", "end", "version"}
+        index_type: "flat", "hnsw" or "ivfpq"
+        lexical: BM25 index over the same global IDs
+        intents: service -> intent -> global IDs
+        intent_classifier: query intent classifier, if one was fitted
+        router: service router, if one was built
+    """
+
+    def __init__(
+        self,
+        index: faiss.Index,
+        metadata: Sequence[Dict],
+        services: Dict[str, Dict],
+        index_type: str,
+        lexical: Optional[BM25Index] = None,
+        intents: Optional[Dict[str, Dict[str, np.ndarray]]] = None,
+        intent_classifier: Optional[IntentClassifier] = None,
+        router: Optional[ServiceRouter] = None
+    ):
+        self.index = index
+        self.metadata = metadata
+        self.services = services
+        self.index_type = index_type
+        if lexical is None:
+            lexical = BM25Index.build([chunk_document(chunk) for chunk in metadata])
+        self.lexical = lexical
+        self.intents = intents if intents is not None else intent_postings(metadata, services)
+        self.intent_classifier = intent_classifier
+        self.router = router
+        # Sorted range starts, for mapping a global ID back to its service
+        ordered = sorted(services.items(), key=lambda item: item[1]["start"])
+        self._starts = [info["start"] for _, info in ordered]
+        self._names = [name for name, _ in ordered]
+        # Selectors must outlive the SearchParameters that point to them
+        self._params_cache = {}
+
+    # ---------- construction ----------
+
+    @classmethod
+    def from_services(
+        cls,
+        per_service: Dict[str, Tuple[np.ndarray, Sequence[Dict], str]],
+        index_type: str = UNIFIED_INDEX_TYPE,
+        descriptions: Optional[Dict[str, Tuple[str, np.ndarray]]] = None
+    ) -> "UnifiedIndex":
+        """
+        Build from per-service data.
+
+        Args:
+            per_service: service -> (normalized vectors, chunks, metadata version)
+            index_type: "auto" or one of INDEX_TYPES
+            descriptions: service description prototypes for the router,
+                see service_router.description_vectors()
+        """
+        vectors, metadata, services = [], [], {}
+        start = 0
+        for name, (service_vectors, chunks, version) in per_service.items():
+            end = start + len(service_vectors)
+            services[name] = {"start": start, "end": end, "version": version}
+            vectors.append(np.asarray(service_vectors, dtype="float32"))
+            metadata.extend(chunks)
+            start = end
+
+        all_vectors = np.ascontiguousarray(np.vstack(vectors), dtype="float32")
+        if index_type == "auto":
+            index_type = choose_index_type(len(all_vectors))
+        index = build_faiss_index(all_vectors, index_type)
+        classifier = IntentClassifier.fit(all_vectors, [chunk_intent(c) for c in metadata])
+        router = ServiceRouter.build(all_vectors, metadata, services, descriptions)
+        return cls(
+            index, metadata, services, index_type,
+            intent_classifier=classifier, router=router
+        )
+
+    @staticmethod
+    def exists(directory: str = UNIFIED_DIR) -> bool:
+        return os.path.exists(os.path.join(directory, MANIFEST_FILE))
+
+    @staticmethod
+    def read_manifest(directory: str = UNIFIED_DIR) -> Dict:
+        with open(os.path.join(directory, MANIFEST_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    @classmethod
+    def load(cls, directory: str = UNIFIED_DIR, read_index=faiss.read_index) -> "UnifiedIndex":
+        """Load a saved unified index (pass a memory-mapping read_index)."""
+        manifest = cls.read_manifest(directory)
+        index = read_index(os.path.join(directory, INDEX_FILE))
+        metadata = ChunkStore(os.path.join(directory, METADATA_BASE))
+        lexical_path = os.path.join(directory, LEXICAL_FILE)
+        # Built from the metadata when missing or from an older tokenizer
+        lexical = BM25Index.load(lexical_path) if os.path.exists(lexical_path) else None
+
+        intents, classifier = None, None
+        intents_path = os.path.join(directory, INTENTS_FILE)
+        if os.path.exists(intents_path):
+            with open(intents_path, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+            intents = {
+                service: {intent: np.array(ids, dtype="int64") for intent, ids in by_intent.items()}
+                for service, by_intent in saved["postings"].items()
+            }
+            if saved.get("classifier"):
+                classifier = IntentClassifier(
+                    saved["classifier"]["labels"],
+                    np.array(saved["classifier"]["centroids"], dtype="float32")
+                )
+        router_path = os.path.join(directory, ROUTER_FILE)
+        router = ServiceRouter.load(router_path) if os.path.exists(router_path) else None
+        return cls(
+            index, metadata, manifest["services"], manifest["index_type"],
+            lexical, intents, classifier, router
+        )
+
+    def save(self, directory: str = UNIFIED_DIR):
+        """
+        Write index, metadata and manifest. Files are staged in a
+        temporary directory and moved into place, manifest last.
+        """
+        staging = directory + ".tmp"
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+        os.makedirs(directory, exist_ok=True)
+
+        faiss.write_index(self.index, os.path.join(staging, INDEX_FILE))
+        write_chunk_store(list(self.metadata), os.path.join(staging, METADATA_BASE))
+        self.lexical.save(os.path.join(staging, LEXICAL_FILE))
+        classifier = self.intent_classifier
+        with open(os.path.join(staging, INTENTS_FILE), "w", encoding="utf-8") as f:
+            json.dump({
+                "postings": {
+                    service: {intent: ids.tolist() for intent, ids in by_intent.items()}
+                    for service, by_intent in self.intents.items()
+                },
+                "classifier": {
+                    "labels": classifier.labels,
+                    "centroids": classifier.centroids.tolist()
+                } if classifier is not None else None
+            }, f, separators=(",", ":"))
+        if self.router is not None:
+            self.router.save(os.path.join(staging, ROUTER_FILE))
+        with open(os.path.join(staging, MANIFEST_FILE), "w", encoding="utf-8") as f:
+            json.dump({
+                "index_type": self.index_type,
+                "dimension": self.index.d,
+                "ntotal": self.index.ntotal,
+                "services": self.services
+            }, f, indent=2)
+
+        names = sorted(os.listdir(staging), key=lambda name: name == MANIFEST_FILE)
+        for name in names:
+            os.replace(os.path.join(staging, name), os.path.join(directory, name))
+        os.rmdir(staging)
+
+    # ---------- search ----------
+
+    def service_of(self, global_id: int) -> Optional[str]:
+        """Service owning a global ID."""
+        pos = bisect.bisect_right(self._starts, global_id) - 1
+        if pos < 0:
+            return None
+        name = self._names[pos]
+        return name if global_id < self.services[name]["end"] else None
+
+    def intent_ids(self, intent: str, services: Optional[List[str]] = None) -> np.ndarray:
+        """Global IDs of the chunks labelled with an intent (posting list lookup)."""
+        lists = [
+            self.intents.get(service, {}).get(intent)
+            for service in (services or self.services)
+        ]
+        lists = [ids for ids in lists if ids is not None]
+        return np.concatenate(lists) if lists else np.zeros(0, dtype="int64")
+
+    def _search_params(self, services: Optional[List[str]], intent: Optional[str] = None):
+        key = (tuple(sorted(services)) if services else None, intent)
+        if key in self._params_cache:
+            return self._params_cache[key][0]
+
+        selectors = []
+        selector = None
+        if intent is not None:
+            # The posting list already lies inside the services' ranges
+            ids = self.intent_ids(intent, services)
+            selector = faiss.IDSelectorBatch(ids)
+            selectors += [ids, selector]
+        else:
+            for name in key[0] or ():
+                info = self.services[name]
+                sel = faiss.IDSelectorRange(info["start"], info["end"])
+                selectors.append(sel)
+                selector = sel if selector is None else faiss.IDSelectorOr(selector, sel)
+                selectors.append(selector)
+
+        kwargs = {"sel": selector} if selector is not None else {}
+        if self.index_type == "hnsw":
+            params = faiss.SearchParametersHNSW(efSearch=HNSW_EF_SEARCH, **kwargs)
+        elif self.index_type == "ivfpq":
+            params = faiss.SearchParametersIVF(nprobe=IVF_NPROBE, **kwargs)
+        else:
+            params = faiss.SearchParameters(**kwargs)
+
+        self._params_cache[key] = (params, selectors)
+        return params
+
+    def search(
+        self,
+        query_matrix: np.ndarray,
+        k: int,
+        services: Optional[List[str]] = None,
+        intent: Optional[str] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Search, optionally restricted to some services and to the chunks
+        of one intent.
+
+        Returns:
+            (scores, global_ids), each of shape (n_queries, k); missing
+            results have ID -1
+        """
+        unknown = [s for s in services or () if s not in self.services]
+        if unknown:
+            raise ValueError(f"Unknown services: {unknown}")
+        return self.index.search(query_matrix, k, params=self._search_params(services, intent))
+
+    def search_lexical(
+        self,
+        query: str,
+        k: int,
+        services: Optional[List[str]] = None,
+        intent: Optional[str] = None
+    ) -> List[Tuple[int, float]]:
+        """BM25 search, with the same restrictions as search(): [(global_id, score)]."""
+        if intent is not None:
+            return self.lexical.search(query, k, ids=self.intent_ids(intent, services))
+        ranges = None
+        if services:
+            ranges = [(self.services[s]["start"], self.services[s]["end"]) for s in services]
+        return self.lexical.search(query, k, ranges)
+
+    def chunk(self, global_id: int) -> Dict:
+        return self.metadata[int(global_id)]
+
+    def parent_text(self, global_id: int) -> str:
+        """
+        Full text of a span's parent chunk, rebuilt from its sibling spans
+        (consecutive IDs, see cleaning/chunking.py). Chunks that are not
+        spans are returned as is.
+        """
+        global_id = int(global_id)
+        chunk = self.chunk(global_id)
+        if chunk.get("span_count", 1) == 1:
+            return chunk["text"]
+
+        first = global_id - chunk["span_index"]
+        text, end = "", 0
+        for sibling_id in range(first, first + chunk["span_count"]):
+            sibling = chunk if sibling_id == global_id else self.chunk(sibling_id)
+            start = sibling["char_start"]
+            if not text:
+                text = sibling["text"]
+            elif sibling["char_end"] <= end:
+                continue
+            elif start >= end:
+                # Only whitespace was left out between the two spans
+                text += "\n" + sibling["text"]
+            else:
+                text += sibling["text"][end - start:]
+            end = sibling["char_end"]
+        return text
+
+    def close(self):
+        """Release the memory-mapped metadata (the index is freed with the object)."""
+        if hasattr(self.metadata, "close"):
+            self.metadata.close()
+
+
+# ===============================
+# Index generations (hot reload)
+# ===============================
+
+class Generation:
+    """One loaded version of the index data, with a reference count."""
+
+    def __init__(self, number: int, data: Dict, fingerprint):
+        self.number = number
+        self.data = data
+        self.fingerprint = fingerprint
+        self.refs = 0
+        self.retired = False
+
+
+class IndexGenerations:
+    """
+    Versioned holder of the loaded index data.
+
+    Searches run inside `acquire()`, which pins the current generation.
+    `reload()` loads the next generation without holding the lock and
+    swaps it in atomically; the previous generation is closed once its
+    last in-flight search releases it.
+
+    Args:
+        loader: builds the data dict of a generation
+        fingerprint: cheap summary of the files on disk (compared to
+            decide whether a reload is needed)
+        close: releases a data dict that is no longer used
+    """
+
+    def __init__(self, loader: Callable[[], Dict], fingerprint: Callable, close: Callable[[Dict], None]):
+        self._loader = loader
+        self._fingerprint = fingerprint
+        self._close = close
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._current = Generation(1, loader(), fingerprint())
+
+    @property
+    def current(self) -> Generation:
+        return self._current
+
+    @contextmanager
+    def acquire(self):
+        """Pin the current generation for the duration of a search."""
+        with self._lock:
+            generation = self._current
+            generation.refs += 1
+        try:
+            yield generation.data
+        finally:
+            self._release(generation)
+
+    def _release(self, generation: Generation):
+        with self._lock:
+            generation.refs -= 1
+            done = generation.retired and generation.refs == 0
+        if done:
+            self._retire(generation)
+
+    def _retire(self, generation: Generation):
+        self._close(generation.data)
+        print(f"Released index generation {generation.number}")
+
+    def changed(self) -> bool:
+        """Whether the files on disk differ from the current generation."""
+        return self._fingerprint() != self._current.fingerprint
+
+    def reload(self, force: bool = False) -> Optional[Generation]:
+        """
+        Load a new generation and swap it in.
+
+        Returns:
+            The new generation, or None if nothing changed on disk
+        """
+        # One reload at a time; searches keep running on the current generation
+        with self._reload_lock:
+            fingerprint = self._fingerprint()
+            if not force and fingerprint == self._current.fingerprint:
+                return None
+
+            generation = Generation(self._current.number + 1, self._loader(), fingerprint)
+            with self._lock:
+                previous, self._current = self._current, generation
+                previous.retired = True
+                done = previous.refs == 0
+            print(f"Swapped in index generation {generation.number}")
+            if done:
+                self._retire(previous)
+            return generation
+
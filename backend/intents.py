@@ -0,0 +1,96 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# ===============================
+# Intent labels
+# ===============================
+# Every chunk gets one intent label from its section name when the index
+# is built (embedding/build_faiss_index.py), so requests never scan
+# section strings. The unified index keeps per-service intent -> chunk ID
+# posting lists for scoped searches.
+INTENTS = ["documents", "eligibility", "process", "timeline", "fees", "correction"]
+
+# (intent, section keywords), checked in order
+SECTION_RULES = [
+    ("documents", ("document",)),
+    ("eligibility", ("eligibility",)),
+    ("process", ("process", "apply")),
+    ("timeline", ("time", "timeline")),
+    ("fees", ("fee",)),
+    ("correction", ("correction",)),
+]
+
+
+def section_intent(section: str) -> Optional[str]:
+    """Intent label of a section name (None if it has no intent)."""
+    section = section.lower()
+    for intent, keywords in SECTION_RULES:
+        if any(keyword in section for keyword in keywords):
+            return intent
+    return None
+
+
+def chunk_intent(chunk: Dict) -> Optional[str]:
+    """Label stored at index time; derived from the section for older indices."""
+    if "intent" in chunk:
+        return chunk["intent"]
+    return section_intent(chunk.get("section", ""))
+
+
+def intent_postings(metadata: Sequence[Dict], services: Dict[str, Dict]) -> Dict[str, Dict[str, np.ndarray]]:
+    """
+    Per-service intent -> global chunk IDs.
+
+    Args:
+        metadata: chunks by global ID
+        services: service -> {"start", "end"} ID ranges
+    """
+    postings = {}
+    for service, info in services.items():
+        by_intent = {}
+        for global_id in range(info["start"], info["end"]):
+            intent = chunk_intent(metadata[global_id])
+            if intent is not None:
+                by_intent.setdefault(intent, []).append(global_id)
+        postings[service] = {
+            intent: np.array(ids, dtype="int64") for intent, ids in by_intent.items()
+        }
+    return postings
+
+
+class IntentClassifier:
+    """
+    Nearest-centroid query intent classifier. Centroids are the mean
+    (normalized) vectors of the chunks labelled with each intent, so it
+    is learned from the index itself and needs no extra training data.
+    """
+
+    def __init__(self, labels: List[str], centroids: np.ndarray):
+        self.labels = labels
+        self.centroids = np.ascontiguousarray(centroids, dtype="float32")
+
+    @classmethod
+    def fit(cls, vectors: np.ndarray, labels: Sequence[Optional[str]]) -> Optional["IntentClassifier"]:
+        """Centroids of the labelled vectors; None if nothing is labelled."""
+        intents = [i for i in INTENTS if i in labels]
+        if not intents:
+            return None
+        labels = np.array([label or "" for label in labels])
+        centroids = np.stack([vectors[labels == intent].mean(axis=0) for intent in intents])
+        centroids /= np.linalg.norm(centroids, axis=1, keepdims=True)
+        return cls(intents, centroids)
+
+    def predict(self, vector: np.ndarray, min_score: float, min_margin: float) -> Tuple[Optional[str], float]:
+        """
+        Returns:
+            (intent, cosine score); intent is None unless the best centroid
+            scores at least min_score and beats the runner-up by min_margin
+        """
+        scores = self.centroids @ vector.reshape(-1)
+        order = np.argsort(-scores)
+        best = float(scores[order[0]])
+        runner_up = float(scores[order[1]]) if len(order) > 1 else -1.0
+        if best < min_score or best - runner_up < min_margin:
+            return None, best
+        return self.labels[order[0]], best
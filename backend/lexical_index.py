@@ -0,0 +1,192 @@
+import re
+import json
+import math
+import unicodedata
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# ===============================
+# BM25 lexical index
+# ===============================
+# Dense vectors are weak on exact tokens: portal names (K-SMART, ILGMS),
+# office abbreviations (TSO), amounts (₹25) and form numbers. This
+# inverted index scores chunks with BM25 and is fused with the dense
+# results in retrieval.py.
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Bump when tokenization changes: saved indices built with another
+# version are rebuilt on load
+TOKENIZER_VERSION = 1
+
+# Legacy chillu sequences (consonant + virama + ZWJ) -> atomic chillu letters
+_CHILLU = {
+    "ണ്‍": "ൺ",  # ṇ
+    "ന്‍": "ൻ",  # n
+    "ര്‍": "ർ",  # r
+    "ല്‍": "ൽ",  # l
+    "ള്‍": "ൾ",  # ḷ
+    "ക്‍": "ൿ",  # k
+}
+
+# Letters/digits of any script, plus the Malayalam block (its vowel signs
+# and virama are combining marks, which \w does not match)
+_WORD = r"(?:[^\W_]|[\u0d00-\u0d7f])"
+_TOKEN_RE = re.compile(rf"₹?{_WORD}+(?:[-./,]{_WORD}+)*")
+_SPLIT_RE = re.compile(r"[-./,₹]+")
+_DIGIT_GROUPING_RE = re.compile(r"(?<=\d),(?=\d)")
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "for",
+    "from", "how", "i", "if", "in", "is", "it", "me", "my", "of", "on",
+    "or", "the", "to", "what", "when", "where", "which", "who", "with"
+}
+
+
+def normalize(text: str) -> str:
+    text = unicodedata.normalize("NFC", text)
+    for legacy, chillu in _CHILLU.items():
+        text = text.replace(legacy, chillu)
+    # Joiners only affect rendering
+    return text.replace("\u200c", "").replace("\u200d", "").lower()
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercased word tokens (English and Malayalam). Compound tokens such
+    as "k-smart", "₹24,200" or "form-6" are kept whole (digit grouping
+    removed) and also split into their parts.
+    """
+    tokens = []
+    for match in _TOKEN_RE.finditer(normalize(text)):
+        token = _DIGIT_GROUPING_RE.sub("", match.group())
+        parts = [p for p in _SPLIT_RE.split(token) if p]
+        if len(parts) == 1 and not token.startswith("₹"):
+            if token not in STOPWORDS:
+                tokens.append(token)
+            continue
+        # Compound: whole token, separators dropped, then each part
+        tokens.append(token)
+        variants = ["".join(parts)] + (parts if len(parts) > 1 else [])
+        tokens.extend(v for v in dict.fromkeys(variants) if v != token and v not in STOPWORDS)
+    return tokens
+
+
+def chunk_document(chunk: Dict) -> str:
+    """Text indexed for a chunk: section name and body."""
+    return f"{chunk.get('section', '').replace('_', ' ')}\n{chunk.get('text', '')}"
+
+
+class BM25Index:
+    """
+    Inverted index over documents 0..n-1.
+
+    Attributes:
+        postings: term -> (doc ids, term frequencies)
+        doc_len: token count per document
+    """
+
+    def __init__(
+        self,
+        postings: Dict[str, Tuple[np.ndarray, np.ndarray]],
+        doc_len: np.ndarray,
+        k1: float = BM25_K1,
+        b: float = BM25_B
+    ):
+        self.postings = postings
+        self.doc_len = doc_len
+        self.k1 = k1
+        self.b = b
+        self.avgdl = float(doc_len.mean()) if len(doc_len) else 0.0
+        n = len(doc_len)
+        self.idf = {
+            term: math.log(1 + (n - len(ids) + 0.5) / (len(ids) + 0.5))
+            for term, (ids, _) in postings.items()
+        }
+
+    @classmethod
+    def build(cls, documents: Sequence[str]) -> "BM25Index":
+        term_docs = defaultdict(list)
+        doc_len = np.zeros(len(documents), dtype="float32")
+        for doc_id, document in enumerate(documents):
+            counts = Counter(tokenize(document))
+            doc_len[doc_id] = sum(counts.values())
+            for term, tf in counts.items():
+                term_docs[term].append((doc_id, tf))
+
+        postings = {
+            term: (
+                np.array([d for d, _ in docs], dtype="int64"),
+                np.array([tf for _, tf in docs], dtype="float32")
+            )
+            for term, docs in term_docs.items()
+        }
+        return cls(postings, doc_len)
+
+    def __len__(self) -> int:
+        return len(self.doc_len)
+
+    def search(
+        self,
+        query: str,
+        k: int,
+        ranges: Optional[List[Tuple[int, int]]] = None,
+        ids: Optional[np.ndarray] = None
+    ) -> List[Tuple[int, float]]:
+        """
+        Top-k documents for a query, optionally restricted to ID ranges
+        [start, end) or to a set of IDs.
+
+        Returns:
+            [(doc id, BM25 score)], best first
+        """
+        scores = np.zeros(len(self.doc_len), dtype="float32")
+        for term in set(tokenize(query)):
+            if term not in self.postings:
+                continue
+            doc_ids, tfs = self.postings[term]
+            norm = self.k1 * (1 - self.b + self.b * self.doc_len[doc_ids] / self.avgdl)
+            scores[doc_ids] += self.idf[term] * tfs * (self.k1 + 1) / (tfs + norm)
+
+        if ranges is not None or ids is not None:
+            allowed = np.zeros(len(scores), dtype=bool)
+            for start, end in ranges or ():
+                allowed[start:end] = True
+            if ids is not None:
+                allowed[ids] = True
+            scores[~allowed] = 0.0
+
+        candidates = np.flatnonzero(scores)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        ranked = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [(int(i), float(scores[i])) for i in ranked]
+
+    def save(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({
+                "tokenizer_version": TOKENIZER_VERSION,
+                "k1": self.k1,
+                "b": self.b,
+                "doc_len": self.doc_len.tolist(),
+                "postings": {
+                    term: [ids.tolist(), tfs.astype(int).tolist()]
+                    for term, (ids, tfs) in self.postings.items()
+                }
+            }, f, ensure_ascii=False, separators=(",", ":"))
+
+    @classmethod
+    def load(cls, path: str) -> Optional["BM25Index"]:
+        """Load a saved index; None if it was built by another tokenizer version."""
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("tokenizer_version") != TOKENIZER_VERSION:
+            return None
+        postings = {
+            term: (np.array(ids, dtype="int64"), np.array(tfs, dtype="float32"))
+            for term, (ids, tfs) in data["postings"].items()
+        }
+        return cls(postings, np.array(data["doc_len"], dtype="float32"), data["k1"], data["b"])
@@ -1,9 +1,20 @@
 import os
-import httpx
 import time
-from typing import List, Dict
+import asyncio
+import httpx
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from email.utils import parsedate_to_datetime
+import json
+from typing import AsyncIterator, List, Dict, Optional
 from dotenv import load_dotenv
-from matplotlib.style import context
+from answer_cache import answer_cache, CacheKey, ANSWER_CACHE_ENABLED
+from translation_cache import translation_cache, TRANSLATION_CACHE_ENABLED
+from embeddings import QueryEmbedding
+import rewrite_gate
+from intents import chunk_intent
+from metrics import counter, histogram
+from tracing import current_stage, otel_span, set_attributes
 
 # Load environment variables from .env file
 load_dotenv()
@@ -16,7 +27,41 @@ def is_malayalam(text: str) -> bool:
 # OpenRouter API configuration
 # Get your API key at: https://openrouter.ai/keys
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
-OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1/chat/completions"
+OPENROUTER_BASE_URL = os.getenv(
+    "OPENROUTER_BASE_URL",
+    "https://openrouter.ai/api/v1/chat/completions"
+)
+
+# Connection pool settings for the shared async client
+LLM_HTTP2 = os.getenv("LLM_HTTP2", "1") == "1"
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "20"))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "30"))
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "10"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+
+# Hedged requests: if the current model has not started responding within
+# LLM_HEDGE_DELAY seconds (roughly our p95 time-to-first-byte), the next
+# model is raced against it. LLM_REQUEST_BUDGET caps the whole chain.
+LLM_HEDGE_DELAY = float(os.getenv("LLM_HEDGE_DELAY", "6"))
+LLM_MAX_IN_FLIGHT = int(os.getenv("LLM_MAX_IN_FLIGHT", "2"))
+LLM_REQUEST_BUDGET = float(os.getenv("LLM_REQUEST_BUDGET", "30"))
+
+# Rate limited, payment required, model not found, or service unavailable
+RETRYABLE_STATUS = {429, 402, 404, 502, 503}
+
+# Per-model health tracking / circuit breaker
+LLM_HEALTH_WINDOW = int(os.getenv("LLM_HEALTH_WINDOW", "20"))
+# Outcomes older than this are forgotten, so one bad minute does not
+# demote a model for good
+LLM_HEALTH_WINDOW_SECONDS = float(os.getenv("LLM_HEALTH_WINDOW_SECONDS", "300"))
+LLM_HEALTH_EWMA_ALPHA = float(os.getenv("LLM_HEALTH_EWMA_ALPHA", "0.3"))
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "3"))
+LLM_BREAKER_ERROR_RATE = float(os.getenv("LLM_BREAKER_ERROR_RATE", "0.5"))
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))
+LLM_BREAKER_MAX_COOLDOWN = float(os.getenv("LLM_BREAKER_MAX_COOLDOWN", "600"))
+# Model not found / payment required will not fix themselves quickly
+LLM_DEAD_MODEL_COOLDOWN = float(os.getenv("LLM_DEAD_MODEL_COOLDOWN", "3600"))
 
 # Free models to try (in order of preference)
 # High-quality free models from https://openrouter.ai/models
@@ -105,37 +150,628 @@ Provide a brief, clear answer with bullet points for key information found in co
 "I don't have enough information about [topic] in my current knowledge base. Please try rephrasing your question or ask about a specific aspect like eligibility, documents required, or application process.\""""
 
 
-def synthesize_answer(
-    query: str,
-    chunks: List[Dict],
-    history: list = None
+# --- Shared async HTTP client ---
+_client: Optional[httpx.AsyncClient] = None
+
+
+def _http2_available() -> bool:
+    """HTTP/2 needs the optional h2 package (httpx[http2])."""
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def get_client() -> httpx.AsyncClient:
+    """
+    Return the process-wide AsyncClient, creating it on first use.
+    Connections to OpenRouter are kept alive and reused across requests.
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        http2 = LLM_HTTP2 and _http2_available()
+        if LLM_HTTP2 and not http2:
+            print("Warning: h2 not installed, falling back to HTTP/1.1")
+
+        _client = httpx.AsyncClient(
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=LLM_KEEPALIVE_EXPIRY
+            ),
+            timeout=httpx.Timeout(LLM_TIMEOUT, connect=LLM_CONNECT_TIMEOUT),
+            headers={
+                "Authorization": f"Bearer {OPENROUTER_API_KEY}",
+                "Content-Type": "application/json",
+                "HTTP-Referer": "http://localhost:3000",
+                "X-Title": "Kerala Government Services Assistant"
+            }
+        )
+    return _client
+
+
+async def close_client():
+    """Close the shared client (called on application shutdown)."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+# --- LLM Metrics ---
+# Labelled with the tracing stage that made the call (translate, rewrite,
+# synthesize, back_translate), so the sequential LLM calls of one request
+# can be told apart on /metrics.
+_llm_attempts = counter("llm_attempts_total", "LLM requests by stage, model and outcome")
+_llm_attempt_seconds = histogram("llm_attempt_duration_seconds", "Duration of single LLM requests")
+_llm_tokens = counter("llm_tokens_total", "Tokens reported by the provider, by kind (prompt/completion)")
+_llm_attempts_per_call = histogram(
+    "llm_attempts_per_call",
+    "Models tried per LLM call (more than 1 means retries or hedging)",
+    buckets=(1, 2, 3, 4, 6, 10)
+)
+
+
+@contextmanager
+def _attempt(model: str, stage: str = "", traced: bool = True):
+    """
+    Record one request to one model: outcome (success, HTTP status,
+    timeout, cancelled, error), duration and an OpenTelemetry span.
+    `stage` defaults to the current tracing stage; `traced=False` skips
+    the span (async generators cannot hold one across yields).
+    """
+    stage = stage or current_stage()
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        with otel_span("llm_attempt", **{"llm.model": model, "llm.stage": stage}) if traced else nullcontext():
+            yield
+        outcome = "success"
+    except httpx.HTTPStatusError as e:
+        outcome = str(e.response.status_code)
+        raise
+    except httpx.TimeoutException:
+        outcome = "timeout"
+        raise
+    except (asyncio.CancelledError, GeneratorExit):
+        outcome = "cancelled"
+        raise
+    finally:
+        _llm_attempts.inc(stage=stage, model=model, outcome=outcome)
+        _llm_attempt_seconds.observe(time.perf_counter() - start, stage=stage, model=model)
+
+
+def _record_usage(model: str, usage: Optional[Dict], stage: str = ""):
+    """Count the prompt/completion tokens of a response."""
+    if not usage:
+        return
+    stage = stage or current_stage()
+    for kind in ("prompt", "completion"):
+        tokens = usage.get(f"{kind}_tokens")
+        if tokens:
+            _llm_tokens.inc(tokens, stage=stage, model=model, kind=kind)
+    set_attributes(**{
+        "llm.prompt_tokens": usage.get("prompt_tokens"),
+        "llm.completion_tokens": usage.get("completion_tokens")
+    })
+
+
+# --- Model Health Registry ---
+class ModelHealth:
+    """
+    Rolling health of one model: recent outcomes, EWMA latency and a
+    circuit breaker (closed -> open -> half_open -> closed).
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, model: str):
+        self.model = model
+        self.outcomes = deque(maxlen=LLM_HEALTH_WINDOW)  # (time, True = success)
+        self.ewma_latency: Optional[float] = None
+        self.consecutive_failures = 0
+        self.state = self.CLOSED
+        self.open_until = 0.0
+        self.cooldown = LLM_BREAKER_COOLDOWN
+        self.probing = False
+
+    @property
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return 1.0 - sum(ok for _, ok in self.outcomes) / len(self.outcomes)
+
+    def refresh(self, now: float):
+        """Forget old outcomes and move an expired open breaker to half-open."""
+        while self.outcomes and now - self.outcomes[0][0] > LLM_HEALTH_WINDOW_SECONDS:
+            self.outcomes.popleft()
+        if self.state == self.OPEN and now >= self.open_until:
+            self.state = self.HALF_OPEN
+            self.probing = False
+
+    def trip(self, now: float, cooldown: float):
+        self.state = self.OPEN
+        self.open_until = now + cooldown
+        self.probing = False
+
+
+class ModelHealthRegistry:
+    """
+    Tracks every model in the chain so requests skip models that are known
+    to be failing and try the healthiest ones first.
+
+    All methods run on the event loop, so no locking is needed.
+    """
+
+    def __init__(self):
+        self._models: Dict[str, ModelHealth] = {}
+
+    def _get(self, model: str) -> ModelHealth:
+        if model not in self._models:
+            self._models[model] = ModelHealth(model)
+        return self._models[model]
+
+    def ordered(self, models: List[str]) -> List[str]:
+        """
+        Return the models worth trying, best first.
+
+        Open breakers are dropped entirely. A half-open model goes first
+        for its single probe (otherwise a recovered model would never be
+        tried while the others work), then lower recent error rate, then
+        lower EWMA latency (bucketed to whole seconds), then the configured
+        preference order.
+        """
+        now = time.monotonic()
+        candidates = []
+        for rank, model in enumerate(models):
+            health = self._get(model)
+            health.refresh(now)
+            if health.state == ModelHealth.OPEN:
+                continue
+            if health.state == ModelHealth.HALF_OPEN and health.probing:
+                continue
+            candidates.append((
+                health.state != ModelHealth.HALF_OPEN,
+                round(health.error_rate, 1),
+                int(health.ewma_latency or 0),
+                rank,
+                model
+            ))
+        return [c[-1] for c in sorted(candidates)]
+
+    def acquire(self, model: str) -> bool:
+        """
+        Reserve a model for an attempt. A half-open model admits a single
+        probe request at a time.
+        """
+        health = self._get(model)
+        health.refresh(time.monotonic())
+        if health.state == ModelHealth.OPEN:
+            return False
+        if health.state == ModelHealth.HALF_OPEN:
+            if health.probing:
+                return False
+            health.probing = True
+        return True
+
+    def release(self, model: str):
+        """Give back a reservation without an outcome (attempt cancelled)."""
+        self._get(model).probing = False
+
+    def record_success(self, model: str, latency: float):
+        health = self._get(model)
+        health.outcomes.append((time.monotonic(), True))
+        health.consecutive_failures = 0
+        if health.ewma_latency is None:
+            health.ewma_latency = latency
+        else:
+            health.ewma_latency = (
+                LLM_HEALTH_EWMA_ALPHA * latency
+                + (1 - LLM_HEALTH_EWMA_ALPHA) * health.ewma_latency
+            )
+        if health.state != ModelHealth.CLOSED:
+            print(f"Model {model} recovered, closing circuit")
+        health.state = ModelHealth.CLOSED
+        health.probing = False
+        health.cooldown = LLM_BREAKER_COOLDOWN
+
+    def record_failure(
+        self,
+        model: str,
+        status: Optional[int] = None,
+        retry_after: Optional[float] = None
+    ):
+        now = time.monotonic()
+        health = self._get(model)
+        health.refresh(now)
+        health.outcomes.append((now, False))
+        health.consecutive_failures += 1
+
+        if status in (402, 404):
+            cooldown = LLM_DEAD_MODEL_COOLDOWN
+        elif retry_after is not None:
+            cooldown = retry_after
+        elif health.state == ModelHealth.HALF_OPEN:
+            # Failed probe: back off harder
+            cooldown = min(health.cooldown * 2, LLM_BREAKER_MAX_COOLDOWN)
+        elif (
+            health.consecutive_failures >= LLM_BREAKER_FAILURES
+            or (
+                len(health.outcomes) >= LLM_BREAKER_FAILURES
+                and health.error_rate >= LLM_BREAKER_ERROR_RATE
+            )
+        ):
+            cooldown = health.cooldown
+        else:
+            return
+
+        health.cooldown = max(cooldown, LLM_BREAKER_COOLDOWN)
+        health.trip(now, cooldown)
+        print(f"Circuit open for {model} ({cooldown:.0f}s)")
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """Current health of every model seen so far."""
+        now = time.monotonic()
+        result = {}
+        for model, health in self._models.items():
+            health.refresh(now)
+            result[model] = {
+                "state": health.state,
+                "error_rate": round(health.error_rate, 3),
+                "ewma_latency": health.ewma_latency,
+                "open_for": max(0.0, health.open_until - now)
+                if health.state == ModelHealth.OPEN else 0.0
+            }
+        return result
+
+
+model_health = ModelHealthRegistry()
+
+
+def _retry_after_seconds(response: httpx.Response) -> Optional[float]:
+    """Parse a Retry-After header given in seconds or as an HTTP date."""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+async def _chat_completion(
+    model: str,
+    messages: List[Dict],
+    max_tokens: int,
+    temperature: float = 0.3,
+    first_byte: Optional[asyncio.Event] = None
 ) -> str:
-    
-    history_text = ""
-    if history:
-        history_text = "\n".join(
-        f"{m.role}: {m.content}" for m in history[-4:]
+    """
+    Send one chat completion request and return the message content.
+    `first_byte` is set as soon as a successful response starts arriving.
+    """
+    with _attempt(model):
+        async with get_client().stream(
+            "POST",
+            OPENROUTER_BASE_URL,
+            json={
+                "model": model,
+                "messages": messages,
+                "temperature": temperature,
+                "max_tokens": max_tokens
+            }
+        ) as response:
+            if first_byte is not None and response.is_success:
+                first_byte.set()
+            await response.aread()
+
+        response.raise_for_status()
+        result = response.json()
+        _record_usage(model, result.get("usage"))
+        # OpenRouter reports some provider errors in a 200 body
+        if not result.get("choices"):
+            raise ValueError(f"Model {model} returned no choices: {result.get('error')}")
+        return result["choices"][0]["message"]["content"]
+
+
+async def _hedged_completion(
+    messages: List[Dict],
+    max_tokens: int,
+    models: List[str]
+) -> str:
+    """
+    Race models in the given order (healthiest first, see ModelHealthRegistry).
+
+    The first model starts immediately. Another one is launched when the
+    in-flight attempts have produced no first byte within LLM_HEDGE_DELAY,
+    or as soon as an attempt fails. The first successful answer wins and
+    every other attempt is cancelled.
+    """
+    loop = asyncio.get_running_loop()
+    queue = list(models)
+    in_flight = {}  # task -> (model, first_byte event, start time)
+    last_error = None
+    last_launch = 0.0
+    attempts = 0
+
+    def launch() -> bool:
+        nonlocal last_launch, attempts
+        while queue:
+            model = queue.pop(0)
+            if model_health.acquire(model):
+                break
+        else:
+            return False
+        print(f"Trying model: {model}...")
+        first_byte = asyncio.Event()
+        task = asyncio.create_task(
+            _chat_completion(model, messages, max_tokens, first_byte=first_byte)
+        )
+        in_flight[task] = (model, first_byte, loop.time())
+        last_launch = loop.time()
+        attempts += 1
+        return True
+
+    try:
+        while queue or in_flight:
+            if not in_flight and not launch():
+                break
+
+            responding = any(ev.is_set() for _, ev, _ in in_flight.values())
+            can_hedge = queue and len(in_flight) < LLM_MAX_IN_FLIGHT and not responding
+            timeout = (
+                max(0.0, last_launch + LLM_HEDGE_DELAY - loop.time())
+                if can_hedge else None
+            )
+
+            done, _ = await asyncio.wait(
+                in_flight,
+                timeout=timeout,
+                return_when=asyncio.FIRST_COMPLETED
+            )
+
+            if not done:
+                print(f"No response within {LLM_HEDGE_DELAY}s, hedging with next model...")
+                launch()
+                continue
+
+            for task in done:
+                model, _, started = in_flight.pop(task)
+                try:
+                    content = task.result()
+                    model_health.record_success(model, loop.time() - started)
+                    set_attributes(**{"llm.model": model, "llm.attempts": attempts})
+                    print(f"Success with model: {model}")
+                    return content
+                except httpx.TimeoutException as e:
+                    last_error = e
+                    model_health.record_failure(model)
+                    print(f"Model {model} timed out, trying next...")
+                except httpx.HTTPStatusError as e:
+                    status = e.response.status_code
+                    if status not in RETRYABLE_STATUS:
+                        model_health.release(model)
+                        raise  # Other errors, don't retry
+                    last_error = e
+                    model_health.record_failure(
+                        model, status, _retry_after_seconds(e.response)
+                    )
+                    print(f"Model {model} unavailable ({status}), trying next...")
+                except httpx.TransportError as e:
+                    last_error = e
+                    model_health.record_failure(model)
+                    print(f"Model {model} connection failed ({e}), trying next...")
+                except Exception as e:
+                    # Error bodies, bad JSON: still a failed attempt
+                    last_error = e
+                    model_health.record_failure(model)
+                    print(f"Model {model} failed ({e!r}), trying next...")
+
+            # Replace failed attempts right away instead of waiting to hedge
+            if queue and len(in_flight) < LLM_MAX_IN_FLIGHT and in_flight:
+                launch()
+    finally:
+        for task, (model, _, _) in in_flight.items():
+            task.cancel()
+            model_health.release(model)
+        if attempts:
+            _llm_attempts_per_call.observe(attempts, stage=current_stage())
+
+    raise last_error or Exception("All models failed")
+
+
+async def complete(
+    messages: List[Dict],
+    max_tokens: int,
+    budget: float = None
+) -> str:
+    """
+    Get a completion from the FREE_MODELS chain within a latency budget.
+
+    Raises:
+        asyncio.TimeoutError: the budget ran out before any model answered
+        httpx.HTTPError: every model failed, or a non-retryable error occurred
+    """
+    return await asyncio.wait_for(
+        _hedged_completion(messages, max_tokens, model_health.ordered(FREE_MODELS)),
+        timeout=budget or LLM_REQUEST_BUDGET
     )
 
 
+async def _stream_completion(
+    model: str,
+    messages: List[Dict],
+    max_tokens: int,
+    temperature: float = 0.3,
+    stage: str = ""
+) -> AsyncIterator[str]:
+    """Stream one chat completion (`stream: true`), yielding content deltas."""
+    with _attempt(model, stage, traced=False):
+        async with get_client().stream(
+            "POST",
+            OPENROUTER_BASE_URL,
+            json={
+                "model": model,
+                "messages": messages,
+                "temperature": temperature,
+                "max_tokens": max_tokens,
+                "stream": True,
+                # Token counts arrive in the last chunk
+                "usage": {"include": True}
+            }
+        ) as response:
+            if not response.is_success:
+                await response.aread()
+                response.raise_for_status()
+
+            async for line in response.aiter_lines():
+                # Skip blank lines and SSE comments (": OPENROUTER PROCESSING")
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                chunk = json.loads(data)
+                _record_usage(model, chunk.get("usage"), stage)
+                if not chunk.get("choices"):
+                    continue
+                delta = chunk["choices"][0].get("delta", {}).get("content")
+                if delta:
+                    yield delta
+
+
+async def stream_complete(
+    messages: List[Dict],
+    max_tokens: int,
+    budget: float = None,
+    stage: str = ""
+) -> AsyncIterator[str]:
     """
-    Takes retrieved chunks and synthesizes a coherent answer using LLM via OpenRouter.
-    
-    Args:
-        query: The user's question
-        chunks: List of retrieved chunks with text, service, section, etc.
-    
+    Stream a completion from the healthiest model that starts answering.
+
+    Models are tried in model_health order until one produces its first
+    token; from then on that model's stream is forwarded as-is. The budget
+    bounds the time to first token. `stage` labels the LLM metrics (a
+    stream outlives the tracing span it was started in).
+
+    Raises:
+        asyncio.TimeoutError: no model produced a token within the budget
+        httpx.HTTPError: every model failed before its first token
+        Exception: the chosen model's stream failed after its first token
+            (the deltas yielded so far are an incomplete answer)
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + (budget or LLM_REQUEST_BUDGET)
+    last_error = None
+    stage = stage or current_stage()
+    attempts = 0
+
+    try:
+        for model in model_health.ordered(FREE_MODELS):
+            if not model_health.acquire(model):
+                continue
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                model_health.release(model)
+                raise asyncio.TimeoutError()
+
+            print(f"Streaming from model: {model}...")
+            attempts += 1
+            started = loop.time()
+            stream = _stream_completion(model, messages, max_tokens, stage=stage)
+            try:
+                first = await asyncio.wait_for(stream.__anext__(), timeout=remaining)
+            except StopAsyncIteration:
+                last_error = Exception(f"Model {model} returned an empty stream")
+                model_health.record_failure(model)
+                continue
+            except asyncio.TimeoutError:
+                model_health.release(model)
+                await stream.aclose()
+                raise
+            except httpx.TimeoutException as e:
+                last_error = e
+                model_health.record_failure(model)
+                print(f"Model {model} timed out, trying next...")
+                continue
+            except httpx.HTTPStatusError as e:
+                status = e.response.status_code
+                if status not in RETRYABLE_STATUS:
+                    model_health.release(model)
+                    raise
+                last_error = e
+                model_health.record_failure(
+                    model, status, _retry_after_seconds(e.response)
+                )
+                print(f"Model {model} unavailable ({status}), trying next...")
+                continue
+            except httpx.TransportError as e:
+                last_error = e
+                model_health.record_failure(model)
+                print(f"Model {model} connection failed ({e}), trying next...")
+                continue
+            except Exception as e:
+                # Error bodies, bad JSON: still a failed attempt
+                last_error = e
+                model_health.record_failure(model)
+                print(f"Model {model} failed ({e!r}), trying next...")
+                await stream.aclose()
+                continue
+            except BaseException:
+                # Cancelled (e.g. the client disconnected): give the model
+                # back, or a half-open probe would stay reserved for good
+                model_health.release(model)
+                await stream.aclose()
+                raise
+
+            # Latency here is time to first token
+            model_health.record_success(model, loop.time() - started)
+            set_attributes(**{"llm.model": model, "llm.attempts": attempts})
+            try:
+                yield first
+                async for delta in stream:
+                    yield delta
+            except Exception as e:
+                # The answer is cut off: not a success after all
+                model_health.record_failure(model)
+                print(f"Model {model} failed mid-stream ({e!r})")
+                raise
+            finally:
+                await stream.aclose()
+            return
+    finally:
+        if attempts:
+            _llm_attempts_per_call.observe(attempts, stage=stage)
+
+    raise last_error or Exception("All models failed")
+
+
+def _answer_prompt(query: str, chunks: List[Dict], history: list = None):
+    """
+    Build the synthesis messages for a question.
+
     Returns:
-        Synthesized answer string
+        (messages, chunks) - chunks after the documents-only filter
     """
-    if not chunks:
-        return "I couldn't find any relevant information for your question. Please try rephrasing or ask about a different government service."
-    
+    history_text = ""
+    if history:
+        history_text = "\n".join(
+        f"{m.role}: {m.content}" for m in history[-4:]
+    )
+
     # 🔒 HARD STOP: documents-only questions
     if "document" in query.lower():
         chunks = [
             c for c in chunks
-            if "document" in c["section"].lower()
+            if chunk_intent(c) == "documents"
         ] or chunks[:1]
         
     # Format chunks into context string
@@ -159,58 +795,102 @@ def synthesize_answer(
 
     Provide a clear, helpful answer based ONLY on the context above:"""
 
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": user_message}
+    ]
+    return messages, chunks
+
+
+NO_CHUNKS_ANSWER = "I couldn't find any relevant information for your question. Please try rephrasing or ask about a different government service."
+
+
+async def synthesize_answer(
+    query: str,
+    chunks: List[Dict],
+    history: list = None,
+    cache_key: CacheKey = None
+) -> str:
+    """
+    Takes retrieved chunks and synthesizes a coherent answer using LLM via OpenRouter.
+    
+    Args:
+        query: The user's question
+        chunks: List of retrieved chunks with text, service, section, etc.
+        history: Recent chat messages, passed to the LLM as reference only
+        cache_key: Enables the semantic answer cache for this request
+    
+    Returns:
+        Synthesized answer string
+    """
+    if not chunks:
+        return NO_CHUNKS_ANSWER
+
+    use_cache = cache_key is not None and ANSWER_CACHE_ENABLED
+    if use_cache:
+        cached = answer_cache.lookup(cache_key)
+        if cached is not None:
+            print(f"Answer cache hit for {cache_key.service}")
+            return cached
+
+    messages, chunks = _answer_prompt(query, chunks, history)
+
     try:
-        # Try multiple free models with retry logic
-        last_error = None
-        for model in FREE_MODELS:
-            try:
-                print(f"Trying model: {model}...")
-                response = httpx.post(
-                    OPENROUTER_BASE_URL,
-                    headers={
-                        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-                        "Content-Type": "application/json",
-                        "HTTP-Referer": "http://localhost:3000",
-                        "X-Title": "Kerala Government Services Assistant"
-                    },
-                    json={
-                        "model": model,
-                        "messages": [
-                            {"role": "system", "content": SYSTEM_PROMPT},
-                            {"role": "user", "content": user_message}
-                        ],
-                        "temperature": 0.3,
-                        "max_tokens": 350
-                    },
-                    timeout=60.0
-                )
-                response.raise_for_status()
-                
-                result = response.json()
-                print(f"Success with model: {model}")
-                return result["choices"][0]["message"]["content"]
-            except httpx.TimeoutException as e:
-                last_error = e
-                print(f"Model {model} timed out, trying next...")
-                continue
-            except httpx.HTTPStatusError as e:
-                last_error = e
-                if e.response.status_code in [429, 402, 404, 503]:
-                    # Rate limited, payment required, model not found, or service unavailable
-                    print(f"Model {model} unavailable ({e.response.status_code}), trying next...")
-                    time.sleep(0.5)
-                    time.sleep(0.5)
-                    continue
-                raise  # Other errors, don't retry
-        
-        # All models failed
-        raise last_error or Exception("All models failed")
+        answer = await complete(messages, max_tokens=350)
+        # Only real LLM answers are cached, never fallbacks
+        if use_cache:
+            answer_cache.store(cache_key, answer)
+        return answer
+    except asyncio.TimeoutError:
+        print(f"LLM synthesis exceeded {LLM_REQUEST_BUDGET}s budget")
+        return fallback_response(query, chunks)
     except Exception as e:
         # Fallback: return formatted chunks if LLM fails
         print(f"LLM synthesis failed: {e}")
         return fallback_response(query, chunks)
 
 
+async def stream_answer(
+    query: str,
+    chunks: List[Dict],
+    history: list = None,
+    cache_key: CacheKey = None
+) -> AsyncIterator[str]:
+    """
+    Streaming variant of synthesize_answer: yields answer text deltas as
+    the model produces them. Falls back to fallback_response (as a single
+    delta) when no model starts answering. A cache hit is yielded whole.
+    """
+    if not chunks:
+        yield NO_CHUNKS_ANSWER
+        return
+
+    use_cache = cache_key is not None and ANSWER_CACHE_ENABLED
+    if use_cache:
+        cached = answer_cache.lookup(cache_key)
+        if cached is not None:
+            print(f"Answer cache hit for {cache_key.service}")
+            yield cached
+            return
+
+    messages, chunks = _answer_prompt(query, chunks, history)
+
+    started = False
+    parts = []
+    try:
+        async for delta in stream_complete(messages, max_tokens=350, stage="synthesize"):
+            started = True
+            parts.append(delta)
+            yield delta
+        if use_cache:
+            answer_cache.store(cache_key, "".join(parts))
+    except Exception as e:
+        print(f"LLM streaming synthesis failed: {e!r}")
+        if started:
+            raise  # Cut off mid-answer: the caller must not treat it as complete
+        yield fallback_response(query, chunks)
+
+
 def fallback_response(query: str, chunks: List[Dict]) -> str:
     """
     Intent-aware fallback response when LLM is unavailable.
@@ -234,7 +914,7 @@ def fallback_response(query: str, chunks: List[Dict]) -> str:
 
 
 # --- Reusable LLM Call Function ---
-def call_llm(prompt: str, system_prompt: str = None, max_tokens: int = 512) -> str:
+async def call_llm(prompt: str, system_prompt: str = None, max_tokens: int = 512) -> str:
     """
     Generic LLM call function for translation and other tasks.
     
@@ -249,42 +929,27 @@ def call_llm(prompt: str, system_prompt: str = None, max_tokens: int = 512) -> s
     if system_prompt is None:
         system_prompt = "You are a helpful assistant. Follow instructions precisely."
     
-    last_error = None
-    for model in FREE_MODELS:
-        try:
-            response = httpx.post(
-                OPENROUTER_BASE_URL,
-                headers={
-                    "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-                    "Content-Type": "application/json",
-                    "HTTP-Referer": "http://localhost:3000",
-                    "X-Title": "Kerala Government Services Assistant"
-                },
-                json={
-                    "model": model,
-                    "messages": [
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": prompt}
-                    ],
-                    "temperature": 0.3,
-                    "max_tokens": max_tokens
-                },
-                timeout=60.0
-            )
-            response.raise_for_status()
-            result = response.json()
-            return result["choices"][0]["message"]["content"]
-        except (httpx.TimeoutException, httpx.HTTPStatusError) as e:
-            last_error = e
-            time.sleep(0.5)
-            continue
-    
-    raise last_error or Exception("All models failed")
+    return await complete(
+        [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": prompt}
+        ],
+        max_tokens=max_tokens
+    )
 
 
 # --- Translation Functions ---
-def translate_ml_to_en(text: str) -> str:
+# Bump when a translation prompt changes so cached translations are not reused
+TRANSLATION_PROMPT_VERSION = "v1"
+
+
+async def translate_ml_to_en(text: str) -> str:
     """Translate Malayalam text to English using LLM."""
+    if TRANSLATION_CACHE_ENABLED:
+        cached = await translation_cache.get(text, "ml-en", TRANSLATION_PROMPT_VERSION)
+        if cached is not None:
+            return cached
+
     prompt = f"""Translate the following Malayalam text to English.
 Do not add, remove, or explain anything.
 Only translate.
@@ -292,33 +957,93 @@ Only translate.
 Text:
 {text}"""
     try:
-        return call_llm(prompt, max_tokens=256)
+        translation = await call_llm(prompt, max_tokens=256)
     except Exception as e:
         print(f"Translation ML->EN failed: {e}")
         return text  # Return original if translation fails
 
+    if TRANSLATION_CACHE_ENABLED:
+        await translation_cache.put(text, "ml-en", TRANSLATION_PROMPT_VERSION, translation)
+    return translation
 
-def translate_en_to_ml(text: str) -> str:
-    """Translate English text to Malayalam using LLM."""
-    prompt = f"""Translate the following English text to Malayalam.
+
+def _en_to_ml_prompt(text: str) -> str:
+    return f"""Translate the following English text to Malayalam.
 Keep it clear and simple.
 Do not add extra information.
 
 Text:
 {text}"""
+
+
+async def translate_en_to_ml(text: str) -> str:
+    """Translate English text to Malayalam using LLM."""
+    if TRANSLATION_CACHE_ENABLED:
+        cached = await translation_cache.get(text, "en-ml", TRANSLATION_PROMPT_VERSION)
+        if cached is not None:
+            return cached
+
+    prompt = _en_to_ml_prompt(text)
     try:
-        return call_llm(prompt, max_tokens=512)
+        translation = await call_llm(prompt, max_tokens=512)
     except Exception as e:
         print(f"Translation EN->ML failed: {e}")
         return text  # Return original if translation fails
 
-def rewrite_query(user_query: str, history: list) -> str:
+    if TRANSLATION_CACHE_ENABLED:
+        await translation_cache.put(text, "en-ml", TRANSLATION_PROMPT_VERSION, translation)
+    return translation
+
+
+async def stream_translate_en_to_ml(text: str) -> AsyncIterator[str]:
+    """Streaming variant of translate_en_to_ml, yielding Malayalam deltas."""
+    if TRANSLATION_CACHE_ENABLED:
+        cached = await translation_cache.get(text, "en-ml", TRANSLATION_PROMPT_VERSION)
+        if cached is not None:
+            yield cached
+            return
+
+    messages = [
+        {"role": "system", "content": "You are a helpful assistant. Follow instructions precisely."},
+        {"role": "user", "content": _en_to_ml_prompt(text)}
+    ]
+    started = False
+    parts = []
+    try:
+        async for delta in stream_complete(messages, max_tokens=512, stage="back_translate"):
+            started = True
+            parts.append(delta)
+            yield delta
+        if TRANSLATION_CACHE_ENABLED:
+            await translation_cache.put(
+                text, "en-ml", TRANSLATION_PROMPT_VERSION, "".join(parts)
+            )
+    except Exception as e:
+        print(f"Streaming translation EN->ML failed: {e!r}")
+        if started:
+            raise  # Cut off mid-translation: the caller must not treat it as complete
+        yield text  # Return original if translation fails
+
+
+async def rewrite_query(
+    user_query: str,
+    history: list,
+    query_embedding: QueryEmbedding = None
+) -> str:
     """
     Rewrite a follow-up question into a standalone question using chat history.
+
+    The LLM is only called when the local rewrite gate decides the question
+    depends on earlier turns. Pass the query's QueryEmbedding so the gate
+    can reuse its vector.
     """
     if not history:
         return user_query
 
+    # The gate may run an encode: keep it off the event loop
+    if not await asyncio.to_thread(rewrite_gate.gate, user_query, history, query_embedding):
+        return user_query
+
     recent = history[-4:]  # limit context
     history_text = "\n".join(
         f"{m.role}: {m.content}" for m in recent
@@ -339,7 +1064,7 @@ Do NOT add new information.
 """
 
     try:
-        rewritten = call_llm(prompt, max_tokens=128)
+        rewritten = await call_llm(prompt, max_tokens=128)
         return rewritten.strip()
     except Exception:
         return user_query
@@ -1,25 +1,110 @@
-from fastapi import FastAPI
-from retrieval import retrieve_chunks
-from models import QueryRequest, AskRequest, AskResponse
+import time
+
+# Import-time cost is part of pod cold start: measure it
+_import_started = time.perf_counter()
+
+import os
+import hmac
+import json
+import asyncio
+import numpy as np
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response, Header
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse, PlainTextResponse
+from retrieval import (
+    retrieve_chunks,
+    retrieve_batch,
+    retrieve_routed,
+    route_and_retrieve,
+    route_query,
+    route_queries,
+    get_available_services,
+    classify_intent,
+    fuse_results,
+    get_index_version,
+    reload_indices,
+    start_index_watcher
+)
+from models import QueryRequest, AskRequest, AskResponse, BatchQueryRequest, BatchAskRequest
 from llm import (
     synthesize_answer,
+    stream_answer,
+    stream_translate_en_to_ml,
     is_malayalam,
     rewrite_query,  
     translate_ml_to_en,
-    translate_en_to_ml
+    translate_en_to_ml,
+    close_client
 )
 from fastapi.middleware.cors import CORSMiddleware
-from service_detection import detect_service
-from next_step_recommender import recommend_next_steps
+from service_router import RoutingDecision
+from embeddings import embed_query, embed_queries
+from answer_cache import CacheKey
+from next_step_recommender import recommend_next_steps, recommend_next_steps_batch
+from reranker import confident_top
 from utils import detect_current_intent
+from intents import chunk_intent
+from pipeline import Pipeline
+from tracing import span
+from resources import registry
+import metrics
+
+
+# Warm-up of lazily loaded resources (encoder, indices, models):
+#   background - start serving immediately, /readyz turns 200 when loaded
+#   blocking   - load everything before the app starts accepting requests
+#   off        - load each resource on first use
+WARMUP_MODE = os.getenv("WARMUP_MODE", "background")
+IMPORT_TIME_BUDGET = float(os.getenv("IMPORT_TIME_BUDGET", "3.0"))
+
+# Token for /admin/* endpoints (admin endpoints are disabled when unset)
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    warmup = None
+    if WARMUP_MODE == "blocking":
+        await run_in_threadpool(registry.warm_up)
+    elif WARMUP_MODE == "background":
+        warmup = asyncio.create_task(run_in_threadpool(registry.warm_up))
+    # Hot-reload rebuilt indices
+    stop_watcher = start_index_watcher()
+
+    yield
+
+    if stop_watcher is not None:
+        stop_watcher.set()
+    if warmup is not None and not warmup.done():
+        warmup.cancel()
+    # Release pooled OpenRouter connections
+    await close_client()
 
 
 app = FastAPI(
     title="Kerala Government Services Assistant",
     description="Multilingual retrieval API for government services",
-    version="1.0"
+    version="1.0",
+    lifespan=lifespan
 )
 
+# Retrieve on the raw query while translation/rewrite are still running
+SPECULATIVE_RETRIEVAL = os.getenv("SPECULATIVE_RETRIEVAL", "1") == "1"
+
+# Batch endpoints (kiosk / IVR queues): queries per request, and LLM
+# calls (translation, rewrite, synthesis) in flight per batch
+BATCH_MAX_QUERIES = int(os.getenv("BATCH_MAX_QUERIES", "64"))
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "8"))
+
+UNKNOWN_SERVICE_ANSWER = (
+    "I can help with ration card, birth certificate, or unemployment allowance. "
+    "Please specify the service."
+)
+
+# Appended to an answer whose stream broke off after the first token
+INTERRUPTED_ANSWER_NOTE = "\n\n⚠️ The answer was interrupted. Please ask again."
+
 # CORS middleware for frontend access
 app.add_middleware(
     CORSMiddleware,
@@ -30,60 +115,28 @@ app.add_middleware(
 )
 
 
-@app.post("/ask", response_model=AskResponse)
-def ask(request: AskRequest):
-    original_query = request.query
-    history = request.history or []
-
-    # 🌐 Language detection
-    malayalam = is_malayalam(original_query)
-
-    if malayalam:
-        query_for_rag = translate_ml_to_en(original_query)
-    else:
-        query_for_rag = original_query
+def _encoded(query_embedding):
+    """Force a QueryEmbedding to encode now (used as a threadpool stage)."""
+    query_embedding.matrix
+    return query_embedding
 
-    # 🧠 Rewrite follow-up into standalone query
-    standalone_query = rewrite_query(query_for_rag, history)
 
-# 🔍 Detect service from question
-# 🔍 Detect service from question (ONLY as fallback)
-    service = request.service
-    detected_service = detect_service(standalone_query)
-
-# ✅ Auto-detect ONLY if dropdown is NOT selected
-    if service is None and detected_service:
-        service = detected_service
-
-    # 🛑 HARD STOP if service still unknown
-    if not service:
-        return AskResponse(
-            query=original_query,
-            answer=(
-                "I can help with ration card, birth certificate, or unemployment allowance. "
-                "Please specify the service."
-            ),
-            language="ml" if malayalam else "en",
-            sources=[],
-            service=None,
-            next_steps=[]
-        )
-
-    # 📥 STEP 1: Retrieve chunks (STRICT service)
-    chunks = retrieve_chunks(
-        standalone_query,
-        service=service,
-        k=request.top_k
-    )
+def _filter_by_intent(chunks: list):
+    """
+    Detect the current intent from the top chunk and keep only chunks
+    from matching sections.
 
+    Returns:
+        (chunks, current_intent)
+    """
     # 🧭 STEP 2: Detect intent EARLY
     current_intent = detect_current_intent(chunks)
 
-    # 🔒 STEP 3: Intent-based chunk filtering
+    # 🔒 STEP 3: Intent-based chunk filtering (labels set at index time)
     if current_intent:
         intent_filtered_chunks = [
             c for c in chunks
-            if current_intent in c["section"].lower()
+            if chunk_intent(c) == current_intent
         ]
 
         # Safety: ensure at least one chunk survives
@@ -92,45 +145,369 @@ def ask(request: AskRequest):
         else:
             chunks = chunks[:1]
 
+    return chunks, current_intent
+
+
+def _build_pipeline(request: AskRequest, malayalam: bool) -> Pipeline:
+    """
+    Stage graph for everything /ask needs before synthesis.
+
+        translate ─> rewrite ─> embed ─> detect ─> retrieve ─> intent ─> next_steps
+        embed_raw ─> detect_raw ─> retrieve_raw   (speculative, raw query)
+
+    `detect` routes the query (service_router.py) and `service` is the
+    service finally answered from: the routed one, or the owner of the top
+    chunk when an ambiguous route searched several services.
+
+    The speculative branch runs on the raw (possibly Malayalam) query while
+    the translate/rewrite LLM calls are in flight. When the final standalone
+    query turns out to be the raw query (English without a needed rewrite,
+    or a failed translation) its results are used as they are; otherwise
+    its hits from the final service are fused (RRF) with the final query's.
+    """
+    original_query = request.query
+    history = request.history or []
+    pipe = Pipeline()
+
+    def detect(query_embedding):
+        # ✅ Auto-detect ONLY if dropdown is NOT selected
+        if request.service:
+            return RoutingDecision(request.service, [request.service], 1.0, 1.0, {request.service: 1.0})
+        return route_query(query_embedding)
+
+    def retrieve(query_embedding, decision):
+        # 🛑 No retrieval if service still unknown
+        if not decision.service:
+            return []
+        # 📥 STEP 1: Retrieve chunks (STRICT service, scoped to the
+        # query intent when the classifier is confident). An ambiguous
+        # route searches its candidate services together; the chunks
+        # all come from the service owning the best one.
+        _, chunks = retrieve_routed(
+            query_embedding,
+            decision,
+            k=request.top_k,
+            intent=classify_intent(query_embedding)
+        )
+        return chunks
+
+    def resolve_service(decision, chunks):
+        return chunks[0]["service"] if chunks else decision.service
+
+    def speculated(query_embedding) -> bool:
+        return SPECULATIVE_RETRIEVAL and query_embedding.text == original_query
+
+    # 🌐 Translate Malayalam queries for RAG
+    async def translate():
+        if malayalam:
+            return await translate_ml_to_en(original_query)
+        return original_query
+
+    # 🧠 Rewrite follow-up into standalone query (only when needed)
+    async def rewrite(query_for_rag):
+        if query_for_rag == original_query:
+            query_embedding = await pipe.get("embed_raw")
+        else:
+            query_embedding = embed_query(query_for_rag)
+        standalone_query = await rewrite_query(query_for_rag, history, query_embedding)
+        if standalone_query == query_for_rag:
+            return query_embedding
+        return embed_query(standalone_query)
+
+    # 🔍 Detect service / retrieve, reusing the speculative results if possible
+    async def detect_final(query_embedding):
+        if speculated(query_embedding):
+            return await pipe.get("detect_raw")
+        return await run_in_threadpool(detect, query_embedding)
+
+    async def retrieve_final(query_embedding, decision):
+        if speculated(query_embedding):
+            chunks = await pipe.get("retrieve_raw")
+        else:
+            chunks = await run_in_threadpool(retrieve, query_embedding, decision)
+            if SPECULATIVE_RETRIEVAL:
+                # Raw-query hits help too (the encoder is multilingual),
+                # but only from the service the final query is answered from
+                service = chunks[0]["service"] if chunks else decision.service
+                raw = [c for c in await pipe.get("retrieve_raw") if c["service"] == service]
+                if raw:
+                    chunks = fuse_results([chunks, raw], request.top_k)
+        # One chunk is enough when the reranker is sure about it
+        return confident_top(chunks)
+
+    # 🔮 Next step recommendation, concurrent with synthesis
+    def next_steps(intent_result, service):
+        _, current_intent = intent_result
+        if not current_intent:
+            return []
+        return recommend_next_steps(service, current_intent)
+
+    pipe.add("embed_raw", lambda: _encoded(embed_query(original_query)), blocking=True)
+    if SPECULATIVE_RETRIEVAL:
+        pipe.add("detect_raw", detect, ["embed_raw"], blocking=True)
+        pipe.add("retrieve_raw", retrieve, ["embed_raw", "detect_raw"], blocking=True)
+
+    pipe.add("translate", translate)
+    pipe.add("rewrite", rewrite, ["translate"])
+    pipe.add("embed", _encoded, ["rewrite"], blocking=True)
+    pipe.add("detect", detect_final, ["embed"])
+    pipe.add("retrieve", retrieve_final, ["embed", "detect"])
+    pipe.add("service", resolve_service, ["detect", "retrieve"])
+    pipe.add("intent", _filter_by_intent, ["retrieve"])
+    pipe.add("next_steps", next_steps, ["intent", "service"])
+    return pipe
+
+
+async def _prepare_answer_context(request: AskRequest) -> dict:
+    """
+    Run everything /ask needs before synthesis: language detection,
+    translation, query rewrite, service detection, retrieval and intent
+    filtering. Shared by the blocking and streaming endpoints.
+
+    The returned context carries the request's Pipeline, so callers can add
+    the synthesis stages and collect the `next_steps` stage result.
+    """
+    # 🌐 Language detection
+    with span("language_detect"):
+        malayalam = is_malayalam(request.query)
+    pipe = _build_pipeline(request, malayalam)
+
+    query_embedding = await pipe.get("embed")
+    service = await pipe.get("service")
+    chunks, current_intent = await pipe.get("intent")
+
+    return {
+        "pipeline": pipe,
+        "original_query": request.query,
+        "history": request.history or [],
+        "malayalam": malayalam,
+        "standalone_query": query_embedding.text,
+        "service": service,
+        "chunks": chunks,
+        "current_intent": current_intent,
+        "cache_key": CacheKey(
+            service,
+            query_embedding.vector,
+            get_index_version(service)
+        ) if service else None
+    }
+
+
+@app.post("/ask", response_model=AskResponse)
+async def ask(request: AskRequest, response: Response):
+    # One trace per request: every stage span is a child of this one
+    with span("ask"):
+        return await _ask(request, response)
+
+
+async def _ask(request: AskRequest, response: Response) -> AskResponse:
+    context = await _prepare_answer_context(request)
+    pipe = context["pipeline"]
+    malayalam = context["malayalam"]
+
+    # 🛑 HARD STOP if service still unknown
+    if not context["service"]:
+        pipe.cancel()
+        return AskResponse(
+            query=context["original_query"],
+            answer=UNKNOWN_SERVICE_ANSWER,
+            language="ml" if malayalam else "en",
+            sources=[],
+            service=None,
+            next_steps=[]
+        )
+
     # 🤖 STEP 4: NOW synthesize answer
-    english_answer = synthesize_answer(
-        standalone_query,
-        chunks,
-        history
-    )
+    async def synthesize(intent_result):
+        chunks, _ = intent_result
+        return await synthesize_answer(
+            context["standalone_query"],
+            chunks,
+            context["history"],
+            cache_key=context["cache_key"]
+        )
 
     # 🌍 Translate back if needed
-    final_answer = (
-        translate_en_to_ml(english_answer)
-        if malayalam else english_answer
-    )
+    async def back_translate(english_answer):
+        if malayalam:
+            return await translate_en_to_ml(english_answer)
+        return english_answer
 
-    # 🔮 Next step recommendation (unchanged)
-    next_steps = (
-        recommend_next_steps(service, current_intent)
-        if current_intent else []
-    )
+    pipe.add("synthesize", synthesize, ["intent"])
+    pipe.add("back_translate", back_translate, ["synthesize"])
+
+    final_answer = await pipe.get("back_translate")
+    next_steps = await pipe.get("next_steps")
+    pipe.cancel()
 
+    response.headers["Server-Timing"] = pipe.server_timing()
     return AskResponse(
-        query=original_query,
+        query=context["original_query"],
         answer=final_answer,
         language="ml" if malayalam else "en",
-        sources=chunks if request.include_sources else [],
-        service=service,
+        sources=context["chunks"] if request.include_sources else [],
+        service=context["service"],
         next_steps=next_steps
     )
 
+
+def _sse(event: str, data: dict) -> str:
+    """Format one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@app.post("/ask/stream")
+async def ask_stream(request: AskRequest):
+    """
+    Streaming /ask over Server-Sent Events.
+
+    Events, in order:
+        meta        query, language, service and sources (before any tokens)
+        token       {"text": ...} answer deltas as the LLM produces them
+        error       {"message": ...} only if the answer broke off mid-stream
+        next_steps  recommended next intents
+        done        {"answer": ..., "complete": ..., "timings": {...}} the
+                    final answer, false `complete` if it was cut off (the
+                    answer then ends with a note saying so), and per-stage
+                    latencies in seconds
+    """
+    context = await _prepare_answer_context(request)
+    pipe = context["pipeline"]
+    malayalam = context["malayalam"]
+
+    async def events():
+        service = context["service"]
+        chunks = context["chunks"]
+        yield _sse("meta", {
+            "query": context["original_query"],
+            "language": "ml" if malayalam else "en",
+            "service": service,
+            "sources": chunks if request.include_sources else []
+        })
+
+        if not service:
+            pipe.cancel()
+            yield _sse("token", {"text": UNKNOWN_SERVICE_ANSWER})
+            yield _sse("next_steps", {"next_steps": []})
+            yield _sse("done", {
+                "answer": UNKNOWN_SERVICE_ANSWER, "complete": True, "timings": pipe.timings
+            })
+            return
+
+        if malayalam:
+            # Tokens are only useful to the user in Malayalam, so synthesize
+            # in English first and stream the translation
+            async def synthesize():
+                return await synthesize_answer(
+                    context["standalone_query"], chunks, context["history"],
+                    cache_key=context["cache_key"]
+                )
+
+            pipe.add("synthesize", synthesize)
+            english_answer = await pipe.get("synthesize")
+            deltas = stream_translate_en_to_ml(english_answer)
+            stage = "back_translate"
+        else:
+            deltas = stream_answer(
+                context["standalone_query"], chunks, context["history"],
+                cache_key=context["cache_key"]
+            )
+            stage = "synthesize"
+
+        start = time.perf_counter()
+        parts = []
+        complete = True
+        try:
+            try:
+                async for delta in deltas:
+                    if not parts:
+                        pipe.record("first_token", time.perf_counter() - start)
+                    parts.append(delta)
+                    yield _sse("token", {"text": delta})
+            except Exception as e:
+                # 🛑 Cut off after the first token: say so instead of
+                # passing the partial answer off as final
+                print(f"Answer stream interrupted: {e!r}")
+                complete = False
+                parts.append(INTERRUPTED_ANSWER_NOTE)
+                yield _sse("error", {"message": INTERRUPTED_ANSWER_NOTE.strip()})
+                yield _sse("token", {"text": INTERRUPTED_ANSWER_NOTE})
+            pipe.record(stage, time.perf_counter() - start)
+
+            yield _sse("next_steps", {"next_steps": await pipe.get("next_steps")})
+            yield _sse("done", {
+                "answer": "".join(parts), "complete": complete, "timings": pipe.timings
+            })
+        finally:
+            pipe.cancel()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/healthz")
+def healthz():
+    """Liveness: the process is up and serving HTTP."""
+    return {"status": "ok", "import_seconds": round(IMPORT_SECONDS, 3)}
+
+
+@app.get("/readyz")
+def readyz(response: Response):
+    """Readiness: required resources are loaded (503 until warm-up is done)."""
+    ready = registry.ready or WARMUP_MODE == "off"
+    if not ready:
+        response.status_code = 503
+    return {"ready": ready, "resources": registry.status()}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics_endpoint():
+    """Prometheus metrics."""
+    return metrics.render()
+
+
+@app.post("/admin/reload-indices")
+async def admin_reload_indices(
+    response: Response,
+    force: bool = False,
+    x_admin_token: str = Header(default="")
+):
+    """
+    Load rebuilt index files in the background and swap them in.
+    In-flight searches finish on the previous generation.
+    """
+    if not ADMIN_TOKEN or not hmac.compare_digest(x_admin_token, ADMIN_TOKEN):
+        response.status_code = 403
+        return {"error": "Admin token required."}
+    try:
+        return await run_in_threadpool(reload_indices, force)
+    except Exception as e:
+        response.status_code = 500
+        return {"error": f"Reload failed, previous indices kept: {e!r}"}
+
+
 @app.post("/retrieve")
 def retrieve(request: QueryRequest):
     """
     Raw retrieval endpoint: Returns chunks without LLM synthesis.
-    STRICT: service must be specified.
+    Without a service, the query is routed by the service router; an
+    ambiguous query searches its candidate services in one call.
     """
 
     if request.service is None:
+        service, results, decision = route_and_retrieve(
+            request.query,
+            k=request.top_k
+        )
         return {
-            "error": "Service must be specified for retrieval.",
-            "available_services": ["ration_card", "birth_certificate", "unemployment_allowance"]
+            "query": request.query,
+            "service": service,
+            "service_scores": decision.probabilities,
+            "routing_confidence": decision.confidence,
+            "routing_margin": decision.margin,
+            "results": results
         }
 
     results = retrieve_chunks(
@@ -144,3 +521,233 @@ def retrieve(request: QueryRequest):
         "service": request.service,
         "results": results
     }
+
+
+# ===============================
+# Batch endpoints
+# ===============================
+# All queries of a batch are encoded in one encode call, routed with one
+# matmul, and queries searching the same service share one index search.
+# LLM calls fan out concurrently, at most BATCH_LLM_CONCURRENCY at a time.
+
+def _batch_error(requests: list) -> str:
+    """Why a whole batch is rejected, or "" if its size is valid."""
+    if not requests:
+        return "At least one query is required."
+    if len(requests) > BATCH_MAX_QUERIES:
+        return f"At most {BATCH_MAX_QUERIES} queries per batch."
+    return ""
+
+
+def _service_errors(requests: list, available: list) -> dict:
+    """Per-query errors for unknown services: index -> message."""
+    return {
+        index: f"Unknown service '{r.service}'. Available: {available}"
+        for index, r in enumerate(requests)
+        if r.service and r.service not in available
+    }
+
+
+def _route_batch(requests: list, query_embeddings: list) -> list:
+    """Routing decisions: the requested service, or the router's for the rest."""
+    decisions = [
+        RoutingDecision(r.service, [r.service], 1.0, 1.0, {r.service: 1.0}) if r.service else None
+        for r in requests
+    ]
+    unrouted = [i for i, decision in enumerate(decisions) if decision is None]
+    if unrouted:
+        matrix = np.vstack([query_embeddings[i].matrix for i in unrouted])
+        for i, decision in zip(unrouted, route_queries(matrix)):
+            decisions[i] = decision
+    return decisions
+
+
+def _retrieve_batch(requests: list, query_embeddings: list, classify: bool = False) -> list:
+    """
+    Route and retrieve every query of a batch.
+
+    Returns:
+        One (service, results) per query, in order
+    """
+    decisions = _route_batch(requests, query_embeddings)
+    intents = [classify_intent(qe) for qe in query_embeddings] if classify else None
+    k = max(r.top_k for r in requests)
+    routed = retrieve_batch(query_embeddings, decisions, k, intents)
+    return [(service, results[:r.top_k]) for r, (service, results) in zip(requests, routed)]
+
+
+@app.post("/retrieve/batch")
+def retrieve_batch_endpoint(request: BatchQueryRequest, response: Response):
+    """
+    Raw retrieval for many queries.
+
+    Returns:
+        {"results": [...]}, one /retrieve-style entry per query, in order
+        ({"query", "error"} for a query with an unknown service)
+    """
+    error = _batch_error(request.queries)
+    if error:
+        response.status_code = 400
+        return {"error": error}
+
+    errors = _service_errors(request.queries, get_available_services())
+    valid = [q for i, q in enumerate(request.queries) if i not in errors]
+    routed = iter(_retrieve_batch(valid, embed_queries([q.query for q in valid])) if valid else [])
+    results = []
+    for index, q in enumerate(request.queries):
+        if index in errors:
+            results.append({"query": q.query, "error": errors[index]})
+        else:
+            service, hits = next(routed)
+            results.append({"query": q.query, "service": service, "results": hits})
+    return {"results": results}
+
+
+async def _prepare_batch(requests: list, limit: asyncio.Semaphore) -> list:
+    """
+    /ask preparation for a batch: translation and rewrites (concurrent,
+    bounded), then one encode, routing and retrieval for all queries.
+
+    Returns:
+        One context dict per query (see _prepare_answer_context)
+    """
+    async def bounded(stage, fn, *args):
+        async with limit:
+            with span(stage):
+                return await fn(*args)
+
+    async def translate(r, malayalam):
+        return await bounded("translate", translate_ml_to_en, r.query) if malayalam else r.query
+
+    async def rewrite(r, query, query_embedding):
+        if not r.history:
+            return query
+        return await bounded("rewrite", rewrite_query, query, r.history, query_embedding)
+
+    # 🌐 Language detection + translation
+    with span("language_detect"):
+        malayalam = [is_malayalam(r.query) for r in requests]
+    queries = await asyncio.gather(*(translate(r, ml) for r, ml in zip(requests, malayalam)))
+
+    # 🧮 One encode for the whole batch
+    query_embeddings = await run_in_threadpool(embed_queries, queries)
+
+    # 🧠 Follow-ups are rewritten; only the rewritten queries are encoded again
+    standalone = await asyncio.gather(*(
+        rewrite(r, q, qe) for r, q, qe in zip(requests, queries, query_embeddings)
+    ))
+    rewritten = [i for i, (a, b) in enumerate(zip(standalone, queries)) if a != b]
+    if rewritten:
+        reencoded = await run_in_threadpool(embed_queries, [standalone[i] for i in rewritten])
+        for i, query_embedding in zip(rewritten, reencoded):
+            query_embeddings[i] = query_embedding
+
+    # 🔍 Routing and retrieval
+    with span("retrieve"):
+        routed = await run_in_threadpool(_retrieve_batch, requests, query_embeddings, True)
+
+    contexts = []
+    for r, ml, qe, (service, chunks) in zip(requests, malayalam, query_embeddings, routed):
+        chunks, current_intent = _filter_by_intent(confident_top(chunks))
+        contexts.append({
+            "original_query": r.query,
+            "history": r.history or [],
+            "malayalam": ml,
+            "standalone_query": qe.text,
+            "service": service,
+            "chunks": chunks,
+            "current_intent": current_intent,
+            "include_sources": r.include_sources,
+            "cache_key": CacheKey(
+                service, qe.vector, get_index_version(service)
+            ) if service else None
+        })
+
+    next_steps = recommend_next_steps_batch([
+        (c["service"], c["current_intent"]) for c in contexts
+    ])
+    for context, steps in zip(contexts, next_steps):
+        context["next_steps"] = steps
+    return contexts
+
+
+@app.post("/ask/batch")
+async def ask_batch(request: BatchAskRequest, response: Response):
+    """
+    /ask for many queries, streamed back as NDJSON: one line per query,
+    in input order, each as soon as it and all earlier ones are answered.
+
+    Lines are AskResponse objects with an extra "index" field, or
+    {"index", "error"} if that query failed or named an unknown service.
+    """
+    error = _batch_error(request.queries)
+    if error:
+        response.status_code = 400
+        return {"error": error}
+
+    # May load the indices (warm-up): keep it off the event loop
+    available = await run_in_threadpool(get_available_services)
+    errors = _service_errors(request.queries, available)
+    valid = [i for i in range(len(request.queries)) if i not in errors]
+
+    limit = asyncio.Semaphore(BATCH_LLM_CONCURRENCY)
+    contexts = await _prepare_batch([request.queries[i] for i in valid], limit) if valid else []
+
+    async def answer(context) -> AskResponse:
+        language = "ml" if context["malayalam"] else "en"
+        if not context["service"]:
+            return AskResponse(
+                query=context["original_query"],
+                answer=UNKNOWN_SERVICE_ANSWER,
+                language=language,
+                sources=[],
+                service=None,
+                next_steps=[]
+            )
+        async with limit:
+            with span("synthesize"):
+                final_answer = await synthesize_answer(
+                    context["standalone_query"],
+                    context["chunks"],
+                    context["history"],
+                    cache_key=context["cache_key"]
+                )
+            if context["malayalam"]:
+                with span("back_translate"):
+                    final_answer = await translate_en_to_ml(final_answer)
+        return AskResponse(
+            query=context["original_query"],
+            answer=final_answer,
+            language=language,
+            sources=context["chunks"] if context["include_sources"] else [],
+            service=context["service"],
+            next_steps=context["next_steps"]
+        )
+
+    tasks = {index: asyncio.create_task(answer(context)) for index, context in zip(valid, contexts)}
+
+    async def lines():
+        try:
+            for index in range(len(request.queries)):
+                if index in errors:
+                    item = {"index": index, "error": errors[index]}
+                else:
+                    try:
+                        item = {"index": index, **(await tasks[index]).model_dump()}
+                    except Exception as e:
+                        print(f"Batch answer {index} failed: {e!r}")
+                        item = {"index": index, "error": "Answer failed."}
+                yield json.dumps(item, ensure_ascii=False) + "\n"
+        finally:
+            for task in tasks.values():
+                task.cancel()
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+IMPORT_SECONDS = time.perf_counter() - _import_started
+if IMPORT_SECONDS > IMPORT_TIME_BUDGET:
+    print(
+        f"Warning: backend import took {IMPORT_SECONDS:.2f}s "
+        f"(budget {IMPORT_TIME_BUDGET:.2f}s)"
+    )
@@ -0,0 +1,193 @@
+import bisect
+import threading
+from typing import Callable, Dict, List, Sequence, Tuple
+
+# ===============================
+# In-process metrics
+# ===============================
+# Minimal Prometheus-compatible registry: metrics are created on first use
+# and rendered in the text exposition format by render().
+
+
+class Counter:
+    """
+    Monotonic counter with optional labels. Besides inc(), values can come
+    from callbacks returning [(labels dict, value)], for totals another
+    object already keeps.
+    """
+
+    type = "counter"
+
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+        self._values: Dict[Tuple, float] = {}
+        self._callbacks: List[Callable[[], List[Tuple[dict, float]]]] = []
+        self._lock = threading.Lock()
+
+    def inc(self, value: float = 1.0, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + value
+
+    def value(self, **labels) -> float:
+        return self._values.get(tuple(sorted(labels.items())), 0.0)
+
+    def add_callback(self, callback: Callable[[], List[Tuple[dict, float]]]):
+        with self._lock:
+            self._callbacks.append(callback)
+
+    def samples(self):
+        with self._lock:
+            samples = [(self.name, dict(key), value) for key, value in self._values.items()]
+            callbacks = list(self._callbacks)
+        for callback in callbacks:
+            samples += [(self.name, labels, value) for labels, value in callback()]
+        return samples
+
+
+class Gauge:
+    """
+    Gauge with optional labels. Values are either set directly or computed
+    at render time by callbacks returning [(labels dict, value)].
+    """
+
+    type = "gauge"
+
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+        self._values: Dict[Tuple, float] = {}
+        self._callbacks: List[Callable[[], List[Tuple[dict, float]]]] = []
+        self._lock = threading.Lock()
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[tuple(sorted(labels.items()))] = value
+
+    def add_callback(self, callback: Callable[[], List[Tuple[dict, float]]]):
+        with self._lock:
+            self._callbacks.append(callback)
+
+    def samples(self):
+        with self._lock:
+            samples = [(self.name, dict(key), value) for key, value in self._values.items()]
+            callbacks = list(self._callbacks)
+        for callback in callbacks:
+            samples += [(self.name, labels, value) for labels, value in callback()]
+        return samples
+
+
+# Seconds: from a FAISS search (sub-millisecond) to a slow LLM chain
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    """Cumulative histogram with optional labels."""
+
+    type = "histogram"
+
+    def __init__(self, name: str, description: str, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(sorted(buckets))
+        # labels -> (per-bucket counts, sum, count)
+        self._values: Dict[Tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        position = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            if position < len(self.buckets):
+                state[0][position] += 1
+            state[1] += value
+            state[2] += 1
+
+    def samples(self):
+        with self._lock:
+            values = [(dict(key), list(counts), total, count) for key, (counts, total, count) in self._values.items()]
+        samples = []
+        for labels, counts, total, count in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                samples.append((f"{self.name}_bucket", {**labels, "le": f"{bound:g}"}, cumulative))
+            samples.append((f"{self.name}_bucket", {**labels, "le": "+Inf"}, count))
+            samples.append((f"{self.name}_sum", labels, total))
+            samples.append((f"{self.name}_count", labels, count))
+        return samples
+
+
+_registry: Dict[str, object] = {}
+_registry_lock = threading.Lock()
+
+
+def counter(name: str, description: str = "") -> Counter:
+    """Get or create a counter."""
+    with _registry_lock:
+        if name not in _registry:
+            _registry[name] = Counter(name, description)
+        return _registry[name]
+
+
+def gauge(name: str, description: str = "") -> Gauge:
+    """Get or create a gauge."""
+    with _registry_lock:
+        if name not in _registry:
+            _registry[name] = Gauge(name, description)
+        return _registry[name]
+
+
+def histogram(name: str, description: str = "", buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    """Get or create a histogram."""
+    with _registry_lock:
+        if name not in _registry:
+            _registry[name] = Histogram(name, description, buckets)
+        return _registry[name]
+
+
+def register_cache(name: str, cache):
+    """
+    Expose a cache's `hits`/`misses` attributes as
+    cache_requests_total{cache, result} and cache_hit_ratio{cache}.
+    """
+    def requests():
+        return [
+            ({"cache": name, "result": "hit"}, cache.hits),
+            ({"cache": name, "result": "miss"}, cache.misses)
+        ]
+
+    def ratio():
+        total = cache.hits + cache.misses
+        return [({"cache": name}, cache.hits / total if total else 0.0)]
+
+    counter("cache_requests_total", "Cache lookups by result").add_callback(requests)
+    gauge("cache_hit_ratio", "Fraction of cache lookups that hit").add_callback(ratio)
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    parts = []
+    for key, value in sorted(labels.items()):
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        parts.append(f'{key}="{value}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def render() -> str:
+    """Render every metric in the Prometheus text exposition format."""
+    with _registry_lock:
+        metrics = list(_registry.values())
+
+    lines = []
+    for metric in metrics:
+        lines.append(f"# HELP {metric.name} {metric.description}")
+        lines.append(f"# TYPE {metric.name} {metric.type}")
+        for name, labels, value in metric.samples():
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
@@ -34,3 +34,11 @@ class AskResponse(BaseModel):
     sources: List[ChunkResponse] = []
     service: Optional[str] = None
     next_steps: List[str] = []   # ✅ REQUIRED
+
+
+class BatchQueryRequest(BaseModel):
+    queries: List[QueryRequest]
+
+
+class BatchAskRequest(BaseModel):
+    queries: List[AskRequest]
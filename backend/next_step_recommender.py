@@ -1,17 +1,21 @@
 import os
-import joblib
-import numpy as np
+import json
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from resources import registry
+from intents import INTENTS
 
 # ===============================
 # Constants (must match training)
 # ===============================
-INTENTS = ["documents", "eligibility", "process", "timeline", "fees", "correction"]
 SERVICES = [
     "ration_card",
     "birth_certificate",
     "unemployment_allowance"
 ]
 
+TABLE_FORMAT = 1
+
 # ===============================
 # Absolute path resolution
 # ===============================
@@ -19,51 +23,65 @@ SERVICES = [
 # Project root is one level ABOVE backend/
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
-MODEL_PATH = os.path.join(
-    BASE_DIR,
-    "ml",
-    "next_step_recommender",
-    "next_step_model.pkl"
-)
-
-LABEL_PATH = os.path.join(
+# Compiled by ml/next_step_recommender/train_model.py: every
+# (service, intent) pair scored once by the trained model, next intents
+# ranked by probability. Serving is a dictionary lookup.
+TABLE_PATH = os.getenv("NEXT_STEP_TABLE", os.path.join(
     BASE_DIR,
     "ml",
     "next_step_recommender",
-    "label_binarizer.pkl"
-)
-
-# Debug prints (keep for now)
-print("🔹 Loading Next-Step Model from:", MODEL_PATH)
-print("🔹 Loading Label Binarizer from:", LABEL_PATH)
+    "next_step_table.json"
+))
 
 # ===============================
-# Load trained artifacts ONCE
+# Load compiled table ONCE (lazily)
 # ===============================
-model = joblib.load(MODEL_PATH)
-mlb = joblib.load(LABEL_PATH)
+def _load_table() -> Dict[str, Dict[str, List[str]]]:
+    print("🔹 Loading Next-Step Table from:", TABLE_PATH)
+    with open(TABLE_PATH, "r", encoding="utf-8") as f:
+        compiled = json.load(f)
+
+    if compiled.get("format") != TABLE_FORMAT:
+        raise RuntimeError(
+            f"Next-step table format {compiled.get('format')} != {TABLE_FORMAT}; "
+            "re-run ml/next_step_recommender/train_model.py"
+        )
+    if compiled["intents"] != INTENTS or compiled["services"] != SERVICES:
+        print("⚠️ Next-step table was trained on different services/intents; re-run train_model.py")
+
+    print(f"🔹 Next-step model {compiled['model_sha256'][:12]} (built {compiled['created_at']})")
+    return {
+        service: {intent: [name for name, _ in ranked] for intent, ranked in by_intent.items()}
+        for service, by_intent in compiled["table"].items()
+    }
+
+
+_next_step_table = registry.register("next_step_table", _load_table)
 
 # ===============================
-# Inference function
+# Inference functions
 # ===============================
 def recommend_next_steps(service: str, current_intent: str, top_k: int = 3):
     """
     Recommend next steps (intents) based on current service and intent.
     """
+    ranked = _next_step_table.get().get(service, {}).get(current_intent)
+    return ranked[:top_k] if ranked else []
 
-    if service not in SERVICES or current_intent not in INTENTS:
-        return []
-
-    service_vec = [1 if service == s else 0 for s in SERVICES]
-    intent_vec = [1 if current_intent == i else 0 for i in INTENTS]
 
-    X = np.array([service_vec + intent_vec])
-    probs = model.predict_proba(X)[0]
-
-    ranked = sorted(
-        zip(INTENTS, probs),
-        key=lambda x: x[1],
-        reverse=True
-    )
+def recommend_next_steps_batch(
+    pairs: Sequence[Tuple[str, Optional[str]]],
+    top_k: int = 3
+) -> List[List[str]]:
+    """
+    Recommend next steps for many (service, current intent) pairs at once.
 
-    return [intent for intent, _ in ranked[:top_k]]
+    Returns:
+        One list of next intents per pair, in input order ([] for unknown
+        services or intents)
+    """
+    table = _next_step_table.get()
+    return [
+        (table.get(service, {}).get(intent) or [])[:top_k]
+        for service, intent in pairs
+    ]
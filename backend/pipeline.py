@@ -0,0 +1,87 @@
+import time
+import asyncio
+from typing import Callable, Dict, Iterable
+
+from fastapi.concurrency import run_in_threadpool
+
+from tracing import span, record_stage
+
+
+class Pipeline:
+    """
+    Small async DAG executor for one request.
+
+    Every stage is started as a task as soon as it is added. A stage first
+    awaits the results of its dependencies, then runs; independent stages
+    therefore overlap and total latency approaches the critical path.
+
+    Each stage's own run time (excluding time spent waiting on its
+    dependencies) is recorded in `timings`, in seconds, and runs inside a
+    tracing span of the same name (stage_duration_seconds histogram).
+    """
+
+    def __init__(self):
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self.timings: Dict[str, float] = {}
+
+    def add(
+        self,
+        name: str,
+        fn: Callable,
+        deps: Iterable[str] = (),
+        blocking: bool = False
+    ) -> "Pipeline":
+        """
+        Add a stage.
+
+        Args:
+            name: Stage name, used by dependents and in timings
+            fn: Called with the dependency results as positional arguments.
+                May be a coroutine function.
+            deps: Names of stages whose results fn needs
+            blocking: Run a sync fn in the threadpool (CPU-bound work)
+        """
+        deps = list(deps)
+        missing = [d for d in deps if d not in self._tasks]
+        if missing:
+            raise ValueError(f"Stage '{name}' depends on unknown stages: {missing}")
+
+        async def run():
+            args = [await self._tasks[d] for d in deps]
+            start = time.perf_counter()
+            try:
+                with span(name):
+                    if asyncio.iscoroutinefunction(fn):
+                        return await fn(*args)
+                    if blocking:
+                        return await run_in_threadpool(fn, *args)
+                    return fn(*args)
+            finally:
+                self.timings[name] = time.perf_counter() - start
+
+        self._tasks[name] = asyncio.create_task(run())
+        return self
+
+    async def get(self, name: str):
+        """Wait for a stage and return its result."""
+        return await self._tasks[name]
+
+    def record(self, name: str, seconds: float):
+        """Record the timing of work done outside the graph (e.g. streaming)."""
+        self.timings[name] = seconds
+        record_stage(name, seconds)
+
+    def cancel(self):
+        """Cancel stages that are still running (e.g. unused speculation)."""
+        for task in self._tasks.values():
+            if not task.done():
+                task.cancel()
+            elif not task.cancelled():
+                task.exception()  # mark as retrieved
+
+    def server_timing(self) -> str:
+        """Stage timings as a Server-Timing header value (milliseconds)."""
+        return ", ".join(
+            f"{name};dur={seconds * 1000:.1f}"
+            for name, seconds in self.timings.items()
+        )
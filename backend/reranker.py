@@ -0,0 +1,219 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from resources import registry
+from metrics import counter
+from tracing import span
+from translation_cache import normalize_text
+
+# ===============================
+# Cross-encoder reranker (optional)
+# ===============================
+# Retrieval over-fetches RERANK_CANDIDATES chunks; a small multilingual
+# cross-encoder scores each (query, chunk) pair and the top-k are kept.
+# Scoring runs under a per-request time budget: when it is exceeded the
+# candidates keep their retrieval order (the scoring still finishes in
+# the background and fills the score cache for later requests).
+#
+# The model is an ONNX export created by embedding/export_reranker_onnx.py.
+
+# Project root is one level ABOVE backend/
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+RERANK_ENABLED = os.getenv("RERANK_ENABLED", "0") == "1"
+RERANK_MODEL_DIR = os.getenv(
+    "RERANK_MODEL_DIR",
+    os.path.join(BASE_DIR, "models", "reranker-onnx")
+)
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "20"))
+RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", "150"))
+RERANK_CACHE_SIZE = int(os.getenv("RERANK_CACHE_SIZE", "10000"))
+RERANK_THREADS = int(os.getenv("RERANK_THREADS", "0"))  # 0 = onnxruntime default
+# Scoring jobs allowed to queue up behind a slow one before requests
+# stop submitting new ones
+RERANK_MAX_PENDING = int(os.getenv("RERANK_MAX_PENDING", "4"))
+
+# A reranked top chunk at least this confident is sent to the LLM alone
+RERANK_CONFIDENT_SCORE = float(os.getenv("RERANK_CONFIDENT_SCORE", "0.9"))
+
+RERANK_MODEL_FILE = "model.onnx"
+RERANK_QUANTIZED_FILE = "model_quantized.onnx"
+RERANK_CONFIG_FILE = "reranker_config.json"
+
+_rerank_outcomes = counter("rerank_requests_total", "Rerank calls by outcome")
+
+
+class OnnxCrossEncoder:
+    """
+    Sequence-pair classifier served by onnxruntime. Returns one relevance
+    probability per (query, text) pair.
+    """
+
+    def __init__(self, model_dir: str = RERANK_MODEL_DIR):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        with open(os.path.join(model_dir, RERANK_CONFIG_FILE), "r", encoding="utf-8") as f:
+            config = json.load(f)
+
+        model_path = os.path.join(model_dir, RERANK_QUANTIZED_FILE)
+        if not os.path.exists(model_path):
+            model_path = os.path.join(model_dir, RERANK_MODEL_FILE)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if RERANK_THREADS:
+            options.intra_op_num_threads = RERANK_THREADS
+        self.session = ort.InferenceSession(
+            model_path, options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=config["max_length"])
+        pad_token = config.get("pad_token", "<pad>")
+        self.tokenizer.enable_padding(
+            pad_id=self.tokenizer.token_to_id(pad_token),
+            pad_token=pad_token
+        )
+        print(f"Loaded reranker: {model_path}")
+
+    def score(self, pairs: List[Tuple[str, str]]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(pairs)
+        feeds = {
+            "input_ids": np.array([e.ids for e in encodings], dtype="int64"),
+            "attention_mask": np.array([e.attention_mask for e in encodings], dtype="int64")
+        }
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype="int64")
+
+        logits = self.session.run(None, feeds)[0].reshape(len(pairs), -1)[:, 0]
+        return 1.0 / (1.0 + np.exp(-logits))
+
+
+def _load_reranker():
+    model = OnnxCrossEncoder(RERANK_MODEL_DIR)
+    model.score([("warm up", "warm up")])
+    return model
+
+
+# Not required for readiness: retrieval works without it
+_reranker = registry.register("reranker", _load_reranker, required=False) if RERANK_ENABLED else None
+
+
+class RerankScoreCache:
+    """LRU of (query, chunk text) -> cross-encoder score."""
+
+    def __init__(self, max_entries: int = RERANK_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._scores = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(query: str, text: str) -> str:
+        payload = normalize_text(query).lower() + "\x00" + text
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[float]:
+        with self._lock:
+            score = self._scores.get(key)
+            if score is not None:
+                self._scores.move_to_end(key)
+            return score
+
+    def put_many(self, items: Dict[str, float]):
+        with self._lock:
+            for key, score in items.items():
+                self._scores[key] = score
+                self._scores.move_to_end(key)
+            while len(self._scores) > self.max_entries:
+                self._scores.popitem(last=False)
+
+
+score_cache = RerankScoreCache()
+
+# One scoring job at a time: the model uses all intra-op threads
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rerank")
+_pending = threading.Semaphore(RERANK_MAX_PENDING)
+
+
+def _score_uncached(query: str, texts: Dict[str, str]) -> Dict[str, float]:
+    try:
+        keys = list(texts)
+        scores = _reranker.get().score([(query, texts[key]) for key in keys])
+        scored = dict(zip(keys, (float(s) for s in scores)))
+        score_cache.put_many(scored)
+        return scored
+    finally:
+        _pending.release()
+
+
+def rerank(
+    query: str,
+    candidates: List[Dict],
+    k: int,
+    budget_ms: float = RERANK_BUDGET_MS
+) -> List[Dict]:
+    """
+    Reorder retrieval results by cross-encoder score and keep the top k.
+    Falls back to the given (retrieval) order when the reranker is
+    disabled, not loaded yet, fails, or exceeds the time budget.
+
+    Returns:
+        Top-k results; reranked results carry a "rerank_score"
+    """
+    if _reranker is None or len(candidates) <= 1:
+        return candidates[:k]
+
+    with span("rerank"):
+        start = time.perf_counter()
+        keys = [score_cache.key(query, c["text"]) for c in candidates]
+        scores = {key: score_cache.get(key) for key in keys}
+        missing = {key: c["text"] for key, c in zip(keys, candidates) if scores[key] is None}
+
+        if missing:
+            if not _reranker.loaded:
+                # Do not load the model inside a request: warm-up does that
+                _rerank_outcomes.inc(outcome="not_loaded")
+                return candidates[:k]
+            if not _pending.acquire(blocking=False):
+                _rerank_outcomes.inc(outcome="busy")
+                return candidates[:k]
+            future = _executor.submit(_score_uncached, query, missing)
+            remaining = budget_ms / 1000 - (time.perf_counter() - start)
+            try:
+                scores.update(future.result(timeout=max(remaining, 0)))
+            except FutureTimeout:
+                _rerank_outcomes.inc(outcome="timeout")
+                return candidates[:k]
+            except Exception as e:
+                print(f"Rerank failed: {e!r}")
+                _rerank_outcomes.inc(outcome="error")
+                return candidates[:k]
+
+        _rerank_outcomes.inc(outcome="reranked" if missing else "cached")
+        order = sorted(range(len(candidates)), key=lambda i: scores[keys[i]], reverse=True)
+        return [{**candidates[i], "rerank_score": scores[keys[i]]} for i in order[:k]]
+
+
+def candidate_count(k: int) -> int:
+    """How many results to retrieve for a final top-k."""
+    return max(k, RERANK_CANDIDATES) if _reranker is not None else k
+
+
+def confident_top(results: List[Dict]) -> List[Dict]:
+    """
+    Only the top chunk when the reranker is confident about it, so the
+    LLM prompt carries one chunk instead of several.
+    """
+    if results and results[0].get("rerank_score", 0) >= RERANK_CONFIDENT_SCORE:
+        return results[:1]
+    return results
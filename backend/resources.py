@@ -0,0 +1,102 @@
+import time
+import threading
+from typing import Callable, Dict, List, Optional
+
+# ===============================
+# Lazy resource registry
+# ===============================
+# Heavy objects (encoder, FAISS indices, next-step model, ...) are
+# registered at import time but only loaded on first use or during the
+# app's warm-up. Importing the backend therefore stays cheap, and
+# /readyz can report which resources are loaded.
+
+
+class Resource:
+    """A lazily loaded, process-wide object."""
+
+    def __init__(self, name: str, loader: Callable, required: bool = True):
+        self.name = name
+        self.loader = loader
+        self.required = required
+        self.load_seconds: Optional[float] = None
+        self.error: Optional[str] = None
+        self._value = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def get(self):
+        """Return the object, loading it first if needed (thread-safe)."""
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    start = time.perf_counter()
+                    try:
+                        self._value = self.loader()
+                    except Exception as e:
+                        self.error = repr(e)
+                        raise
+                    self.load_seconds = time.perf_counter() - start
+                    self.error = None
+                    self._loaded = True
+                    print(f"Loaded {self.name} in {self.load_seconds:.2f}s")
+        return self._value
+
+
+class ResourceRegistry:
+    def __init__(self):
+        self._resources: Dict[str, Resource] = {}
+
+    def register(self, name: str, loader: Callable, required: bool = True) -> Resource:
+        """
+        Register a loader. `required` resources must be loaded before the
+        app reports ready.
+        """
+        resource = Resource(name, loader, required)
+        self._resources[name] = resource
+        return resource
+
+    def get(self, name: str):
+        return self._resources[name].get()
+
+    def warm_up(self, names: List[str] = None) -> Dict[str, float]:
+        """
+        Load resources (all of them by default) in registration order.
+        A failing resource is reported and skipped, not raised.
+
+        Returns:
+            Load time in seconds per resource loaded by this call
+        """
+        timings = {}
+        for name, resource in list(self._resources.items()):
+            if names is not None and name not in names:
+                continue
+            if resource.loaded:
+                continue
+            try:
+                resource.get()
+                timings[name] = resource.load_seconds
+            except Exception as e:
+                print(f"Warm-up failed for {name}: {e!r}")
+        return timings
+
+    @property
+    def ready(self) -> bool:
+        return all(r.loaded for r in self._resources.values() if r.required)
+
+    def status(self) -> Dict[str, Dict]:
+        return {
+            name: {
+                "loaded": r.loaded,
+                "required": r.required,
+                "load_seconds": r.load_seconds,
+                "error": r.error
+            }
+            for name, r in self._resources.items()
+        }
+
+
+registry = ResourceRegistry()
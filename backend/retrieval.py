@@ -1,94 +1,572 @@
 import os
 import json
+import time
+import hashlib
+import threading
+from typing import Optional
 import faiss
 import numpy as np
-from sentence_transformers import SentenceTransformer
-
-# Get project root directory
-script_dir = os.path.dirname(os.path.abspath(__file__))
-project_root = os.path.dirname(script_dir)
-
-# Service configurations
-SERVICES = {
-    "ration_card": {
-        "index_path": os.path.join(project_root, "data/ration_card/faiss/ration_card.index"),
-        "meta_path": os.path.join(project_root, "data/ration_card/faiss/ration_card_metadata.json")
-    },
-    "birth_certificate": {
-        "index_path": os.path.join(project_root, "data/birth_certificate/faiss/birth_certificate.index"),
-        "meta_path": os.path.join(project_root, "data/birth_certificate/faiss/birth_certificate_metadata.json")
-    },
-    "unemployment_allowance": {
-        "index_path": os.path.join(project_root, "data/unemployment/faiss/unemployment.index"),
-        "meta_path": os.path.join(project_root, "data/unemployment/faiss/unemployment_metadata.json")
-    }
-}
-
-# Load all indices and metadata at startup
-indices = {}
-metadata_store = {}
-
-for service_name, paths in SERVICES.items():
-    if os.path.exists(paths["index_path"]) and os.path.exists(paths["meta_path"]):
-        indices[service_name] = faiss.read_index(paths["index_path"])
-        with open(paths["meta_path"], "r", encoding="utf-8") as f:
-            metadata_store[service_name] = json.load(f)
-        print(f"Loaded index for: {service_name}")
-    else:
-        print(f"Warning: Index not found for {service_name}")
-
-model = SentenceTransformer(
-    "sentence-transformers/paraphrase-multilingual-mpnet-base-v2"
+from embeddings import embed_query, QueryEmbedding
+from resources import registry
+from chunk_store import ChunkStore, store_base, store_exists, HEADER_SUFFIX
+from index_store import UnifiedIndex, IndexGenerations, UNIFIED_DIR, MANIFEST_FILE
+from service_router import ServiceRouter, RoutingDecision
+from sources import load_sources
+from metrics import counter
+from tracing import span
+from reranker import rerank, candidate_count
+from intents import chunk_intent
+
+# Service configurations (see sources.csv)
+SERVICES = load_sources()
+
+# Service routing (service_router.py): a query whose top service is less
+# likely than ROUTER_MIN_CONFIDENCE, or beats the runner-up by less than
+# ROUTER_MIN_MARGIN, searches its ROUTER_MAX_SERVICES most likely
+# services in one call
+ROUTER_MIN_CONFIDENCE = float(os.getenv("ROUTER_MIN_CONFIDENCE", "0.6"))
+ROUTER_MIN_MARGIN = float(os.getenv("ROUTER_MIN_MARGIN", "0.2"))
+ROUTER_MAX_SERVICES = int(os.getenv("ROUTER_MAX_SERVICES", "2"))
+
+# Seconds between checks for rebuilt index files (0 = no watcher;
+# reloads can still be triggered through the admin endpoint)
+INDEX_WATCH_INTERVAL = float(os.getenv("INDEX_WATCH_INTERVAL", "10"))
+
+# Hybrid retrieval: dense and BM25 candidates fused by reciprocal rank
+HYBRID_RETRIEVAL = os.getenv("HYBRID_RETRIEVAL", "1") == "1"
+FUSION_CANDIDATES = int(os.getenv("FUSION_CANDIDATES", "20"))
+RRF_K = int(os.getenv("RRF_K", "60"))
+
+# Retrieval returns spans (cleaning/chunking.py); a span is replaced by
+# its whole parent chunk when several of its siblings are hits, or when
+# the parent is at most this many tokens (0 = only the former)
+PARENT_EXPAND_MAX_TOKENS = int(os.getenv("PARENT_EXPAND_MAX_TOKENS", "0"))
+
+# Scope retrieval to the query intent predicted by the nearest-centroid
+# classifier (centroids of the chunk vectors of each intent)
+INTENT_CLASSIFIER_ENABLED = os.getenv("INTENT_CLASSIFIER_ENABLED", "0") == "1"
+INTENT_MIN_SCORE = float(os.getenv("INTENT_MIN_SCORE", "0.3"))
+INTENT_MIN_MARGIN = float(os.getenv("INTENT_MIN_MARGIN", "0.05"))
+
+_index_reloads = counter("index_reloads_total", "Index reload attempts by result")
+
+def read_index_mmap(path: str):
+    """
+    Read a FAISS index memory-mapped and read-only, so workers share its
+    pages. IO_FLAG_MMAP_IFC (faiss >= 1.11) also maps flat indices; older
+    builds, or index types that cannot be mapped, fall back to a normal read.
+    """
+    flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+    flags |= getattr(faiss, "IO_FLAG_MMAP_IFC", 0)
+    try:
+        return faiss.read_index(path, flags)
+    except RuntimeError as e:
+        print(f"Warning: cannot mmap {path} ({e}), reading into memory")
+        return faiss.read_index(path)
+
+
+def load_metadata(meta_path: str):
+    """
+    Chunk metadata for a service and its content fingerprint.
+
+    Prefers the memory-mapped ChunkStore next to the JSON file (written by
+    embedding/build_chunk_store.py); falls back to parsing the JSON.
+    """
+    base = store_base(meta_path)
+    if store_exists(base):
+        store = ChunkStore(base)
+        return store, store.version
+
+    with open(meta_path, "rb") as f:
+        raw = f.read()
+    return json.loads(raw.decode("utf-8")), hashlib.sha1(raw).hexdigest()[:16]
+
+
+def _with_router(unified: UnifiedIndex) -> UnifiedIndex:
+    """
+    Make sure the index has a service router, without touching the
+    encoder: an index saved before routing existed gets one built in
+    memory from its section prototypes. Description prototypes are only
+    added (or refreshed) by embedding/build_faiss_index.py.
+    """
+    router = unified.router
+    if router is None:
+        print("Warning: unified index has no service router, building it in memory")
+        vectors = unified.index.reconstruct_n(0, unified.index.ntotal)
+        router = ServiceRouter.build(vectors, unified.metadata, unified.services)
+    stale = router.stale_descriptions()
+    if stale:
+        print(
+            f"Warning: router descriptions missing or outdated for {stale}; "
+            f"run embedding/build_faiss_index.py to refresh them"
+        )
+    unified.router = router
+    return unified
+
+
+def _load_unified(versions: dict) -> UnifiedIndex:
+    """
+    The saved unified index (embedding/build_unified_index.py) if it was
+    built from the current per-service metadata; otherwise one built in
+    memory from the per-service flat indices.
+    """
+    if UnifiedIndex.exists():
+        manifest = UnifiedIndex.read_manifest()
+        built_from = {
+            name: info["version"] for name, info in manifest["services"].items()
+        }
+        if built_from == versions:
+            return _with_router(UnifiedIndex.load(read_index=read_index_mmap))
+        print("Warning: unified index is stale, rebuilding in memory")
+
+    if not versions:
+        raise RuntimeError("No service indices found")
+
+    per_service = {}
+    for service_name in versions:
+        paths = SERVICES[service_name]
+        index = read_index_mmap(paths["index_path"])
+        metadata, version = load_metadata(paths["meta_path"])
+        per_service[service_name] = (index.reconstruct_n(0, index.ntotal), list(metadata), version)
+        if isinstance(metadata, ChunkStore):
+            metadata.close()
+    return _with_router(UnifiedIndex.from_services(per_service))
+
+
+def _load_indices() -> dict:
+    """Load the unified index and metadata versions (one generation)."""
+    versions = {}
+
+    for service_name, paths in SERVICES.items():
+        if os.path.exists(paths["index_path"]) and os.path.exists(paths["meta_path"]):
+            # Content fingerprint, used to invalidate cached answers
+            metadata, versions[service_name] = load_metadata(paths["meta_path"])
+            if isinstance(metadata, ChunkStore):
+                metadata.close()
+        else:
+            print(f"Warning: Index not found for {service_name}")
+
+    unified = _load_unified(versions)
+    print(
+        f"Loaded {unified.index_type} index: {unified.index.ntotal} chunks, "
+        f"services: {list(unified.services)}"
+    )
+    return {"unified": unified, "versions": versions}
+
+
+def _close_indices(data: dict):
+    data["unified"].close()
+
+
+def _files_fingerprint() -> tuple:
+    """(path, mtime, size) of every file a generation is loaded from."""
+    paths = [os.path.join(UNIFIED_DIR, MANIFEST_FILE)]
+    for service_paths in SERVICES.values():
+        base = store_base(service_paths["meta_path"])
+        paths += [service_paths["index_path"], service_paths["meta_path"], base + HEADER_SUFFIX]
+
+    fingerprint = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            fingerprint.append((path, stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            fingerprint.append((path, None, None))
+    return tuple(fingerprint)
+
+
+_index_store = registry.register(
+    "indices",
+    lambda: IndexGenerations(_load_indices, _files_fingerprint, _close_indices)
 )
 
+
+def reload_indices(force: bool = False) -> dict:
+    """
+    Load changed index files as a new generation and swap it in.
+    In-flight searches finish on the previous generation.
+    """
+    start = time.perf_counter()
+    generations = _index_store.get()
+    try:
+        generation = generations.reload(force=force)
+    except Exception as e:
+        _index_reloads.inc(result="error")
+        print(f"Index reload failed, keeping generation {generations.current.number}: {e!r}")
+        raise
+    _index_reloads.inc(result="reloaded" if generation else "unchanged")
+    current = generations.current
+    return {
+        "reloaded": generation is not None,
+        "generation": current.number,
+        "versions": current.data["versions"],
+        "seconds": round(time.perf_counter() - start, 3)
+    }
+
+
+def _watch_indices(stop: threading.Event, interval: float):
+    pending = None
+    while not stop.wait(interval):
+        if not _index_store.loaded:
+            continue
+        generations = _index_store.get()
+        try:
+            if not generations.changed():
+                pending = None
+                continue
+            # Builders write several files: wait until they stop changing
+            fingerprint = _files_fingerprint()
+            if fingerprint != pending:
+                pending = fingerprint
+                continue
+            pending = None
+            reload_indices()
+        except Exception as e:
+            print(f"Index watcher: {e!r}")
+
+
+def start_index_watcher(interval: float = INDEX_WATCH_INTERVAL) -> Optional[threading.Event]:
+    """
+    Poll the index files and hot-reload them when they change.
+
+    Returns:
+        Event that stops the watcher when set, or None if disabled
+    """
+    if interval <= 0:
+        return None
+    stop = threading.Event()
+    threading.Thread(
+        target=_watch_indices, args=(stop, interval), name="index-watcher", daemon=True
+    ).start()
+    return stop
+
+
 def get_available_services():
     """Return list of services with loaded indices"""
-    return list(indices.keys())
+    return list(_index_store.get().current.data["unified"].services.keys())
+
+def get_index_version(service: str) -> str:
+    """Fingerprint of the loaded chunk metadata for a service."""
+    return _index_store.get().current.data["versions"].get(service, "")
+
+
+def _to_result(chunk: dict, score: float) -> dict:
+    return {
+        "service": chunk["service"],
+        "state": chunk["state"],
+        "section": chunk["section"],
+        "intent": chunk_intent(chunk),
+        "text": chunk["text"],
+        "score": float(score)
+    }
 
-def retrieve_chunks(query: str, service: str = None, k: int = 3):
+
+def reciprocal_rank_fusion(rankings: list, k: int = RRF_K) -> dict:
     """
-    Retrieve relevant chunks for a query with STRICT service isolation.
+    Fuse ranked ID lists: score(id) = sum over lists of 1 / (k + rank).
+
+    Returns:
+        id -> fused score
+    """
+    fused = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, 1):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return fused
+
+
+def fuse_results(result_lists: list, k: int) -> list:
+    """
+    Fuse ranked result lists (e.g. retrievals for a rewritten query and
+    for the query as the user typed it) with RRF; scores become fused RRF
+    scores. A chunk found by several lists keeps the entry of the first
+    list that has it. Rerank scores are only kept from the first list,
+    since the others were reranked against a different query text.
+
+    Returns:
+        Top-k fused results, best first
     """
+    entries, rankings = {}, []
+    for position, results in enumerate(result_lists):
+        keys = []
+        for result in results:
+            key = (result["service"], result["section"], result["text"])
+            if key not in entries:
+                if position > 0:
+                    result = {name: value for name, value in result.items() if name != "rerank_score"}
+                entries[key] = result
+            keys.append(key)
+        rankings.append(keys)
+    fused = reciprocal_rank_fusion(rankings)
+    ranked = sorted(fused.items(), key=lambda item: item[1], reverse=True)[:k]
+    return [{**entries[key], "score": score} for key, score in ranked]
 
-    query_embedding = model.encode([query], convert_to_numpy=True)
-    faiss.normalize_L2(query_embedding)
 
+def _search_many(
+    unified: UnifiedIndex,
+    query_embeddings: list,
+    services,
+    k: int,
+    intent: str = None
+) -> list:
+    """
+    Dense search of several queries with one stacked query matrix, each
+    fused with BM25 when HYBRID_RETRIEVAL is on. Result scores are cosine
+    similarities, or fused RRF scores in hybrid mode.
+
+    Returns:
+        One result list per query
+    """
+    n = max(k, FUSION_CANDIDATES) if HYBRID_RETRIEVAL else k
+    matrix = np.vstack([qe.matrix for qe in query_embeddings])
+    with span("faiss_search"):
+        all_scores, all_ids = unified.search(matrix, n, services, intent)
     results = []
+    for query_embedding, scores, ids in zip(query_embeddings, all_scores, all_ids):
+        ranked = [(int(i), float(s)) for i, s in zip(ids, scores) if i >= 0]
+        results.append(_collect_results(unified, query_embedding, ranked, n, services, k, intent))
+    return results
 
-    # 🚨 STRICT service enforcement
-    if not service:
-        raise ValueError(
-            "Service must be specified for retrieval to avoid cross-service leakage."
-        )
 
-    if service not in indices:
-        raise ValueError(
-            f"Service '{service}' not found. Available: {get_available_services()}"
+def _collect_results(
+    unified: UnifiedIndex,
+    query_embedding: QueryEmbedding,
+    ranked: list,
+    n: int,
+    services,
+    k: int,
+    intent: str = None
+) -> list:
+    """Fuse one query's dense hits with BM25 and turn them into results."""
+    if HYBRID_RETRIEVAL:
+        with span("bm25_search"):
+            lexical = unified.search_lexical(query_embedding.text, n, services, intent)
+        fused = reciprocal_rank_fusion([
+            [i for i, _ in ranked],
+            [i for i, _ in lexical]
+        ])
+        ranked = sorted(fused.items(), key=lambda item: item[1], reverse=True)
+
+    results = []
+    by_parent = {}
+    for global_id, score in ranked:
+        chunk = unified.chunk(global_id)
+        # 🛡️ Final safety guard: only chunks of the requested services
+        if services and chunk.get("service") not in services:
+            continue
+
+        # Spans of one parent: return the parent once instead
+        parent_id = chunk.get("parent_id")
+        if parent_id in by_parent:
+            result = by_parent[parent_id]
+            result["text"] = unified.parent_text(global_id)
+            continue
+
+        result = _to_result(chunk, score)
+        if chunk.get("span_count", 1) > 1 and chunk.get("parent_tokens", 0) <= PARENT_EXPAND_MAX_TOKENS:
+            result["text"] = unified.parent_text(global_id)
+        if parent_id is not None:
+            by_parent[parent_id] = result
+        results.append(result)
+        if len(results) == k:
+            break
+
+    return results
+
+
+def _search(
+    unified: UnifiedIndex,
+    query_embedding: QueryEmbedding,
+    services,
+    k: int,
+    intent: str = None
+) -> list:
+    """Search for one query (see _search_many)."""
+    return _search_many(unified, [query_embedding], services, k, intent)[0]
+
+
+def search_services(
+    query_embedding: QueryEmbedding,
+    services: list = None,
+    k: int = 3
+) -> list:
+    """
+    One search over several services (all by default).
+
+    Returns:
+        Up to k result dicts across the given services, best first
+    """
+    with _index_store.get().acquire() as data:
+        return _search(data["unified"], query_embedding, services, k)
+
+
+def route_query(query_embedding: QueryEmbedding) -> RoutingDecision:
+    """Route a query to its service(s) with the index's service router."""
+    return route_queries(query_embedding.matrix)[0]
+
+
+def route_queries(query_matrix: np.ndarray) -> list:
+    """Route a batch of query vectors: one RoutingDecision per row."""
+    with _index_store.get().acquire() as data:
+        return data["unified"].router.route(
+            query_matrix, ROUTER_MIN_CONFIDENCE, ROUTER_MIN_MARGIN, ROUTER_MAX_SERVICES
         )
 
-    # Search ONLY the requested service
-    index = indices[service]
-    metadata = metadata_store[service]
 
-    scores, idxs = index.search(query_embedding, k)
+def _scoped_intent(unified: UnifiedIndex, intent: Optional[str], services: list) -> Optional[str]:
+    """The intent, or None when the services have no chunks labelled with it."""
+    if intent is not None and not len(unified.intent_ids(intent, services)):
+        return None
+    return intent
+
+
+def retrieve_batch(
+    query_embeddings: list,
+    decisions: list,
+    k: int = 3,
+    intents: list = None
+) -> list:
+    """
+    Retrieve for many routed queries. Queries that search the same
+    services (and intent) share one index search over their stacked query
+    matrix.
+
+    A confident decision searches its one service; an ambiguous one
+    searches its candidate services together and the service owning the
+    best chunk wins. Results always come from that one service.
 
-    for idx, score in zip(idxs[0], scores[0]):
-        if idx < len(metadata):
-            chunk = metadata[idx]
+    Returns:
+        One (service, results) per query, in input order
+    """
+    intents = intents or [None] * len(query_embeddings)
+    n = candidate_count(k)
+    routed = [(None, [])] * len(query_embeddings)
 
-            # 🛡️ Final safety guard
-            if chunk.get("service") != service:
+    with _index_store.get().acquire() as data:
+        unified = data["unified"]
+        groups = {}
+        for position, (decision, intent) in enumerate(zip(decisions, intents)):
+            if not decision.service:
                 continue
+            # 🚨 STRICT service enforcement
+            unknown = [s for s in decision.services if s not in unified.services]
+            if unknown:
+                raise ValueError(
+                    f"Service '{unknown[0]}' not found. Available: {list(unified.services)}"
+                )
+            key = (tuple(decision.services), _scoped_intent(unified, intent, decision.services))
+            groups.setdefault(key, []).append(position)
 
-            results.append({
-                "service": chunk["service"],
-                "state": chunk["state"],
-                "section": chunk["section"],
-                "text": chunk["text"],
-                "score": float(score)
-            })
+        for (services, intent), positions in groups.items():
+            hits_per_query = _search_many(
+                unified, [query_embeddings[p] for p in positions], list(services), n, intent
+            )
+            for position, hits in zip(positions, hits_per_query):
+                service = hits[0]["service"] if hits else decisions[position].service
+                results = [hit for hit in hits if hit["service"] == service]
+                if len(services) > 1 and hits and len(results) < n:
+                    # The candidates were shared with the other services
+                    results = _search(
+                        unified, query_embeddings[position], [service], n,
+                        _scoped_intent(unified, intents[position], [service])
+                    )
+                routed[position] = (service, results)
 
-    # Sort by similarity
-    results.sort(key=lambda x: x["score"], reverse=True)
+    return [
+        (service, rerank(query_embedding.text, results, k))
+        for query_embedding, (service, results) in zip(query_embeddings, routed)
+    ]
 
-    return results
+
+def retrieve_routed(
+    query_embedding: QueryEmbedding,
+    decision: RoutingDecision,
+    k: int = 3,
+    intent: str = None
+):
+    """
+    Retrieve for one routing decision (see retrieve_batch).
+
+    Returns:
+        (service, results)
+    """
+    return retrieve_batch([query_embedding], [decision], k, [intent])[0]
+
+
+def route_and_retrieve(
+    query: str,
+    k: int = 3,
+    query_embedding: QueryEmbedding = None
+):
+    """
+    Service routing and retrieval: the router picks the service, or the
+    few candidate services of an ambiguous query, which are then searched
+    together.
+
+    Returns:
+        (service, results, decision); service is None if nothing was found
+    """
+    if query_embedding is None:
+        query_embedding = embed_query(query)
+
+    decision = route_query(query_embedding)
+    service, results = retrieve_routed(query_embedding, decision, k)
+    return service, results, decision
+
+
+def classify_intent(query_embedding: QueryEmbedding) -> Optional[str]:
+    """
+    Query intent from the index's centroid classifier, known before
+    retrieval. None when disabled or not confident.
+    """
+    if not INTENT_CLASSIFIER_ENABLED:
+        return None
+    with _index_store.get().acquire() as data:
+        classifier = data["unified"].intent_classifier
+        if classifier is None:
+            return None
+        intent, _ = classifier.predict(
+            query_embedding.vector, INTENT_MIN_SCORE, INTENT_MIN_MARGIN
+        )
+    return intent
+
+
+def retrieve_chunks(
+    query: str,
+    service: str = None,
+    k: int = 3,
+    query_embedding: QueryEmbedding = None,
+    intent: str = None
+):
+    """
+    Retrieve relevant chunks for a query with STRICT service isolation.
+
+    Pass the request's QueryEmbedding to reuse the vector already
+    computed for service detection. With an intent, only chunks labelled
+    with it are searched (falling back to the whole service when the
+    service has none).
+    """
+
+    if query_embedding is None:
+        query_embedding = embed_query(query)
+
+    # 🚨 STRICT service enforcement
+    if not service:
+        raise ValueError(
+            "Service must be specified for retrieval to avoid cross-service leakage."
+        )
+
+    with _index_store.get().acquire() as data:
+        unified = data["unified"]
+        if service not in unified.services:
+            raise ValueError(
+                f"Service '{service}' not found. Available: {list(unified.services)}"
+            )
+
+        # Search ONLY the requested service (ID-range filter on the unified index)
+        candidates = _search(
+            unified, query_embedding, [service], candidate_count(k),
+            _scoped_intent(unified, intent, [service])
+        )
+
+    return rerank(query_embedding.text, candidates, k)
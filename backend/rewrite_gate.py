@@ -0,0 +1,109 @@
+import os
+import re
+from typing import Optional, Tuple
+
+import numpy as np
+
+from embeddings import embed_query, QueryEmbedding
+from metrics import counter
+
+# ===============================
+# Query rewrite gate
+# ===============================
+# rewrite_query costs a full LLM round trip. Most follow-ups are already
+# standalone ("what documents are needed for a birth certificate?"), so a
+# cheap local check decides whether the rewrite is worth calling at all.
+REWRITE_GATE_ENABLED = os.getenv("REWRITE_GATE_ENABLED", "1") == "1"
+# Similarity to the previous turn above which a query without its own
+# service anchor is treated as a continuation of that turn
+REWRITE_SIMILARITY_THRESHOLD = float(os.getenv("REWRITE_SIMILARITY_THRESHOLD", "0.5"))
+REWRITE_MIN_WORDS = int(os.getenv("REWRITE_MIN_WORDS", "4"))
+
+# Words that point back to something said earlier
+ANAPHORA = {
+    "it", "its", "this", "that", "these", "those", "they", "them", "their",
+    "same", "above", "previous", "earlier", "former", "latter",
+    "he", "she", "his", "her"
+}
+
+# Openers that continue the previous question ("and for home births?")
+ELLIPSIS_PREFIXES = (
+    "and ", "also ", "what about", "how about", "what if", "then ",
+    "so ", "but ", "or ", "else", "same for", "instead"
+)
+
+# Mentions that make a question self-contained
+SERVICE_TERMS = re.compile(
+    r"\b(ration|birth|certificate|unemployment|allowance|mgnrega|akshaya|k-smart|ilgms)"
+)
+
+_WORD = re.compile(r"[\w'-]+")
+
+gate_decisions = counter(
+    "rewrite_gate_decisions_total",
+    "Rewrite gate outcomes by decision (rewrite/skip) and reason"
+)
+
+
+def _previous_turn(history: list) -> Optional[str]:
+    """
+    Most recent earlier message. The frontend sends the current question
+    as the last history entry, so a trailing user message is skipped (by
+    position: its text may be the untranslated Malayalam of the query).
+    """
+    messages = list(history or [])
+    if messages and messages[-1].role == "user":
+        messages.pop()
+    for message in reversed(messages):
+        content = (message.content or "").strip()
+        if content:
+            return content
+    return None
+
+
+def needs_rewrite(
+    query: str,
+    history: list,
+    query_embedding: QueryEmbedding = None
+) -> Tuple[bool, str]:
+    """
+    Decide whether a follow-up needs an LLM rewrite.
+
+    Returns:
+        (rewrite, reason)
+    """
+    previous = _previous_turn(history)
+    if previous is None:
+        return False, "no_history"
+
+    text = query.lower().strip()
+    words = _WORD.findall(text)
+
+    if any(w in ANAPHORA for w in words):
+        return True, "anaphora"
+    if text.startswith(ELLIPSIS_PREFIXES):
+        return True, "ellipsis"
+    if SERVICE_TERMS.search(text):
+        return False, "self_contained"
+    if len(words) < REWRITE_MIN_WORDS:
+        return True, "too_short"
+
+    # No explicit anchor either way: compare with the previous turn
+    if query_embedding is None:
+        query_embedding = embed_query(query)
+    previous_vec = embed_query(previous).vector
+    similarity = float(np.dot(query_embedding.vector, previous_vec))
+    if similarity >= REWRITE_SIMILARITY_THRESHOLD:
+        return True, "topic_continuation"
+    return False, "topic_shift"
+
+
+def gate(query: str, history: list, query_embedding: QueryEmbedding = None) -> bool:
+    """needs_rewrite plus metrics; always rewrites when the gate is disabled."""
+    if not REWRITE_GATE_ENABLED:
+        rewrite, reason = bool(history), "gate_disabled"
+    else:
+        rewrite, reason = needs_rewrite(query, history, query_embedding)
+
+    gate_decisions.inc(decision="rewrite" if rewrite else "skip", reason=reason)
+    return rewrite
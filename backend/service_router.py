@@ -0,0 +1,335 @@
+import hashlib
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+# ===============================
+# Service router
+# ===============================
+# Each service is represented by several prototype vectors: the embedding
+# of its description below and the centroid of each of its sections'
+# chunks. The prototypes of all services are built with the unified index
+# (embedding/build_faiss_index.py) and saved as one matrix grouped by
+# service, so routing a query is one matmul plus a per-service max, with
+# no Python loop over services.
+#
+# Scores are turned into probabilities with a softmax whose temperature
+# is calibrated on the chunk vectors (each labelled with its service).
+
+SERVICE_DESCRIPTIONS = {
+    "ration_card": """
+    Kerala ration card services including eligibility criteria,
+    required documents, card types, online application through
+    Civil Supplies portal, Akshaya centre offline process,
+    fees, timelines, corrections, and member changes.
+    """,
+
+    "birth_certificate": """
+    Kerala birth certificate registration including eligibility,
+    registration timelines, required documents for hospital and
+    home births, online portals like K-SMART and ILGMS,
+    offline registration at local bodies, late registration,
+    corrections, duplicates, and special cases.
+    """,
+
+    "unemployment_allowance": """
+    Kerala unemployment allowance schemes including Unemployment
+    Allowance Scheme and MGNREGA unemployment allowance,
+    eligibility conditions, required documents, application
+    process through local bodies, benefit rules, appeals,
+    and legal framework.
+    """
+}
+
+DEFAULT_TEMPERATURE = 0.05
+# Softmax temperatures tried by calibrate()
+TEMPERATURE_GRID = np.geomspace(0.01, 1.0, 41)
+
+
+def description_hash(text: str) -> str:
+    """Fingerprint of a description (whitespace-insensitive)."""
+    return hashlib.sha1(" ".join(text.split()).encode("utf-8")).hexdigest()[:16]
+
+
+def description_vectors(
+    services: Sequence[str],
+    encode: Callable[[List[str]], np.ndarray],
+    previous: Optional["ServiceRouter"] = None
+) -> Dict[str, Tuple[str, np.ndarray]]:
+    """
+    Description prototype of each service that has a description.
+    Vectors of unchanged descriptions are reused from `previous`;
+    `encode` is only called for new or edited ones.
+
+    Returns:
+        service -> (description hash, normalized vector)
+    """
+    reused = previous.description_vectors() if previous is not None else {}
+    result, missing = {}, {}
+    for service in services:
+        if service not in SERVICE_DESCRIPTIONS:
+            continue
+        digest = description_hash(SERVICE_DESCRIPTIONS[service])
+        if service in reused and reused[service][0] == digest:
+            result[service] = reused[service]
+        else:
+            missing[service] = digest
+
+    if missing:
+        vectors = np.asarray(encode([SERVICE_DESCRIPTIONS[s] for s in missing]), dtype="float32")
+        vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        result.update((s, (digest, v)) for (s, digest), v in zip(missing.items(), vectors))
+    return result
+
+
+def _softmax(scores: np.ndarray, temperature: float) -> np.ndarray:
+    logits = scores / temperature
+    logits -= logits.max(axis=1, keepdims=True)
+    exp = np.exp(logits)
+    return exp / exp.sum(axis=1, keepdims=True)
+
+
+class RoutingDecision(NamedTuple):
+    """Routing result for one query."""
+    service: Optional[str]            # most likely service
+    services: List[str]               # services to search (several when ambiguous)
+    confidence: float                 # probability of `service`
+    margin: float                     # top-1 minus top-2 probability
+    probabilities: Dict[str, float]   # service -> probability
+
+
+class ServiceRouter:
+    """
+    Multi-prototype service router.
+
+    Attributes:
+        services: service names, in the order of the score columns
+        prototypes: (n_prototypes, dim) normalized vectors, grouped by service
+        owners: service position of each prototype
+        descriptions: service -> hash of the description its description
+            prototype was encoded from
+        temperature: softmax temperature
+    """
+
+    def __init__(
+        self,
+        services: List[str],
+        prototypes: np.ndarray,
+        owners: np.ndarray,
+        is_description: np.ndarray,
+        descriptions: Dict[str, str],
+        temperature: float = DEFAULT_TEMPERATURE
+    ):
+        order = np.argsort(owners, kind="stable")
+        owners = np.asarray(owners, dtype="int64")[order]
+        # Services without any prototype cannot be routed to
+        present = np.unique(owners)
+        remap = np.full(len(services), -1, dtype="int64")
+        remap[present] = np.arange(len(present))
+
+        self.services = [services[i] for i in present]
+        self.prototypes = np.ascontiguousarray(np.asarray(prototypes, dtype="float32")[order])
+        self.owners = remap[owners]
+        self.is_description = np.asarray(is_description, dtype=bool)[order]
+        self.descriptions = {s: h for s, h in descriptions.items() if s in self.services}
+        self.temperature = float(temperature)
+        # First prototype row of each service, for np.maximum.reduceat
+        self._offsets = np.searchsorted(self.owners, np.arange(len(self.services)))
+
+    # ---------- construction ----------
+
+    @classmethod
+    def build(
+        cls,
+        vectors: np.ndarray,
+        metadata: Sequence[Dict],
+        services: Dict[str, Dict],
+        descriptions: Optional[Dict[str, Tuple[str, np.ndarray]]] = None
+    ) -> "ServiceRouter":
+        """
+        Section centroids of every service, plus description prototypes.
+
+        Args:
+            vectors: normalized chunk vectors by global ID
+            metadata: chunks by global ID
+            services: service -> {"start", "end"} ID ranges
+            descriptions: service -> (description hash, vector), see
+                description_vectors()
+        """
+        names = list(services)
+        prototypes, owners, sums, rows = [], [], [], []
+        for position, name in enumerate(names):
+            info = services[name]
+            sections = [metadata[i].get("section", "") for i in range(info["start"], info["end"])]
+            if not sections:
+                continue
+            section_names, inverse = np.unique(sections, return_inverse=True)
+            section_sums = np.zeros((len(section_names), vectors.shape[1]), dtype="float64")
+            np.add.at(section_sums, inverse, vectors[info["start"]:info["end"]])
+            prototypes.append(section_sums / np.linalg.norm(section_sums, axis=1, keepdims=True))
+            rows.append(len(owners) + inverse)
+            sums.append(section_sums)
+            owners += [position] * len(section_names)
+
+        router = cls(
+            names, np.vstack(prototypes), np.array(owners),
+            np.zeros(len(owners), dtype=bool), {}
+        )
+
+        # Calibrate on the chunks themselves, each scored against its own
+        # section centroid computed without it (leave-one-out); otherwise
+        # every chunk would look like a perfect match
+        routed = [(name, services[name]) for name in router.services]
+        ids = np.concatenate([np.arange(info["start"], info["end"]) for _, info in routed])
+        labels = np.concatenate([
+            np.full(info["end"] - info["start"], column) for column, (_, info) in enumerate(routed)
+        ])
+        chunk_vectors = vectors[ids].astype("float64")
+        own_rows = np.concatenate(rows)
+        similarities = router.prototypes.astype("float64") @ chunk_vectors.T
+        rest = np.vstack(sums)[own_rows] - chunk_vectors
+        norms = np.linalg.norm(rest, axis=1)
+        # A section with a single chunk has no centroid without it
+        similarities[own_rows, np.arange(len(ids))] = np.where(
+            norms > 1e-6, (rest * chunk_vectors).sum(axis=1) / np.maximum(norms, 1e-6), -1.0
+        )
+        scores = np.maximum.reduceat(similarities, router._offsets, axis=0).T
+
+        if descriptions:
+            router = router.with_descriptions(descriptions)
+            for column, (name, _) in enumerate(routed):
+                if name in descriptions:
+                    vector = descriptions[name][1].astype("float64")
+                    scores[:, column] = np.maximum(scores[:, column], chunk_vectors @ vector)
+
+        router.calibrate(scores, labels)
+        return router
+
+    def with_descriptions(self, descriptions: Dict[str, Tuple[str, np.ndarray]]) -> "ServiceRouter":
+        """Copy with the description prototypes of the given services replaced."""
+        names = self.services + [s for s in descriptions if s not in self.services]
+        replaced = np.array([
+            d and self.services[o] in descriptions
+            for o, d in zip(self.owners, self.is_description)
+        ], dtype=bool)
+        keep = ~replaced
+        added = list(descriptions.items())
+        return ServiceRouter(
+            names,
+            np.vstack([self.prototypes[keep]] + [v.reshape(1, -1) for _, (_, v) in added]),
+            np.concatenate([self.owners[keep], [names.index(s) for s, _ in added]]),
+            np.concatenate([self.is_description[keep], np.ones(len(added), dtype=bool)]),
+            {**self.descriptions, **{s: h for s, (h, _) in added}},
+            self.temperature
+        )
+
+    def description_vectors(self) -> Dict[str, Tuple[str, np.ndarray]]:
+        """service -> (description hash, vector) of the stored description prototypes."""
+        rows = np.flatnonzero(self.is_description)
+        return {
+            self.services[self.owners[row]]: (
+                self.descriptions.get(self.services[self.owners[row]], ""),
+                self.prototypes[row]
+            )
+            for row in rows
+        }
+
+    def stale_descriptions(self) -> List[str]:
+        """Routed services whose description is missing or was edited since the build."""
+        return [
+            service for service in self.services
+            if service in SERVICE_DESCRIPTIONS
+            and self.descriptions.get(service) != description_hash(SERVICE_DESCRIPTIONS[service])
+        ]
+
+    def calibrate(self, scores: np.ndarray, labels: np.ndarray):
+        """
+        Pick the softmax temperature with the lowest log loss.
+
+        Args:
+            scores: (n, n_services) service scores of labelled vectors
+            labels: service column of each vector
+        """
+        if len(self.services) < 2 or not len(scores):
+            return
+        rows = np.arange(len(labels))
+
+        def log_loss(temperature):
+            return -np.log(_softmax(scores, temperature)[rows, labels] + 1e-12).mean()
+
+        self.temperature = float(min(TEMPERATURE_GRID, key=log_loss))
+
+    @classmethod
+    def load(cls, path: str) -> "ServiceRouter":
+        with np.load(path, allow_pickle=False) as saved:
+            return cls(
+                saved["services"].tolist(),
+                saved["prototypes"],
+                saved["owners"],
+                saved["is_description"],
+                dict(zip(saved["description_services"].tolist(), saved["description_hashes"].tolist())),
+                float(saved["temperature"])
+            )
+
+    def save(self, path: str):
+        with open(path, "wb") as f:
+            np.savez(
+                f,
+                services=np.array(self.services, dtype=str),
+                prototypes=self.prototypes,
+                owners=self.owners,
+                is_description=self.is_description,
+                description_services=np.array(list(self.descriptions), dtype=str),
+                description_hashes=np.array(list(self.descriptions.values()), dtype=str),
+                temperature=np.float64(self.temperature)
+            )
+
+    # ---------- routing ----------
+
+    def scores(self, query_matrix: np.ndarray) -> np.ndarray:
+        """
+        Best prototype similarity of every service.
+
+        Returns:
+            (n_queries, n_services) cosine similarities
+        """
+        similarities = self.prototypes @ np.asarray(query_matrix, dtype="float32").T
+        return np.maximum.reduceat(similarities, self._offsets, axis=0).T
+
+    def route(
+        self,
+        query_matrix: np.ndarray,
+        min_confidence: float,
+        min_margin: float,
+        max_services: int = 2
+    ) -> List[RoutingDecision]:
+        """
+        Route a batch of queries.
+
+        A query is ambiguous when its top service's probability is below
+        min_confidence or beats the runner-up by less than min_margin; it
+        then keeps its max_services most likely services to search.
+
+        Returns:
+            One RoutingDecision per query row
+        """
+        probabilities = _softmax(self.scores(query_matrix), self.temperature)
+        order = np.argsort(-probabilities, axis=1)
+        top = np.take_along_axis(probabilities, order[:, :2], axis=1)
+        runner_up = top[:, 1] if top.shape[1] > 1 else np.zeros(len(top))
+        margins = top[:, 0] - runner_up
+        ambiguous = (top[:, 0] < min_confidence) | (margins < min_margin)
+
+        decisions = []
+        for row, ranked in enumerate(order):
+            searched = ranked[:max(1, max_services)] if ambiguous[row] else ranked[:1]
+            decisions.append(RoutingDecision(
+                service=self.services[ranked[0]],
+                services=[self.services[i] for i in searched],
+                confidence=float(top[row, 0]),
+                margin=float(margins[row]),
+                probabilities={
+                    name: round(float(p), 4) for name, p in zip(self.services, probabilities[row])
+                }
+            ))
+        return decisions
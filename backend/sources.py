@@ -0,0 +1,49 @@
+import os
+import csv
+from typing import Dict
+
+# ===============================
+# Service sources (sources.csv)
+# ===============================
+# One row per service:
+#   service    service key used by the API ("ration_card", ...)
+#   data_dir   service data directory, relative to the project root
+#   name       file stem of its artifacts:
+#                <data_dir>/chunks/<name>_chunks.json
+#                <data_dir>/chunks/<name>_spans.json   (cleaning/chunking.py)
+#                <data_dir>/faiss/<name>.index
+#                <data_dir>/faiss/<name>_metadata.json
+
+# Project root is one level ABOVE backend/
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SOURCES_FILE = os.getenv("SOURCES_FILE", os.path.join(BASE_DIR, "sources.csv"))
+
+
+def service_paths(data_dir: str, name: str) -> Dict[str, str]:
+    """Artifact paths of one service."""
+    data_dir = os.path.join(BASE_DIR, data_dir)
+    return {
+        "chunks_path": os.path.join(data_dir, "chunks", f"{name}_chunks.json"),
+        "spans_path": os.path.join(data_dir, "chunks", f"{name}_spans.json"),
+        "index_path": os.path.join(data_dir, "faiss", f"{name}.index"),
+        "meta_path": os.path.join(data_dir, "faiss", f"{name}_metadata.json")
+    }
+
+
+def load_sources(path: str = SOURCES_FILE) -> Dict[str, Dict[str, str]]:
+    """
+    Read sources.csv.
+
+    Returns:
+        service -> artifact paths, in file order
+    """
+    services = {}
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            if not row.get("service"):
+                continue
+            services[row["service"].strip()] = service_paths(
+                row["data_dir"].strip(), row["name"].strip()
+            )
+    return services
@@ -0,0 +1,91 @@
+import os
+import time
+import contextvars
+from contextlib import contextmanager, nullcontext
+
+from metrics import histogram
+
+# ===============================
+# Stage tracing
+# ===============================
+# span(name) times one stage of request handling (translation, retrieval,
+# synthesis, ...). Every span is observed in the stage_duration_seconds
+# histogram and, with OTEL_TRACING_ENABLED=1 and the OpenTelemetry SDK
+# installed, exported as an OpenTelemetry span (OTLP over HTTP, configured
+# with the standard OTEL_EXPORTER_OTLP_* variables).
+#
+# The innermost stage is visible to nested code through current_stage(),
+# so e.g. LLM metrics say which stage made the call.
+
+OTEL_TRACING_ENABLED = os.getenv("OTEL_TRACING_ENABLED", "0") == "1"
+OTEL_SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "kerala-services-assistant")
+
+_stage_seconds = histogram("stage_duration_seconds", "Time spent per request stage")
+_current_stage = contextvars.ContextVar("current_stage", default="")
+
+
+def _load_tracer():
+    if not OTEL_TRACING_ENABLED:
+        return None
+    # OpenTelemetry is optional: only imported when tracing is enabled
+    try:
+        from opentelemetry import trace
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+    except ImportError as e:
+        print(f"Warning: OTEL_TRACING_ENABLED=1 but OpenTelemetry is not installed ({e})")
+        return None
+
+    provider = TracerProvider(resource=Resource.create({"service.name": OTEL_SERVICE_NAME}))
+    provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+    trace.set_tracer_provider(provider)
+    print(f"OpenTelemetry tracing enabled ({OTEL_SERVICE_NAME})")
+    return trace.get_tracer(__name__)
+
+
+_tracer = _load_tracer()
+
+
+def current_stage() -> str:
+    """Name of the innermost stage span ("" outside of any)."""
+    return _current_stage.get()
+
+
+def otel_span(name: str, **attributes):
+    """An OpenTelemetry span only (no stage metrics); no-op when tracing is off."""
+    if _tracer is None:
+        return nullcontext()
+    return _tracer.start_as_current_span(name, attributes=_clean(attributes))
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Time a stage: stage_duration_seconds{stage=name} plus an OpenTelemetry span."""
+    token = _current_stage.set(name)
+    start = time.perf_counter()
+    try:
+        with otel_span(name, **attributes):
+            yield
+    finally:
+        _stage_seconds.observe(time.perf_counter() - start, stage=name)
+        _current_stage.reset(token)
+
+
+def record_stage(name: str, seconds: float):
+    """Record a stage timed elsewhere (e.g. while streaming)."""
+    _stage_seconds.observe(seconds, stage=name)
+
+
+def set_attributes(**attributes):
+    """Attach attributes to the current OpenTelemetry span, if tracing."""
+    if _tracer is None:
+        return
+    from opentelemetry import trace
+    trace.get_current_span().set_attributes(_clean(attributes))
+
+
+def _clean(attributes: dict) -> dict:
+    # OpenTelemetry attributes cannot be None
+    return {key: value for key, value in attributes.items() if value is not None}
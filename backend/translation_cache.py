@@ -0,0 +1,146 @@
+import os
+import re
+import time
+import asyncio
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Optional
+
+from metrics import register_cache
+
+# ===============================
+# Translation cache
+# ===============================
+# Content-addressed: the key is a hash of (direction, prompt version,
+# normalized text), so identical texts translated with the same prompt
+# are only sent to the LLM once.
+#
+# Two tiers:
+#   - bounded in-memory LRU (per worker)
+#   - optional SQLite file, shared by all workers and kept across restarts
+TRANSLATION_CACHE_ENABLED = os.getenv("TRANSLATION_CACHE_ENABLED", "1") == "1"
+TRANSLATION_CACHE_MAX_ENTRIES = int(os.getenv("TRANSLATION_CACHE_MAX_ENTRIES", "2048"))
+TRANSLATION_CACHE_DB = os.getenv("TRANSLATION_CACHE_DB")  # unset = memory only
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """NFC-normalize and collapse whitespace so trivial variants share a key."""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+def cache_key(text: str, direction: str, prompt_version: str) -> str:
+    payload = "\x00".join([direction, prompt_version, normalize_text(text)])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class TranslationCache:
+    """Memory LRU in front of an optional SQLite store."""
+
+    def __init__(
+        self,
+        max_entries: int = TRANSLATION_CACHE_MAX_ENTRIES,
+        db_path: Optional[str] = TRANSLATION_CACHE_DB
+    ):
+        self.max_entries = max_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        # The SQLite connection is shared by worker threads, one at a time
+        self._db_lock = threading.Lock()
+        self._db = None
+        self.hits = 0
+        self.misses = 0
+
+        if db_path:
+            try:
+                self._db = self._open_db(db_path)
+                print(f"Translation cache: using {db_path}")
+            except sqlite3.Error as e:
+                print(f"Warning: translation cache DB unavailable ({e}), memory only")
+
+    @staticmethod
+    def _open_db(path: str) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        db = sqlite3.connect(path, timeout=5.0, check_same_thread=False)
+        # WAL lets several uvicorn workers read while one writes
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute(
+            """CREATE TABLE IF NOT EXISTS translations (
+                key TEXT PRIMARY KEY,
+                direction TEXT NOT NULL,
+                translation TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )"""
+        )
+        db.commit()
+        return db
+
+    def _remember(self, key: str, translation: str):
+        self._memory[key] = translation
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _db_get(self, key: str) -> Optional[str]:
+        with self._db_lock:
+            try:
+                row = self._db.execute(
+                    "SELECT translation FROM translations WHERE key = ?",
+                    (key,)
+                ).fetchone()
+            except sqlite3.Error as e:
+                print(f"Translation cache read failed: {e}")
+                return None
+        return row[0] if row is not None else None
+
+    def _db_put(self, key: str, direction: str, translation: str):
+        with self._db_lock:
+            try:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO translations VALUES (?, ?, ?, ?)",
+                    (key, direction, translation, time.time())
+                )
+                self._db.commit()
+            except sqlite3.Error as e:
+                print(f"Translation cache write failed: {e}")
+
+    async def get(self, text: str, direction: str, prompt_version: str) -> Optional[str]:
+        """
+        Cached translation, if any. The memory tier is checked inline; the
+        SQLite tier runs in a worker thread, since a writer in another
+        worker can keep it busy for up to the 5 s busy timeout.
+        """
+        key = cache_key(text, direction, prompt_version)
+        with self._lock:
+            translation = self._memory.get(key)
+            if translation is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return translation
+
+        if self._db is not None:
+            translation = await asyncio.to_thread(self._db_get, key)
+            if translation is not None:
+                with self._lock:
+                    self._remember(key, translation)
+                    self.hits += 1
+                return translation
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    async def put(self, text: str, direction: str, prompt_version: str, translation: str):
+        key = cache_key(text, direction, prompt_version)
+        with self._lock:
+            self._remember(key, translation)
+        if self._db is not None:
+            await asyncio.to_thread(self._db_put, key, direction, translation)
+
+translation_cache = TranslationCache()
+register_cache("translation", translation_cache)
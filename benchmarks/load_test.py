@@ -0,0 +1,343 @@
+"""
+End-to-end load / latency benchmark, fully offline.
+
+Starts the mock OpenRouter (benchmarks/mock_openrouter.py) and the
+FastAPI app (uvicorn, pointed at the mock), drives /ask and /retrieve
+at a fixed concurrency with the queries in benchmarks/queries.json, and
+prints a JSON report:
+
+    app          startup time, RSS when idle and peak RSS
+    scenarios    per endpoint: requests, errors, status codes, throughput,
+                 p50/p95/p99 latency and per-stage latencies (from the
+                 Server-Timing header)
+    mock         LLM calls served by the mock, by outcome and model
+
+Usage:
+    python benchmarks/load_test.py --concurrency 8 --requests 200 --out bench.json
+    python benchmarks/load_test.py --scenario retrieve --concurrency 32
+    python benchmarks/load_test.py --latency lognormal:900,0.6 --rate-429 0.1
+    python benchmarks/load_test.py --app-url http://127.0.0.1:8000 --app-pid 1234
+
+Compare against an earlier report; exits with status 1 when any
+scenario's p95 latency grew by more than --max-regression:
+    python benchmarks/load_test.py --baseline bench.json --max-regression 0.2
+
+The answer and translation caches are disabled in the started app unless
+--keep-caches is given, so repeated queries measure the full path.
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import platform
+import subprocess
+from collections import Counter, defaultdict
+
+import httpx
+import numpy as np
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(script_dir)
+
+SCENARIOS = {
+    # endpoint, request fields it accepts
+    "ask": ("/ask", ("query", "top_k", "service", "history", "include_sources")),
+    "retrieve": ("/retrieve", ("query", "top_k", "service")),
+}
+
+
+def percentiles(values) -> dict:
+    if not values:
+        return {}
+    values = np.asarray(values, dtype="float64")
+    return {
+        "p50": round(float(np.percentile(values, 50)), 2),
+        "p95": round(float(np.percentile(values, 95)), 2),
+        "p99": round(float(np.percentile(values, 99)), 2),
+        "mean": round(float(values.mean()), 2),
+        "max": round(float(values.max()), 2)
+    }
+
+
+def parse_server_timing(header: str) -> dict:
+    """'embed;dur=12.3, retrieve;dur=4.0' -> {"embed": 12.3, "retrieve": 4.0} (ms)."""
+    stages = {}
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "dur" and name:
+                try:
+                    stages[name] = float(value)
+                except ValueError:
+                    pass
+    return stages
+
+
+def rss_mb(pid: int) -> dict:
+    """Current and peak resident memory of a process (Linux /proc)."""
+    result = {}
+    try:
+        with open(f"/proc/{pid}/status", "r") as f:
+            for line in f:
+                if line.startswith(("VmRSS:", "VmHWM:")):
+                    key = "rss_mb" if line.startswith("VmRSS") else "peak_rss_mb"
+                    result[key] = round(int(line.split()[1]) / 1024, 1)
+    except (FileNotFoundError, PermissionError):
+        pass
+    return result
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=project_root,
+            capture_output=True, text=True, timeout=10
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ""
+
+
+def wait_until(url: str, timeout: float, process: subprocess.Popen = None):
+    """Poll a URL until it answers 200."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"{process.args} exited with status {process.returncode}")
+        try:
+            if httpx.get(url, timeout=2).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise TimeoutError(f"{url} not ready after {timeout:.0f}s")
+
+
+def start_mock(args) -> subprocess.Popen:
+    command = [
+        sys.executable, os.path.join(script_dir, "mock_openrouter.py"),
+        "--port", str(args.mock_port),
+        "--latency", args.latency,
+        "--token-delay-ms", str(args.token_delay_ms),
+        "--rate-429", str(args.rate_429),
+        "--rate-503", str(args.rate_503),
+        "--seed", str(args.seed)
+    ]
+    process = subprocess.Popen(command, stdout=sys.stderr)
+    wait_until(f"http://127.0.0.1:{args.mock_port}/stats", 30, process)
+    return process
+
+
+def start_app(args) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.update({
+        "OPENROUTER_BASE_URL": f"http://127.0.0.1:{args.mock_port}/api/v1/chat/completions",
+        "OPENROUTER_API_KEY": "benchmark",
+        "WARMUP_MODE": "blocking",
+        "INDEX_WATCH_INTERVAL": "0"
+    })
+    if not args.keep_caches:
+        env.update({"ANSWER_CACHE_ENABLED": "0", "TRANSLATION_CACHE_ENABLED": "0"})
+    for item in args.app_env:
+        key, _, value = item.partition("=")
+        env[key] = value
+
+    command = [
+        sys.executable, "-m", "uvicorn", "main:app",
+        "--host", "127.0.0.1", "--port", str(args.app_port),
+        "--workers", "1", "--log-level", "warning"
+    ]
+    # Server logs go to stderr, keeping stdout for the report
+    return subprocess.Popen(
+        command, cwd=os.path.join(project_root, "backend"), env=env, stdout=sys.stderr
+    )
+
+
+async def sample_rss(pid: int, stop: asyncio.Event, peak: dict):
+    while not stop.is_set():
+        current = rss_mb(pid).get("rss_mb")
+        if current is not None:
+            peak["rss_mb"] = max(peak.get("rss_mb", 0), current)
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=0.2)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def run_scenario(client: httpx.AsyncClient, name: str, queries: list, args, pid: int = None) -> dict:
+    """Closed loop: `concurrency` workers send `requests` requests in total."""
+    path, fields = SCENARIOS[name]
+    bodies = [{k: v for k, v in q.items() if k in fields} for q in queries]
+    rng = random.Random(args.seed)
+
+    # Warm-up requests are not measured
+    for body in bodies[:args.warmup]:
+        await client.post(path, json=body)
+
+    latencies, stages = [], defaultdict(list)
+    statuses, errors = Counter(), Counter()
+    remaining = iter(range(args.requests))
+
+    async def worker():
+        for _ in remaining:
+            body = rng.choice(bodies)
+            start = time.perf_counter()
+            try:
+                response = await client.post(path, json=body)
+                await response.aread()
+            except httpx.HTTPError as e:
+                errors[type(e).__name__] += 1
+                continue
+            latencies.append((time.perf_counter() - start) * 1000)
+            statuses[response.status_code] += 1
+            for stage, ms in parse_server_timing(response.headers.get("server-timing", "")).items():
+                stages[stage].append(ms)
+
+    peak, stop = {}, asyncio.Event()
+    sampler = asyncio.create_task(sample_rss(pid, stop, peak)) if pid else None
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    if sampler is not None:
+        await sampler
+
+    ok = sum(count for status, count in statuses.items() if status < 400)
+    return {
+        "endpoint": path,
+        "concurrency": args.concurrency,
+        "requests": len(latencies) + sum(errors.values()),
+        "errors": dict(errors),
+        "status_codes": {str(status): count for status, count in sorted(statuses.items())},
+        "duration_s": round(elapsed, 3),
+        "throughput_rps": round(ok / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": percentiles(latencies),
+        "stages_ms": {stage: percentiles(values) for stage, values in stages.items()},
+        "peak_rss_mb": peak.get("rss_mb")
+    }
+
+
+def regressions(report: dict, baseline: dict, max_regression: float) -> list:
+    """Scenarios whose p95 latency grew by more than max_regression."""
+    found = []
+    for name, result in report["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name, {}).get("latency_ms", {}).get("p95")
+        after = result["latency_ms"].get("p95")
+        if before and after and after > before * (1 + max_regression):
+            found.append(f"{name}: p95 {before:.1f}ms -> {after:.1f}ms")
+    return found
+
+
+async def benchmark(args, pid: int = None) -> dict:
+    with open(args.queries, "r", encoding="utf-8") as f:
+        queries = json.load(f)
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.app_url, timeout=args.timeout, limits=limits) as client:
+        scenarios = {}
+        for name in args.scenario:
+            scenarios[name] = await run_scenario(client, name, queries, args, pid)
+            print(
+                f"{name}: {scenarios[name]['throughput_rps']} req/s, "
+                f"p95 {scenarios[name]['latency_ms'].get('p95')} ms",
+                file=sys.stderr
+            )
+    return scenarios
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", action="append", choices=list(SCENARIOS),
+                        help="Endpoints to drive (repeatable; default: all)")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200, help="Measured requests per scenario")
+    parser.add_argument("--warmup", type=int, default=5, help="Unmeasured requests per scenario")
+    parser.add_argument("--queries", default=os.path.join(script_dir, "queries.json"))
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="Write the JSON report here (default: stdout)")
+    parser.add_argument("--baseline", help="Earlier report to compare p95 latencies against")
+    parser.add_argument("--max-regression", type=float, default=0.2)
+
+    app = parser.add_argument_group("app")
+    app.add_argument("--app-url", help="Benchmark an already running app instead of starting one")
+    app.add_argument("--app-pid", type=int, help="PID of --app-url's server, for RSS")
+    app.add_argument("--app-port", type=int, default=8098)
+    app.add_argument("--app-env", action="append", default=[], metavar="KEY=VALUE",
+                     help="Extra environment for the started app (repeatable)")
+    app.add_argument("--keep-caches", action="store_true", help="Leave the answer/translation caches on")
+    app.add_argument("--startup-timeout", type=float, default=600)
+
+    mock = parser.add_argument_group("mock OpenRouter (see mock_openrouter.py)")
+    mock.add_argument("--mock-port", type=int, default=8099)
+    mock.add_argument("--latency", default="lognormal:600,0.5")
+    mock.add_argument("--token-delay-ms", type=float, default=10)
+    mock.add_argument("--rate-429", type=float, default=0.0)
+    mock.add_argument("--rate-503", type=float, default=0.0)
+    args = parser.parse_args()
+    args.scenario = args.scenario or list(SCENARIOS)
+
+    processes = []
+    report = {
+        "config": {
+            key: value for key, value in vars(args).items()
+            if key not in ("out", "baseline")
+        },
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "git_commit": git_commit()
+        }
+    }
+    try:
+        pid = args.app_pid
+        if args.app_url is None:
+            processes.append(start_mock(args))
+            started = time.perf_counter()
+            app_process = start_app(args)
+            processes.append(app_process)
+            args.app_url = f"http://127.0.0.1:{args.app_port}"
+            wait_until(args.app_url + "/readyz", args.startup_timeout, app_process)
+            pid = app_process.pid
+            report["app"] = {"startup_s": round(time.perf_counter() - started, 2)}
+        report.setdefault("app", {})
+        if pid:
+            report["app"]["idle_rss_mb"] = rss_mb(pid).get("rss_mb")
+
+        report["scenarios"] = asyncio.run(benchmark(args, pid))
+        if pid:
+            report["app"].update(rss_mb(pid))
+        if processes:
+            report["mock"] = httpx.get(f"http://127.0.0.1:{args.mock_port}/stats", timeout=5).json()
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    status = 0
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            found = regressions(report, json.load(f), args.max_regression)
+        report["regressions"] = found
+        for line in found:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        status = 1 if found else 0
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    sys.exit(status)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Local stand-in for the OpenRouter /chat/completions API, for offline
+benchmarks (benchmarks/load_test.py starts it automatically).
+
+Every request waits a time to first byte drawn from a latency
+distribution, may be failed with 429/503 at configurable rates, and is
+answered either as one JSON body or as an SSE stream (`"stream": true`)
+with a delay between tokens.
+
+Latency distributions (milliseconds):
+    fixed:500
+    uniform:200,800            low, high
+    normal:600,150             mean, standard deviation
+    lognormal:600,0.5          median, sigma (heavy tail, like real LLMs)
+
+Usage:
+    python benchmarks/mock_openrouter.py --port 8099 --latency lognormal:600,0.5 \\
+        --rate-429 0.05 --rate-503 0.02 --token-delay-ms 15
+
+Point the backend at it with
+    OPENROUTER_BASE_URL=http://127.0.0.1:8099/api/v1/chat/completions
+
+GET /stats returns request counts by outcome and model.
+"""
+import json
+import time
+import random
+import asyncio
+import argparse
+from collections import Counter
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+ANSWER = (
+    "**Documents Required**\n"
+    "• Aadhaar card of all family members\n"
+    "• Income certificate from the Village Office\n"
+    "• Residence proof (electricity bill or rent agreement)\n"
+    "⚠️ Note: Apply through the Civil Supplies portal or an Akshaya centre."
+)
+
+
+def parse_latency(spec: str):
+    """Latency spec -> function returning one sample in seconds."""
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",")] if args else []
+    if kind == "fixed" and len(values) == 1:
+        return lambda: values[0] / 1000
+    if kind == "uniform" and len(values) == 2:
+        return lambda: random.uniform(*values) / 1000
+    if kind == "normal" and len(values) == 2:
+        return lambda: max(0.0, random.gauss(*values)) / 1000
+    if kind == "lognormal" and len(values) == 2:
+        median, sigma = values
+        return lambda: median * random.lognormvariate(0, sigma) / 1000
+    raise argparse.ArgumentTypeError(
+        f"Bad latency spec {spec!r} (fixed:MS, uniform:LOW,HIGH, normal:MEAN,SD, lognormal:MEDIAN,SIGMA)"
+    )
+
+
+def create_app(args) -> FastAPI:
+    app = FastAPI(title="Mock OpenRouter")
+    latency = parse_latency(args.latency)
+    stats = Counter()
+
+    def usage(messages, text):
+        prompt_tokens = sum(len(str(m.get("content", "")).split()) for m in messages)
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": len(text.split()),
+            "total_tokens": prompt_tokens + len(text.split())
+        }
+
+    @app.post("/api/v1/chat/completions")
+    @app.post("/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        model = body.get("model", "unknown")
+        await asyncio.sleep(latency())
+
+        roll = random.random()
+        if roll < args.rate_429:
+            stats["429"] += 1
+            return JSONResponse(
+                {"error": {"code": 429, "message": "Rate limit exceeded (mock)"}},
+                status_code=429,
+                headers={"Retry-After": str(args.retry_after)}
+            )
+        if roll < args.rate_429 + args.rate_503:
+            stats["503"] += 1
+            return JSONResponse(
+                {"error": {"code": 503, "message": "Provider unavailable (mock)"}},
+                status_code=503
+            )
+
+        stats["200"] += 1
+        stats[f"model:{model}"] += 1
+        created = int(time.time())
+        words = ANSWER.split(" ")[:max(1, body.get("max_tokens") or len(ANSWER))]
+        text = " ".join(words)
+
+        if not body.get("stream"):
+            return {
+                "id": "mock-completion",
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": text},
+                    "finish_reason": "stop"
+                }],
+                "usage": usage(body.get("messages", []), text)
+            }
+
+        async def events():
+            # OpenRouter sends keep-alive comments while the model warms up
+            yield ": OPENROUTER PROCESSING\n\n"
+            for i, word in enumerate(words):
+                delta = word if i == 0 else " " + word
+                chunk = {
+                    "id": "mock-completion",
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {"content": delta}, "finish_reason": None}]
+                }
+                yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+                if args.token_delay_ms:
+                    await asyncio.sleep(args.token_delay_ms / 1000)
+            final = {
+                "id": "mock-completion",
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                "usage": usage(body.get("messages", []), text)
+            }
+            yield f"data: {json.dumps(final)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.get("/stats")
+    def get_stats():
+        return dict(stats)
+
+    return app
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency", default="lognormal:600,0.5", help="Time to first byte distribution")
+    parser.add_argument("--token-delay-ms", type=float, default=10, help="Delay between streamed tokens")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Fraction of requests rate limited")
+    parser.add_argument("--rate-503", type=float, default=0.0, help="Fraction of requests failed with 503")
+    parser.add_argument("--retry-after", type=float, default=1, help="Retry-After seconds on 429s")
+    parser.add_argument("--seed", type=int, default=None)
+    return parser
+
+
+def main():
+    import uvicorn
+
+    args = build_parser().parse_args()
+    parse_latency(args.latency)
+    if args.seed is not None:
+        random.seed(args.seed)
+    uvicorn.run(create_app(args), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+Split section-level chunks into token-bounded spans for indexing.
+
+Input, per service in sources.csv: <data_dir>/chunks/<name>_chunks.json
+(written by metadata.py or curated by hand). Each of those chunks is a
+*parent*; it is cut into windows of at most --max-tokens tokens with
+--overlap tokens shared between neighbours, at line (then word)
+boundaries.
+
+Output: <data_dir>/chunks/<name>_spans.json, which build_faiss_index.py
+indexes instead of the chunks. Every span keeps its parent's fields and
+adds:
+    parent_id       "<service>:<parent position>"
+    span_index      position among the parent's spans
+    span_count      number of spans of the parent
+    char_start/end  span text = parent text[char_start:char_end]
+    parent_tokens   token count of the whole parent
+
+Spans of a parent are consecutive, so retrieval can rebuild the parent
+text from them when a hit needs more context.
+
+Usage:
+    python cleaning/chunking.py
+    python cleaning/chunking.py --max-tokens 96 --overlap 16
+    python cleaning/chunking.py --tokenizer models/mpnet-onnx/tokenizer.json
+"""
+import os
+import re
+import sys
+import json
+import math
+import argparse
+from typing import Callable, Dict, List, Tuple
+
+# Get the project root directory (parent of cleaning folder)
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(script_dir)
+sys.path.insert(0, os.path.join(project_root, "backend"))
+
+from sources import load_sources  # noqa: E402
+
+# mpnet truncates inputs at 128 word pieces
+MAX_TOKENS = 128
+OVERLAP_TOKENS = 24
+
+# Word pieces per whitespace word, when no tokenizer file is given
+WORDPIECES_PER_WORD = 1.3
+
+
+def word_token_counter(text: str) -> int:
+    """Estimated word-piece count of a text."""
+    return math.ceil(len(text.split()) * WORDPIECES_PER_WORD)
+
+
+def tokenizer_counter(path: str) -> Callable[[str], int]:
+    """Exact word-piece count with a HuggingFace tokenizer.json."""
+    from tokenizers import Tokenizer
+    tokenizer = Tokenizer.from_file(path)
+    return lambda text: len(tokenizer.encode(text, add_special_tokens=False).ids)
+
+
+def _units(text: str, count_tokens, max_tokens: int) -> List[Tuple[int, int, int]]:
+    """
+    Non-empty lines of a text as (start, end, tokens); lines longer than
+    max_tokens are cut at word boundaries.
+    """
+    units = []
+    for line in re.finditer(r"[^\n]+", text):
+        stripped = line.group().strip()
+        if not stripped:
+            continue
+        start = line.start() + line.group().index(stripped)
+        end = start + len(stripped)
+        tokens = count_tokens(stripped)
+        if tokens <= max_tokens:
+            units.append((start, end, tokens))
+            continue
+
+        piece_start = piece_end = start
+        for word in re.finditer(r"\S+", stripped):
+            word_end = start + word.end()
+            if piece_end > piece_start and count_tokens(text[piece_start:word_end]) > max_tokens:
+                units.append((piece_start, piece_end, count_tokens(text[piece_start:piece_end])))
+                piece_start = start + word.start()
+            piece_end = word_end
+        units.append((piece_start, piece_end, count_tokens(text[piece_start:piece_end])))
+    return units
+
+
+def split_text(
+    text: str,
+    max_tokens: int = MAX_TOKENS,
+    overlap: int = OVERLAP_TOKENS,
+    count_tokens=word_token_counter
+) -> List[Tuple[int, int]]:
+    """
+    Token-bounded windows over a text.
+
+    Returns:
+        [(char_start, char_end)] of each window, in order
+    """
+    units = _units(text, count_tokens, max_tokens)
+    windows = []
+    first = 0
+    while first < len(units):
+        last, tokens = first, units[first][2]
+        while last + 1 < len(units) and tokens + units[last + 1][2] <= max_tokens:
+            last += 1
+            tokens += units[last][2]
+        windows.append((units[first][0], units[last][1]))
+        if last + 1 >= len(units):
+            break
+
+        # Next window repeats up to `overlap` tokens of trailing lines
+        next_first, shared = last + 1, 0
+        while next_first - 1 > first and shared + units[next_first - 1][2] <= overlap:
+            next_first -= 1
+            shared += units[next_first][2]
+        first = next_first
+    return windows
+
+
+def chunk_service(
+    parents: List[Dict],
+    service: str,
+    max_tokens: int = MAX_TOKENS,
+    overlap: int = OVERLAP_TOKENS,
+    count_tokens=word_token_counter
+) -> List[Dict]:
+    """Spans of every parent chunk of a service, parents in order."""
+    spans = []
+    for position, parent in enumerate(parents):
+        text = parent["text"]
+        windows = split_text(text, max_tokens, overlap, count_tokens) or [(0, len(text))]
+        parent_tokens = count_tokens(text)
+        for span_index, (start, end) in enumerate(windows):
+            spans.append({
+                **parent,
+                "text": text[start:end],
+                "parent_id": f"{service}:{position}",
+                "span_index": span_index,
+                "span_count": len(windows),
+                "char_start": start,
+                "char_end": end,
+                "parent_tokens": parent_tokens
+            })
+    return spans
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--service", action="append", help="Only chunk these services (repeatable)")
+    parser.add_argument("--max-tokens", type=int, default=MAX_TOKENS)
+    parser.add_argument("--overlap", type=int, default=OVERLAP_TOKENS)
+    parser.add_argument("--tokenizer", help="tokenizer.json for exact token counts")
+    args = parser.parse_args()
+
+    if args.overlap >= args.max_tokens:
+        parser.error("--overlap must be smaller than --max-tokens")
+    count_tokens = tokenizer_counter(args.tokenizer) if args.tokenizer else word_token_counter
+
+    sources = load_sources()
+    for service in args.service or list(sources):
+        paths = sources[service]
+        with open(paths["chunks_path"], "r", encoding="utf-8") as f:
+            parents = json.load(f)
+
+        spans = chunk_service(parents, service, args.max_tokens, args.overlap, count_tokens)
+        with open(paths["spans_path"] + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(spans, f, indent=2, ensure_ascii=False)
+        os.replace(paths["spans_path"] + ".tmp", paths["spans_path"])
+
+        split = sum(1 for s in spans if s["span_index"] == 1)
+        print(f"{service}: {len(parents)} chunks -> {len(spans)} spans ({split} chunks split)")
+
+
+if __name__ == "__main__":
+    main()
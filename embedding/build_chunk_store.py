@@ -0,0 +1,20 @@
+import os
+import sys
+import glob
+import json
+
+# Get project root directory
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(script_dir)
+sys.path.insert(0, os.path.join(project_root, "backend"))
+
+from chunk_store import write_chunk_store, store_base  # noqa: E402
+
+# Convert every service's *_metadata.json into the memory-mappable
+# chunk store read by backend/retrieval.py
+for meta_file in sorted(glob.glob(os.path.join(project_root, "data/*/faiss/*_metadata.json"))):
+    with open(meta_file, "r", encoding="utf-8") as f:
+        chunks = json.load(f)
+
+    header = write_chunk_store(chunks, store_base(meta_file))
+    print(f"{os.path.relpath(meta_file, project_root)}: {header['count']} chunks -> chunk store")
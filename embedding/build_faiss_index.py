@@ -1,52 +1,230 @@
-import json
+"""
+Incremental FAISS index builder for every service in sources.csv.
+
+Indexes <name>_spans.json (cleaning/chunking.py) when it exists,
+otherwise <name>_chunks.json.
+
+Each chunk is keyed by the sha256 of its text. Vectors of unchanged
+chunks are read back from the service's current index, so only new or
+edited chunks are encoded (in batches). Services whose chunks did not
+change at all are skipped.
+
+For every rebuilt service the index, metadata JSON and chunk store are
+written to temporary files and renamed into place; the unified index
+(data/unified) is rebuilt at the end, together with the service router
+(only new or edited service descriptions are encoded for it).
+
+Usage:
+    python embedding/build_faiss_index.py                    # all services
+    python embedding/build_faiss_index.py --service ration_card
+    python embedding/build_faiss_index.py --force            # re-embed everything
+"""
 import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+
 import faiss
 import numpy as np
-from sentence_transformers import SentenceTransformer
 
 # Get project root directory
 script_dir = os.path.dirname(os.path.abspath(__file__))
 project_root = os.path.dirname(script_dir)
+sys.path.insert(0, os.path.join(project_root, "backend"))
+
+from sources import load_sources  # noqa: E402
+from chunk_store import ChunkStore, write_chunk_store, store_base  # noqa: E402
+from encoders import load_encoder  # noqa: E402
+from index_store import UnifiedIndex, INDEX_TYPES, UNIFIED_DIR, ROUTER_FILE  # noqa: E402
+from service_router import ServiceRouter, description_vectors  # noqa: E402
+from intents import section_intent  # noqa: E402
+
+MODEL_NAME = "sentence-transformers/paraphrase-multilingual-mpnet-base-v2"
+BUILD_SUFFIX = "_build.json"
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def chunks_hash(chunks) -> str:
+    """Fingerprint of the full chunk list (text and metadata)."""
+    raw = json.dumps(chunks, ensure_ascii=False, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(raw).hexdigest()
+
+
+def build_info_path(meta_path: str) -> str:
+    return store_base(meta_path) + BUILD_SUFFIX
+
+
+def read_build_info(meta_path: str) -> dict:
+    try:
+        with open(build_info_path(meta_path), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def cached_vectors(paths: dict) -> dict:
+    """
+    text hash -> vector, from the service's current index and metadata.
+    Empty if the index was built with a different model.
+    """
+    if not (os.path.exists(paths["index_path"]) and os.path.exists(paths["meta_path"])):
+        return {}
+    # Indices built before build info existed used MODEL_NAME
+    if read_build_info(paths["meta_path"]).get("model", MODEL_NAME) != MODEL_NAME:
+        return {}
+
+    index = faiss.read_index(paths["index_path"])
+    with open(paths["meta_path"], "r", encoding="utf-8") as f:
+        metadata = json.load(f)
+    if len(metadata) != index.ntotal:
+        print(f"Warning: {paths['index_path']} does not match its metadata, ignoring cache")
+        return {}
+
+    vectors = index.reconstruct_n(0, index.ntotal)
+    return {text_hash(chunk["text"]): vectors[i] for i, chunk in enumerate(metadata)}
+
+
+def atomic_write(path: str, write):
+    """Write through `write(tmp_path)`, then rename over `path`."""
+    tmp_path = path + ".tmp"
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def build_service(service: str, paths: dict, encoder, batch_size: int, force: bool) -> bool:
+    """
+    Bring one service's index up to date with its spans (or chunks) file.
+
+    Returns:
+        True if the index was rewritten
+    """
+    source = paths["spans_path"] if os.path.exists(paths["spans_path"]) else paths["chunks_path"]
+    with open(source, "r", encoding="utf-8") as f:
+        chunks = json.load(f)
+
+    # Intent label per chunk, used for intent posting lists and filtering
+    chunks = [{**chunk, "intent": section_intent(chunk["section"])} for chunk in chunks]
+
+    fingerprint = chunks_hash(chunks)
+    info = read_build_info(paths["meta_path"])
+    if not force and info.get("chunks_sha256") == fingerprint and os.path.exists(paths["index_path"]):
+        print(f"{service}: up to date ({len(chunks)} chunks)")
+        return False
+
+    cache = {} if force else cached_vectors(paths)
+    hashes = [text_hash(chunk["text"]) for chunk in chunks]
+    missing = list(dict.fromkeys(h for h in hashes if h not in cache))
+
+    if missing:
+        texts = {h: chunk["text"] for h, chunk in zip(hashes, chunks)}
+        for start in range(0, len(missing), batch_size):
+            batch = missing[start:start + batch_size]
+            vectors = np.ascontiguousarray(encoder().encode([texts[h] for h in batch]), dtype="float32")
+            # Normalize embeddings (important for cosine similarity)
+            faiss.normalize_L2(vectors)
+            cache.update(zip(batch, vectors))
+
+    embeddings = np.ascontiguousarray(np.stack([cache[h] for h in hashes]), dtype="float32")
+
+    index = faiss.IndexFlatIP(embeddings.shape[1])  # Inner Product = cosine after normalization
+    index.add(embeddings)
+
+    os.makedirs(os.path.dirname(paths["index_path"]), exist_ok=True)
+    atomic_write(paths["index_path"], lambda tmp: faiss.write_index(index, tmp))
+
+    def write_metadata(tmp):
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(chunks, f, indent=2, ensure_ascii=False)
+
+    atomic_write(paths["meta_path"], write_metadata)
+    write_chunk_store(chunks, store_base(paths["meta_path"]))
+
+    def write_build_info(tmp):
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({
+                "model": MODEL_NAME,
+                "dimension": int(embeddings.shape[1]),
+                "count": len(chunks),
+                "chunks_sha256": fingerprint
+            }, f, indent=2)
+
+    atomic_write(build_info_path(paths["meta_path"]), write_build_info)
+
+    print(
+        f"{service}: {len(chunks)} chunks, {len(missing)} encoded, "
+        f"{len(chunks) - len(missing)} reused"
+    )
+    return True
+
+
+def saved_router():
+    path = os.path.join(UNIFIED_DIR, ROUTER_FILE)
+    return ServiceRouter.load(path) if os.path.exists(path) else None
+
+
+def router_stale() -> bool:
+    """Whether the saved router is missing or has outdated service descriptions."""
+    router = saved_router()
+    return router is None or bool(router.stale_descriptions())
 
-# Paths
-CHUNKS_FILE = os.path.join(project_root, "data/unemployment/chunks/unemployment_chunks.json")
-INDEX_FILE = os.path.join(project_root, "data/unemployment/faiss/unemployment.index")
-META_FILE = os.path.join(project_root, "data/unemployment/faiss/unemployment_metadata.json")
 
-# Create faiss output directory if it doesn't exist
-os.makedirs(os.path.dirname(INDEX_FILE), exist_ok=True)
+def build_unified(sources: dict, index_type: str, encoder):
+    per_service = {}
+    for service, paths in sources.items():
+        if not os.path.exists(paths["index_path"]):
+            continue
+        index = faiss.read_index(paths["index_path"])
+        store = ChunkStore(store_base(paths["meta_path"]))
+        per_service[service] = (index.reconstruct_n(0, index.ntotal), list(store), store.version)
+        store.close()
 
-# Load chunks
-with open(CHUNKS_FILE, "r", encoding="utf-8") as f:
-    chunks = json.load(f)
+    descriptions = description_vectors(
+        list(per_service), lambda texts: encoder().encode(texts), saved_router()
+    )
+    unified = UnifiedIndex.from_services(per_service, index_type=index_type, descriptions=descriptions)
+    unified.save()
+    print(f"Unified {unified.index_type} index: {unified.index.ntotal} vectors")
 
-texts = [chunk["text"] for chunk in chunks]
 
-# Load multilingual embedding model
-model = SentenceTransformer(
-    "sentence-transformers/paraphrase-multilingual-mpnet-base-v2"
-)
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--service", action="append", help="Only build these services (repeatable)")
+    parser.add_argument("--batch-size", type=int, default=128)
+    parser.add_argument("--backend", default="torch", choices=("torch", "onnx"),
+                        help="Encoder backend (vectors must match the served model)")
+    parser.add_argument("--force", action="store_true", help="Ignore cached vectors and re-embed everything")
+    parser.add_argument("--index-type", default="auto", choices=("auto",) + INDEX_TYPES,
+                        help="Unified index type")
+    args = parser.parse_args()
 
-# Generate embeddings
-embeddings = model.encode(
-    texts,
-    show_progress_bar=True,
-    convert_to_numpy=True
-)
+    sources = load_sources()
+    selected = args.service or list(sources)
+    unknown = [s for s in selected if s not in sources]
+    if unknown:
+        parser.error(f"Unknown services {unknown}; sources.csv has {list(sources)}")
 
-# Normalize embeddings (important for cosine similarity)
-faiss.normalize_L2(embeddings)
+    # Load the model only if something actually needs encoding
+    model = []
 
-# Create FAISS index
-dimension = embeddings.shape[1]
-index = faiss.IndexFlatIP(dimension)  # Inner Product = cosine after normalization
-index.add(embeddings)
+    def encoder():
+        if not model:
+            model.append(load_encoder(MODEL_NAME, args.backend))
+        return model[0]
 
-# Save index
-faiss.write_index(index, INDEX_FILE)
+    start = time.perf_counter()
+    changed = [
+        service for service in selected
+        if build_service(service, sources[service], encoder, args.batch_size, args.force)
+    ]
+    if changed or not UnifiedIndex.exists() or router_stale():
+        build_unified(sources, args.index_type, encoder)
+    print(f"Done in {time.perf_counter() - start:.1f}s, rebuilt: {changed or 'nothing'}")
 
-# Save metadata separately
-with open(META_FILE, "w", encoding="utf-8") as f:
-    json.dump(chunks, f, indent=2, ensure_ascii=False)
 
-print(f"FAISS index created with {index.ntotal} vectors")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+import os
+import sys
+import argparse
+
+# Get project root directory
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(script_dir)
+sys.path.insert(0, os.path.join(project_root, "backend"))
+
+import faiss  # noqa: E402
+
+from retrieval import SERVICES, load_metadata  # noqa: E402
+from embeddings import encode  # noqa: E402
+from index_store import UnifiedIndex, UNIFIED_DIR, INDEX_TYPES, ROUTER_FILE  # noqa: E402
+from service_router import ServiceRouter, description_vectors  # noqa: E402
+
+# Merge every service's flat index into the unified index served by
+# backend/retrieval.py. Vectors are read back from the per-service
+# indices, so no re-encoding is needed (only new or edited service
+# descriptions are encoded for the service router).
+parser = argparse.ArgumentParser(description="Build the unified multi-service FAISS index")
+parser.add_argument("--index-type", default="auto", choices=("auto",) + INDEX_TYPES,
+                    help="auto picks flat / hnsw / ivfpq by corpus size")
+parser.add_argument("--out-dir", default=UNIFIED_DIR)
+args = parser.parse_args()
+
+per_service = {}
+for service_name, paths in SERVICES.items():
+    if not (os.path.exists(paths["index_path"]) and os.path.exists(paths["meta_path"])):
+        print(f"Skipping {service_name}: index not found")
+        continue
+    index = faiss.read_index(paths["index_path"])
+    metadata, version = load_metadata(paths["meta_path"])
+    per_service[service_name] = (index.reconstruct_n(0, index.ntotal), list(metadata), version)
+    print(f"{service_name}: {index.ntotal} vectors")
+
+router_path = os.path.join(args.out_dir, ROUTER_FILE)
+previous = ServiceRouter.load(router_path) if os.path.exists(router_path) else None
+descriptions = description_vectors(list(per_service), encode, previous)
+
+unified = UnifiedIndex.from_services(per_service, index_type=args.index_type, descriptions=descriptions)
+unified.save(args.out_dir)
+print(
+    f"Saved {unified.index_type} index with {unified.index.ntotal} vectors "
+    f"to {os.path.relpath(args.out_dir, project_root)}"
+)
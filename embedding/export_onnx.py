@@ -0,0 +1,174 @@
+"""
+Export the query encoder to ONNX (+ dynamic int8 quantization) and check
+that it retrieves the same chunks as the PyTorch model.
+
+Usage:
+    python embedding/export_onnx.py                 # export + parity check
+    python embedding/export_onnx.py --check-only    # parity check only
+
+Serve it with EMBEDDING_BACKEND=onnx (see backend/encoders.py).
+
+Requires (export time only): torch, sentence-transformers, onnx,
+onnxruntime, tokenizers.
+"""
+import os
+import sys
+import json
+import glob
+import argparse
+
+import faiss
+import numpy as np
+
+# Get project root directory
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(script_dir)
+sys.path.insert(0, os.path.join(project_root, "backend"))
+
+from encoders import (  # noqa: E402
+    TorchEncoder,
+    OnnxEncoder,
+    ONNX_MODEL_DIR,
+    ONNX_MODEL_FILE,
+    ONNX_QUANTIZED_FILE,
+    ONNX_CONFIG_FILE
+)
+
+MODEL_NAME = "sentence-transformers/paraphrase-multilingual-mpnet-base-v2"
+
+
+def export(out_dir: str, quantize: bool = True):
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    os.makedirs(out_dir, exist_ok=True)
+    st_model = SentenceTransformer(MODEL_NAME)
+    transformer = st_model[0].auto_model.eval()
+    tokenizer = st_model[0].tokenizer
+
+    class TokenEmbeddings(torch.nn.Module):
+        """Transformer body only: pooling is done by OnnxEncoder."""
+
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask):
+            return self.model(input_ids=input_ids, attention_mask=attention_mask)[0]
+
+    dummy = tokenizer(["Ration card documents"], return_tensors="pt")
+    model_path = os.path.join(out_dir, ONNX_MODEL_FILE)
+    torch.onnx.export(
+        TokenEmbeddings(transformer),
+        (dummy["input_ids"], dummy["attention_mask"]),
+        model_path,
+        input_names=["input_ids", "attention_mask"],
+        output_names=["token_embeddings"],
+        dynamic_axes={
+            "input_ids": {0: "batch", 1: "sequence"},
+            "attention_mask": {0: "batch", 1: "sequence"},
+            "token_embeddings": {0: "batch", 1: "sequence"}
+        },
+        opset_version=14
+    )
+    print(f"Exported {model_path}")
+
+    if quantize:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        quantized_path = os.path.join(out_dir, ONNX_QUANTIZED_FILE)
+        quantize_dynamic(model_path, quantized_path, weight_type=QuantType.QInt8)
+        print(f"Quantized (int8) {quantized_path}")
+
+    tokenizer.save_pretrained(out_dir)
+    with open(os.path.join(out_dir, ONNX_CONFIG_FILE), "w", encoding="utf-8") as f:
+        json.dump({
+            "source_model": MODEL_NAME,
+            "max_seq_length": st_model.max_seq_length,
+            "dimension": st_model.get_sentence_embedding_dimension(),
+            "pad_token": tokenizer.pad_token
+        }, f, indent=2)
+
+
+def load_parity_queries():
+    """
+    Queries for the parity check, per FAISS index: every chunk's section
+    name and the first line of its text, for all shipped *_chunks.json.
+    """
+    per_index = {}
+    for chunks_file in sorted(glob.glob(os.path.join(project_root, "data/*/chunks/*_chunks.json"))):
+        service_dir = os.path.dirname(os.path.dirname(chunks_file))
+        index_files = glob.glob(os.path.join(service_dir, "faiss/*.index"))
+        if not index_files:
+            continue
+        with open(chunks_file, "r", encoding="utf-8") as f:
+            chunks = json.load(f)
+        queries = []
+        for chunk in chunks:
+            queries.append(chunk["section"].replace("_", " ").lower())
+            first_line = chunk["text"].strip().split("\n")[0]
+            if first_line:
+                queries.append(first_line)
+        per_index[index_files[0]] = list(dict.fromkeys(queries))
+    return per_index
+
+
+def parity_check(out_dir: str, k: int, quantized: bool = True) -> float:
+    """
+    Search every shipped FAISS index (built with the PyTorch model) with
+    PyTorch and ONNX query vectors and compare the top-k results.
+
+    Returns:
+        Mean recall@k of the ONNX results against the PyTorch results
+    """
+    torch_encoder = TorchEncoder(MODEL_NAME)
+    onnx_encoder = OnnxEncoder(out_dir, quantized=quantized)
+
+    recalls = []
+    for index_file, queries in load_parity_queries().items():
+        index = faiss.read_index(index_file)
+        top_k = min(k, index.ntotal)
+
+        torch_vecs = torch_encoder.encode(queries)
+        onnx_vecs = onnx_encoder.encode(queries)
+        cosine = np.sum(torch_vecs * onnx_vecs, axis=1)
+
+        _, torch_ids = index.search(torch_vecs, top_k)
+        _, onnx_ids = index.search(onnx_vecs, top_k)
+        index_recalls = [
+            len(set(t) & set(o)) / top_k
+            for t, o in zip(torch_ids, onnx_ids)
+        ]
+        recalls.extend(index_recalls)
+        print(
+            f"{os.path.basename(index_file)}: {len(queries)} queries, "
+            f"recall@{top_k}={np.mean(index_recalls):.4f}, "
+            f"min cosine(torch, onnx)={cosine.min():.4f}"
+        )
+
+    mean_recall = float(np.mean(recalls)) if recalls else 0.0
+    print(f"Overall recall@{k}: {mean_recall:.4f}")
+    return mean_recall
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out-dir", default=ONNX_MODEL_DIR)
+    parser.add_argument("--no-quantize", action="store_true", help="Skip int8 quantization")
+    parser.add_argument("--check-only", action="store_true", help="Only run the parity check")
+    parser.add_argument("-k", type=int, default=3, help="k for recall@k")
+    parser.add_argument("--min-recall", type=float, default=1.0,
+                        help="Fail if recall@k is below this (default: results must match)")
+    args = parser.parse_args()
+
+    if not args.check_only:
+        export(args.out_dir, quantize=not args.no_quantize)
+
+    recall = parity_check(args.out_dir, args.k, quantized=not args.no_quantize)
+    if recall < args.min_recall:
+        print(f"Parity check FAILED: recall@{args.k} {recall:.4f} < {args.min_recall}")
+        sys.exit(1)
+    print("Parity check passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Export a multilingual cross-encoder to ONNX (+ dynamic int8 quantization)
+for the optional reranking stage, and check it scores like the PyTorch
+model.
+
+Usage:
+    python embedding/export_reranker_onnx.py
+    python embedding/export_reranker_onnx.py --model cross-encoder/mmarco-mMiniLMv2-L12-H384-v1
+
+Serve it with RERANK_ENABLED=1 (see backend/reranker.py).
+
+Requires (export time only): torch, transformers, onnx, onnxruntime,
+tokenizers.
+"""
+import os
+import sys
+import json
+import argparse
+
+import numpy as np
+
+# Get project root directory
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(script_dir)
+sys.path.insert(0, os.path.join(project_root, "backend"))
+
+from reranker import (  # noqa: E402
+    OnnxCrossEncoder,
+    RERANK_MODEL_DIR,
+    RERANK_MODEL_FILE,
+    RERANK_QUANTIZED_FILE,
+    RERANK_CONFIG_FILE
+)
+
+MODEL_NAME = "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1"
+
+CHECK_PAIRS = [
+    ("What documents are needed for a ration card?", "Required documents: Aadhaar card, income certificate, residence proof"),
+    ("What documents are needed for a ration card?", "Registration must be done at the local body where the birth occurred"),
+    ("ജനന സർട്ടിഫിക്കറ്റ് എങ്ങനെ അപേക്ഷിക്കാം?", "Apply for birth registration online through the K-SMART portal"),
+    ("unemployment allowance age limit", "Age limits: 18 years (lower) to 35 years (upper)"),
+]
+
+
+def export(model_name: str, out_dir: str, max_length: int, quantize: bool = True):
+    import torch
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    os.makedirs(out_dir, exist_ok=True)
+    model = AutoModelForSequenceClassification.from_pretrained(model_name).eval()
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+
+    dummy = tokenizer(["query"], ["passage"], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in dummy]
+    model_path = os.path.join(out_dir, RERANK_MODEL_FILE)
+    torch.onnx.export(
+        model,
+        tuple(dummy[name] for name in input_names),
+        model_path,
+        input_names=input_names,
+        output_names=["logits"],
+        dynamic_axes={
+            **{name: {0: "batch", 1: "sequence"} for name in input_names},
+            "logits": {0: "batch"}
+        },
+        opset_version=14
+    )
+    print(f"Exported {model_path}")
+
+    if quantize:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        quantized_path = os.path.join(out_dir, RERANK_QUANTIZED_FILE)
+        quantize_dynamic(model_path, quantized_path, weight_type=QuantType.QInt8)
+        print(f"Quantized (int8) {quantized_path}")
+
+    tokenizer.save_pretrained(out_dir)
+    with open(os.path.join(out_dir, RERANK_CONFIG_FILE), "w", encoding="utf-8") as f:
+        json.dump({
+            "source_model": model_name,
+            "max_length": max_length,
+            "pad_token": tokenizer.pad_token
+        }, f, indent=2)
+    return model, tokenizer
+
+
+def parity_check(model, tokenizer, out_dir: str, max_length: int) -> float:
+    """Largest absolute difference of sigmoid scores, PyTorch vs ONNX."""
+    import torch
+
+    queries, texts = zip(*CHECK_PAIRS)
+    features = tokenizer(
+        list(queries), list(texts), padding=True, truncation=True,
+        max_length=max_length, return_tensors="pt"
+    )
+    with torch.no_grad():
+        torch_scores = torch.sigmoid(model(**features).logits[:, 0]).numpy()
+    onnx_scores = OnnxCrossEncoder(out_dir).score(CHECK_PAIRS)
+
+    for (query, text), t, o in zip(CHECK_PAIRS, torch_scores, onnx_scores):
+        print(f"torch={t:.3f} onnx={o:.3f}  {query[:30]!r} / {text[:40]!r}")
+    return float(np.max(np.abs(torch_scores - onnx_scores)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=MODEL_NAME)
+    parser.add_argument("--out-dir", default=RERANK_MODEL_DIR)
+    parser.add_argument("--max-length", type=int, default=256)
+    parser.add_argument("--no-quantize", action="store_true", help="Skip int8 quantization")
+    parser.add_argument("--max-diff", type=float, default=0.05,
+                        help="Fail if any ONNX score differs from PyTorch by more than this")
+    args = parser.parse_args()
+
+    model, tokenizer = export(args.model, args.out_dir, args.max_length, quantize=not args.no_quantize)
+    diff = parity_check(model, tokenizer, args.out_dir, args.max_length)
+    if diff > args.max_diff:
+        print(f"Parity check FAILED: max score difference {diff:.4f} > {args.max_diff}")
+        sys.exit(1)
+    print(f"Parity check passed (max score difference {diff:.4f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,17 @@
 
 import { useState } from "react";
 
+// Parse one Server-Sent Event block ("event: x\ndata: {...}")
+function parseSSE(raw) {
+  let event = null;
+  let data = "";
+  for (const line of raw.split("\n")) {
+    if (line.startsWith("event:")) event = line.slice(6).trim();
+    else if (line.startsWith("data:")) data += line.slice(5).trim();
+  }
+  return { event, data: data ? JSON.parse(data) : {} };
+}
+
 export default function Home() {
   const [query, setQuery] = useState("");
   const [service, setService] = useState("");
@@ -22,8 +33,18 @@ export default function Home() {
   setMessages((prev) => [...prev, userMsg]);
   setLoading(true);
 
+  // Placeholder assistant message, filled in as stream events arrive
+  let botStarted = false;
+  const updateBot = (patch) =>
+    setMessages((prev) => {
+      const next = [...prev];
+      const last = next[next.length - 1];
+      next[next.length - 1] = { ...last, ...patch(last) };
+      return next;
+    });
+
   try {
-    const res = await fetch("http://127.0.0.1:8000/ask", {
+    const res = await fetch("http://127.0.0.1:8000/ask/stream", {
       method: "POST",
       headers: {
         "Content-Type": "application/json",
@@ -37,25 +58,61 @@ export default function Home() {
       }),
     });
 
-    const data = await res.json();
-
-    const botMsg = {
-      role: "assistant",
-      content: data.answer || "No answer generated.",
-      sources: data.sources || [],
-      next_steps: data.next_steps || [], // ✅ ADD THIS
-    };
+    if (!res.ok || !res.body) {
+      throw new Error(`Request failed: ${res.status}`);
+    }
 
-    setMessages((prev) => [...prev, botMsg]);
-  } catch (err) {
-    console.error(err);
     setMessages((prev) => [
       ...prev,
-      {
-        role: "assistant",
-        content: "Error connecting to server.",
-      },
+      { role: "assistant", content: "", sources: [], next_steps: [] },
     ]);
+    botStarted = true;
+
+    // 📡 Read Server-Sent Events: meta → token* → next_steps → done
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+
+    while (true) {
+      const { value, done } = await reader.read();
+      if (done) break;
+
+      buffer += decoder.decode(value, { stream: true });
+      const rawEvents = buffer.split("\n\n");
+      buffer = rawEvents.pop();
+
+      for (const raw of rawEvents) {
+        const { event, data } = parseSSE(raw);
+        if (!event) continue;
+
+        if (event === "meta") {
+          updateBot(() => ({ sources: data.sources || [] }));
+        } else if (event === "token") {
+          updateBot((last) => ({ content: last.content + data.text }));
+        } else if (event === "next_steps") {
+          updateBot(() => ({ next_steps: data.next_steps || [] }));
+        } else if (event === "done") {
+          updateBot(() => ({
+            content: data.answer || "No answer generated.",
+          }));
+        }
+      }
+    }
+  } catch (err) {
+    console.error(err);
+    if (botStarted) {
+      updateBot((last) => ({
+        content: last.content || "Error connecting to server.",
+      }));
+    } else {
+      setMessages((prev) => [
+        ...prev,
+        {
+          role: "assistant",
+          content: "Error connecting to server.",
+        },
+      ]);
+    }
   } finally {
     setLoading(false);
     setQuery("");
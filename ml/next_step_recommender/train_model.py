@@ -1,24 +1,70 @@
+"""
+Train the next-step recommender and compile it into a lookup table.
+
+The input space is tiny (services x intents, one-hot), so instead of
+running the classifier per request every (service, intent) pair is scored
+once here and the ranked next intents are written to next_step_table.json.
+The backend serves that table (backend/next_step_recommender.py) and does
+not need scikit-learn.
+
+Usage (from anywhere):
+    python ml/next_step_recommender/train_model.py
+
+Outputs (next to this script):
+    next_step_model.pkl, label_binarizer.pkl   trained model (for inspection)
+    next_step_table.json                        compiled table served by the backend
+"""
+import os
 import json
+import hashlib
+from datetime import datetime, timezone
+
 import numpy as np
+import sklearn
 from sklearn.preprocessing import MultiLabelBinarizer
 from sklearn.linear_model import LogisticRegression
 from sklearn.multiclass import OneVsRestClassifier
 import joblib
 
+# Must match backend/intents.py and the service keys in sources.csv
 INTENTS = ["documents","eligibility","process","timeline","fees","correction"]
-SERVICES = ["ration_card","birth_certificate","unemployment"]
+SERVICES = ["ration_card","birth_certificate","unemployment_allowance"]
+
+TABLE_FORMAT = 1
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+DATA_PATH = os.path.join(script_dir, "training_data.json")
+MODEL_PATH = os.path.join(script_dir, "next_step_model.pkl")
+LABEL_PATH = os.path.join(script_dir, "label_binarizer.pkl")
+TABLE_PATH = os.path.join(script_dir, "next_step_table.json")
+
+
+def features(service, intent):
+    service_vec = [1 if service == s else 0 for s in SERVICES]
+    intent_vec = [1 if intent == i else 0 for i in INTENTS]
+    return service_vec + intent_vec
+
+
+def sha256_of(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
 
 # Load data
-with open("training_data.json") as f:
+with open(DATA_PATH, encoding="utf-8") as f:
     data = json.load(f)
 
 X = []
 y = []
 
 for row in data:
-    service_vec = [1 if row["service"] == s else 0 for s in SERVICES]
-    intent_vec = [1 if row["current_intent"] == i else 0 for i in INTENTS]
-    X.append(service_vec + intent_vec)
+    # An unknown name would silently become an all-zero one-hot vector
+    if row["service"] not in SERVICES:
+        raise ValueError(f"Unknown service {row['service']!r} in training data (expected one of {SERVICES})")
+    unknown = {row["current_intent"], *row["next_intents"]} - set(INTENTS)
+    if unknown:
+        raise ValueError(f"Unknown intents {sorted(unknown)} in training data")
+    X.append(features(row["service"], row["current_intent"]))
     y.append(row["next_intents"])
 
 X = np.array(X)
@@ -29,5 +75,33 @@ y = mlb.fit_transform(y)
 model = OneVsRestClassifier(LogisticRegression())
 model.fit(X, y)
 
-joblib.dump(model, "next_step_model.pkl")
-joblib.dump(mlb, "label_binarizer.pkl")
+joblib.dump(model, MODEL_PATH)
+joblib.dump(mlb, LABEL_PATH)
+
+# ===============================
+# Compile: every (service, intent) pair, ranked
+# ===============================
+pairs = [(s, i) for s in SERVICES for i in INTENTS]
+probs = model.predict_proba(np.array([features(s, i) for s, i in pairs]))
+
+table = {service: {} for service in SERVICES}
+for (service, intent), row in zip(pairs, probs):
+    # Stable sort: ties keep INTENTS order
+    order = sorted(range(len(INTENTS)), key=lambda j: row[j], reverse=True)
+    table[service][intent] = [[INTENTS[j], round(float(row[j]), 6)] for j in order]
+
+compiled = {
+    "format": TABLE_FORMAT,
+    "model_sha256": sha256_of(MODEL_PATH),
+    "training_data_sha256": sha256_of(DATA_PATH),
+    "sklearn_version": sklearn.__version__,
+    "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    "services": SERVICES,
+    "intents": INTENTS,
+    "table": table
+}
+with open(TABLE_PATH + ".tmp", "w", encoding="utf-8") as f:
+    json.dump(compiled, f, indent=2)
+os.replace(TABLE_PATH + ".tmp", TABLE_PATH)
+
+print(f"Trained on {len(data)} rows; compiled {len(pairs)} (service, intent) pairs -> {TABLE_PATH}")